@@ -1,34 +1,73 @@
+"""
+Application factory. Pages are in the views package, whose modules are
+imported on first use (see views/__init__.py).
+"""
+
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Evaluation, Program, Team, Attendance, Club, Division
-from datetime import datetime
-from config import config
 import logging
+from flask import Flask
+from flask_login import LoginManager
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+from models import db, User, Program, Team, Club, Division, CompletedLevels
+from search import ensure_search_index
+from replica import init_replica
+from login_guard import init_login_guard
+from slow_queries import init_slow_queries
+from views import register_views
+import fragment_cache
+import live
+import prefork
+import reference
+import roster
+from config import config
 
-app = Flask(__name__)
-
-# Load configuration from environment
-env = os.environ.get('FLASK_ENV', 'development')
-app.config.from_object(config.get(env, config['development']))
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-app.logger.setLevel(logging.INFO)
-
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-def init_db():
-    """Initialize database with sample data"""
-    with app.app_context():
+    # Deactivated athletes (see roster.py) lose their sessions and remember-me cookies
+    return db.session.scalar(select(User).where(User.id == int(user_id), ~roster.deactivated(User.id)))
+
+def create_app(config_name=None):
+    """Create and configure the app; config_name defaults to FLASK_ENV"""
+    app = Flask(__name__)
+    
+    # Load configuration from environment
+    env = config_name or os.environ.get('FLASK_ENV', 'development')
+    app.config.from_object(config.get(env, config['development']))
+    
+    # Configure logging
+    logging.basicConfig(level=logging.INFO)
+    app.logger.setLevel(logging.INFO)
+    
+    init_replica(app)
+    db.init_app(app)
+    init_slow_queries(app)
+    live.init_live(app)
+    init_login_guard(app)
+    fragment_cache.init_fragment_cache(app)
+    reference.init_reference(app)
+    login_manager.init_app(app)
+    register_views(app)
+    
+    # Optional in-process job workers (see jobs.py). Threads don't survive a
+    # fork, so a preloading gunicorn master leaves them to each worker.
+    if app.config.get('JOB_WORKER_THREADS') and not prefork.preloading:
+        import jobs
+        jobs.start_workers(app, app.config['JOB_WORKER_THREADS'])
+    
+    return app
+
+# The app gunicorn (app:app), Vercel (api/index.py) and the scripts use
+app = create_app()
+
+def init_db(target=None):
+    """Initialize database with sample data. target defaults to the module's app."""
+    import archive
+    import attendance_bits  # Brings in archive and jobs, which serving pages mostly doesn't need
+    with (target or app).app_context():
         # Only create tables if they don't exist (production-safe)
         db.create_all()
         
@@ -82,7 +121,8 @@ def init_db():
         db.session.flush()  # Get the program IDs
         
         # Create coach
-        if not User.query.filter_by(username='coach1').first():
+        coach = User.query.filter_by(username='coach1').first()
+        if not coach:
             coach = User(
                 username='coach1',
                 email='coach@example.com',
@@ -99,7 +139,7 @@ def init_db():
             team = Team(
                 name='U12 Demo Team',
                 program_id=u12_program.id,
-                coach_id=2,
+                coach_id=coach.id,
                 team_type='team',
                 club_id=Club.query.filter_by(name='Alpine Ontario').first().id if Club.query.filter_by(name='Alpine Ontario').first() else None
             )
@@ -117,7 +157,7 @@ def init_db():
                 user_type='student',
                 full_name='John Doe',
                 participates_snow_stars=True,
-                coach_id=2,
+                coach_id=coach.id,
                 team_id=demo_team.id,
                 program_id=u12_program.id,
                 division_id=south_division.id if south_division else None,
@@ -126,653 +166,15 @@ def init_db():
             db.session.add(student)
         
         db.session.commit()
-
-@app.route('/')
-def index():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return render_template('index.html')
-
-@app.route('/health')
-def health():
-    """Health check endpoint for debugging"""
-    try:
-        # Test database connection
-        user_count = User.query.count()
-        program_count = Program.query.count()
-        
-        return {
-            'status': 'healthy',
-            'database': 'connected',
-            'users': user_count,
-            'programs': program_count,
-            'environment': os.environ.get('FLASK_ENV', 'development')
-        }
-    except Exception as e:
-        app.logger.error(f"Health check error: {e}")
-        return {
-            'status': 'error',
-            'error': str(e),
-            'environment': os.environ.get('FLASK_ENV', 'development')
-        }, 500
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        try:
-            username = request.form.get('username', '').strip()
-            password = request.form.get('password', '').strip()
-            
-            if not username or not password:
-                flash('Please enter both username and password', 'error')
-                return render_template('login.html')
-            
-            app.logger.info(f"Login attempt for username: '{username}'")
-            user = User.query.filter_by(username=username).first()
-            
-            if user:
-                app.logger.info(f"User found: {user.username} (type: {user.user_type})")
-                password_valid = check_password_hash(user.password_hash, password)
-                app.logger.info(f"Password check: {password_valid}")
-                
-                if password_valid:
-                    login_user(user)
-                    flash('Login successful!', 'success')
-                    return redirect(url_for('dashboard'))
-                else:
-                    flash('Invalid username or password', 'error')
-            else:
-                app.logger.warning(f"User not found: '{username}'")
-                # Show available usernames in debug mode
-                if app.config.get('DEBUG'):
-                    all_usernames = [u.username for u in User.query.all()]
-                    app.logger.debug(f"Available usernames: {all_usernames}")
-                flash('Invalid username or password', 'error')
-        except Exception as e:
-            app.logger.error(f"Login error: {e}", exc_info=True)
-            flash('An error occurred during login. Please try again.', 'error')
-    
-    return render_template('login.html')
-
-@app.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    flash('Logged out successfully', 'info')
-    return redirect(url_for('index'))
-
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    user_type = current_user.user_type
-    
-    if user_type == 'admin':
-        users = User.query.all()
-        return render_template('dashboard_admin.html', users=users)
-    elif user_type == 'coach':
-        # Get students from coach's teams
-        coach_teams = Team.query.filter_by(coach_id=current_user.id).all()
-        team_ids = [team.id for team in coach_teams]
-        
-        students = []
-        if team_ids:
-            students = User.query.filter(
-                User.user_type == 'student',
-                User.team_id.in_(team_ids)
-            ).all()
-        
-        recent_evaluations = Evaluation.query.filter_by(
-            coach_id=current_user.id
-        ).order_by(Evaluation.created_at.desc()).limit(5).all()
-        return render_template('dashboard_coach.html', students=students, evaluations=recent_evaluations, teams=coach_teams if coach_teams else [])
-    else:
-        evaluations = Evaluation.query.filter_by(student_id=current_user.id).order_by(Evaluation.level).all()
-        return render_template('dashboard_student.html', evaluations=evaluations)
-
-@app.route('/register', methods=['GET', 'POST'])
-@login_required
-def register():
-    if current_user.user_type != 'admin':
-        flash('Only admins can create new users', 'error')
-        return redirect(url_for('dashboard'))
-    
-    if request.method == 'POST':
-        username = request.form.get('username')
-        email = request.form.get('email')
-        password = request.form.get('password')
-        full_name = request.form.get('full_name')
-        user_type = request.form.get('user_type')
-        coach_id = request.form.get('coach_id')
-        team_id = request.form.get('team_id')
-        club_id = request.form.get('club_id')
-        division_id = request.form.get('division_id')
-        participates_skier = request.form.get('participates_skier') == 'on'
-        participates_snowboarder = request.form.get('participates_snowboarder') == 'on'
-        participates_snow_stars = request.form.get('participates_snow_stars') == 'on'
-        
-        if User.query.filter_by(username=username).first():
-            flash('Username already exists', 'error')
-            coaches = User.query.filter_by(user_type='coach').all()
-            teams = Team.query.all()
-            programs = Program.query.all()
-            clubs = Club.query.all()
-            divisions = Division.query.all()
-            return render_template('register.html', coaches=coaches, teams=teams, programs=programs, clubs=clubs, divisions=divisions)
-        
-        new_user = User(
-            username=username,
-            email=email,
-            password_hash=generate_password_hash(password, method='pbkdf2:sha256'),
-            full_name=full_name,
-            user_type=user_type,
-            club_id=int(club_id) if club_id else None,
-            division_id=int(division_id) if division_id else None,
-            participates_skier=participates_skier if user_type == 'student' else False,
-            participates_snowboarder=participates_snowboarder if user_type == 'student' else False,
-            participates_snow_stars=participates_snow_stars if user_type == 'student' else False,
-            coach_id=int(coach_id) if coach_id else None,
-            team_id=int(team_id) if team_id and user_type == 'student' else None
-        )
-        
-        db.session.add(new_user)
-        db.session.commit()
-        flash('User created successfully', 'success')
-        return redirect(url_for('dashboard'))
-    
-    coaches = User.query.filter_by(user_type='coach').all()
-    teams = Team.query.all()
-    programs = Program.query.all()
-    clubs = Club.query.all()
-    divisions = Division.query.all()
-    return render_template('register.html', coaches=coaches, teams=teams, programs=programs, clubs=clubs, divisions=divisions)
-
-@app.route('/evaluate/<int:student_id>', methods=['GET', 'POST'])
-@login_required
-def evaluate_student(student_id):
-    if current_user.user_type != 'coach':
-        flash('Only coaches can evaluate athletes', 'error')
-        return redirect(url_for('dashboard'))
-    
-    student = User.query.get_or_404(student_id)
-    
-    if student.user_type != 'student' or student.coach_id != current_user.id:
-        flash('You can only evaluate your assigned students', 'error')
-        return redirect(url_for('dashboard'))
-    
-    if request.method == 'POST':
-        sport_type = request.form.get('sport_type')
-        
-        # Check if student participates in selected sport
-        if sport_type == 'skier' and not student.participates_skier:
-            flash('Student does not participate in skiing. Please update student profile.', 'error')
-            return redirect(url_for('dashboard'))
-        elif sport_type == 'snowboarder' and not student.participates_snowboarder:
-            flash('Student does not participate in snowboarding. Please update student profile.', 'error')
-            return redirect(url_for('dashboard'))
-        elif sport_type == 'snow_stars' and not student.participates_snow_stars:
-            flash('Student does not participate in Snow Stars. Please update student profile.', 'error')
-            return redirect(url_for('dashboard'))
-        
-        if not sport_type:
-            flash('Please select a sport for evaluation.', 'error')
-            return redirect(url_for('dashboard'))
-        
-        level = int(request.form.get('level'))
-        
-        # Check if student already has an evaluation for this level
-        existing_evaluation = Evaluation.query.filter_by(
-            student_id=student_id, 
-            sport_type=sport_type,
-            level=level
-        ).first()
-        
-        if existing_evaluation:
-            flash(f'Student already has an evaluation for level {level}. You can only create one evaluation per level per student.', 'error')
-            return redirect(url_for('dashboard'))
-        
-        evaluation = Evaluation(
-            student_id=student_id,
-            coach_id=current_user.id,
-            sport_type=sport_type,
-            level=level,
-            skills_score=float(request.form.get('skills_score')),
-            attitude_score=float(request.form.get('attitude_score')),
-            performance_score=float(request.form.get('performance_score')),
-            comments=request.form.get('comments'),
-            created_at=datetime.now()
-        )
-        
-        # Add sport-specific criteria
-        if sport_type == 'skier':
-            evaluation.technical_score = float(request.form.get('technical_score'))
-            evaluation.edging_score = float(request.form.get('edging_score'))
-            evaluation.pressure_control_score = float(request.form.get('pressure_control_score'))
-            evaluation.turn_shape_score = float(request.form.get('turn_shape_score'))
-        elif sport_type == 'snowboarder':
-            evaluation.board_control_score = float(request.form.get('board_control_score'))
-            evaluation.edge_awareness_score = float(request.form.get('edge_awareness_score'))
-            evaluation.body_positioning_score = float(request.form.get('body_positioning_score'))
-            evaluation.turn_control_score = float(request.form.get('turn_control_score'))
-        elif sport_type == 'snow_stars':
-            evaluation.movement_quality_score = float(request.form.get('movement_quality_score'))
-            evaluation.balance_score = float(request.form.get('balance_score'))
-            evaluation.control_score = float(request.form.get('control_score'))
-            evaluation.awareness_score = float(request.form.get('awareness_score'))
-        
-        db.session.add(evaluation)
-        db.session.commit()
-        flash('Evaluation submitted successfully', 'success')
-        return redirect(url_for('dashboard'))
-    
-    # Only Snow Stars program is enabled
-    available_sports = []
-    if student.participates_snow_stars:
-        available_sports.append('snow_stars')
-    
-    # Get completed levels for each sport
-    completed_levels_skier = []
-    completed_levels_snowboarder = []
-    completed_levels_snow_stars = []
-    
-    for eval in Evaluation.query.filter_by(student_id=student_id).all():
-        if eval.sport_type == 'snow_stars':
-            completed_levels_snow_stars.append(eval.level)
-    
-    return render_template('evaluate.html', student=student, 
-                         available_sports=available_sports,
-                         completed_levels_skier=completed_levels_skier,
-                         completed_levels_snowboarder=completed_levels_snowboarder,
-                         completed_levels_snow_stars=completed_levels_snow_stars)
-
-@app.route('/evaluations/<int:evaluation_id>')
-@login_required
-def view_evaluation(evaluation_id):
-    evaluation = Evaluation.query.get_or_404(evaluation_id)
-    
-    if current_user.user_type == 'student' and evaluation.student_id != current_user.id:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    if current_user.user_type == 'coach' and evaluation.coach_id != current_user.id:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    return render_template('view_evaluation.html', evaluation=evaluation)
-
-# Admin routes for managing programs and teams
-
-@app.route('/admin/programs')
-@login_required
-def manage_programs():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    programs = Program.query.all()
-    divisions = Division.query.all()
-    return render_template('manage_programs.html', programs=programs, divisions=divisions)
-
-@app.route('/admin/teams')
-@login_required
-def manage_teams():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    teams = Team.query.all()
-    programs = Program.query.all()
-    coaches = User.query.filter_by(user_type='coach').all()
-    clubs = Club.query.all()
-    return render_template('manage_teams.html', teams=teams, programs=programs, coaches=coaches, clubs=clubs)
-
-@app.route('/admin/create_team', methods=['POST'])
-@login_required
-def create_team():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    name = request.form.get('name')
-    program_id = int(request.form.get('program_id'))
-    coach_id = int(request.form.get('coach_id'))
-    club_id = request.form.get('club_id')
-    
-    team = Team(name=name, program_id=program_id, coach_id=coach_id, team_type='team', club_id=int(club_id) if club_id else None)
-    db.session.add(team)
-    db.session.commit()
-    flash('Team created successfully', 'success')
-    return redirect(url_for('manage_teams'))
-
-@app.route('/admin/create_program', methods=['POST'])
-@login_required
-def create_program():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    name = request.form.get('name')
-    description = request.form.get('description')
-    division_id = request.form.get('division_id')
-    frequency_type = request.form.get('frequency_type', 'consecutive')
-    frequency_value = int(request.form.get('frequency_value', 8))
-    frequency_days = request.form.get('frequency_days', None)
-    start_date = request.form.get('start_date')
-    end_date = request.form.get('end_date', None)
-    
-    # Convert date strings to date objects
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
-    
-    program = Program(
-        name=name, 
-        description=description,
-        division_id=int(division_id) if division_id else None,
-        frequency_type=frequency_type,
-        frequency_value=frequency_value,
-        frequency_days=frequency_days,
-        start_date=start_date_obj,
-        end_date=end_date_obj
-    )
-    db.session.add(program)
-    db.session.commit()
-    flash('Program created successfully', 'success')
-    return redirect(url_for('manage_programs'))
-
-@app.route('/admin/update_program/<int:program_id>', methods=['POST'])
-@login_required
-def update_program(program_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    program = Program.query.get_or_404(program_id)
-    
-    program.name = request.form.get('name')
-    program.description = request.form.get('description')
-    division_id = request.form.get('division_id')
-    program.division_id = int(division_id) if division_id else None
-    program.frequency_type = request.form.get('frequency_type', 'consecutive')
-    program.frequency_value = int(request.form.get('frequency_value', 8))
-    program.frequency_days = request.form.get('frequency_days', None)
-    
-    # Handle date updates
-    start_date = request.form.get('start_date')
-    end_date = request.form.get('end_date', None)
-    
-    if start_date:
-        program.start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    if end_date:
-        program.end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-    
-    db.session.commit()
-    flash('Program updated successfully', 'success')
-    return redirect(url_for('manage_programs'))
-
-@app.route('/admin/delete_program/<int:program_id>', methods=['POST'])
-@login_required
-def delete_program(program_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    program = Program.query.get_or_404(program_id)
-    
-    # Check if program has teams
-    if program.teams:
-        flash('Cannot delete program that has teams assigned', 'error')
-        return redirect(url_for('manage_programs'))
-    
-    db.session.delete(program)
-    db.session.commit()
-    flash('Program deleted successfully', 'success')
-    return redirect(url_for('manage_programs'))
-
-@app.route('/admin/update_team/<int:team_id>', methods=['POST'])
-@login_required
-def update_team(team_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    team = Team.query.get_or_404(team_id)
-    team.name = request.form.get('name')
-    team.program_id = int(request.form.get('program_id'))
-    team.coach_id = int(request.form.get('coach_id'))
-    # team_type is always 'team' now, no need to update
-    club_id = request.form.get('club_id')
-    team.club_id = int(club_id) if club_id else None
-    
-    db.session.commit()
-    flash('Team updated successfully', 'success')
-    return redirect(url_for('manage_teams'))
-
-# Admin routes for managing clubs
-
-@app.route('/admin/athletes')
-@login_required
-def manage_athletes():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    athletes = User.query.filter_by(user_type='student').all()
-    teams = Team.query.all()
-    clubs = Club.query.all()
-    programs = Program.query.all()
-    divisions = Division.query.all()
-    return render_template('manage_athletes.html', athletes=athletes, teams=teams, clubs=clubs, programs=programs, divisions=divisions)
-
-@app.route('/admin/create_athlete', methods=['POST'])
-@login_required
-def create_athlete():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    username = request.form.get('username')
-    email = request.form.get('email')
-    password = request.form.get('password')
-    full_name = request.form.get('full_name')
-    club_id = request.form.get('club_id')
-    division_id = request.form.get('division_id')
-    program_id = request.form.get('program_id')
-    team_id = request.form.get('team_id')
-    coach_id = request.form.get('coach_id')
-    participates_snow_stars = request.form.get('participates_snow_stars') == 'on'
-    
-    if User.query.filter_by(username=username).first():
-        flash('Username already exists', 'error')
-        return redirect(url_for('manage_athletes'))
-    
-    if not program_id:
-        flash('Program is required', 'error')
-        return redirect(url_for('manage_athletes'))
-    
-    new_athlete = User(
-        username=username,
-        email=email,
-        password_hash=generate_password_hash(password, method='pbkdf2:sha256'),
-        full_name=full_name,
-        user_type='student',
-        club_id=int(club_id) if club_id else None,
-        division_id=int(division_id) if division_id else None,
-        program_id=int(program_id) if program_id else None,
-        participates_snow_stars=participates_snow_stars,
-        coach_id=int(coach_id) if coach_id else None,
-        team_id=int(team_id) if team_id else None
-    )
-    
-    db.session.add(new_athlete)
-    db.session.commit()
-    flash('Athlete created successfully', 'success')
-    return redirect(url_for('manage_athletes'))
-
-@app.route('/admin/athlete/<int:athlete_id>')
-@login_required
-def view_athlete(athlete_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    athlete = User.query.get_or_404(athlete_id)
-    if athlete.user_type != 'student':
-        flash('User is not an athlete', 'error')
-        return redirect(url_for('dashboard'))
-    
-    evaluations = Evaluation.query.filter_by(student_id=athlete_id).order_by(Evaluation.created_at.desc()).all()
-    return render_template('view_athlete.html', athlete=athlete, evaluations=evaluations)
-
-@app.route('/admin/clubs')
-@login_required
-def manage_clubs():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    clubs = Club.query.all()
-    return render_template('manage_clubs.html', clubs=clubs)
-
-@app.route('/admin/create_club', methods=['POST'])
-@login_required
-def create_club():
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    name = request.form.get('name')
-    description = request.form.get('description')
-    if not name:
-        flash('Club name is required', 'error')
-        return redirect(url_for('manage_clubs'))
-    club = Club(name=name, description=description)
-    db.session.add(club)
-    db.session.commit()
-    flash('Club created successfully', 'success')
-    return redirect(url_for('manage_clubs'))
-
-@app.route('/admin/update_club/<int:club_id>', methods=['POST'])
-@login_required
-def update_club(club_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    club = Club.query.get_or_404(club_id)
-    club.name = request.form.get('name')
-    club.description = request.form.get('description')
-    db.session.commit()
-    flash('Club updated successfully', 'success')
-    return redirect(url_for('manage_clubs'))
-
-@app.route('/admin/delete_club/<int:club_id>', methods=['POST'])
-@login_required
-def delete_club(club_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    club = Club.query.get_or_404(club_id)
-    if club.teams or club.users:
-        flash('Cannot delete club with associated teams or users', 'error')
-        return redirect(url_for('manage_clubs'))
-    db.session.delete(club)
-    db.session.commit()
-    flash('Club deleted successfully', 'success')
-    return redirect(url_for('manage_clubs'))
-
-@app.route('/admin/delete_team/<int:team_id>', methods=['POST'])
-@login_required
-def delete_team(team_id):
-    if current_user.user_type != 'admin':
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    team = Team.query.get_or_404(team_id)
-    
-    # Check if team has students
-    if team.students:
-        flash('Cannot delete team that has students assigned', 'error')
-        return redirect(url_for('manage_teams'))
-    
-    db.session.delete(team)
-    db.session.commit()
-    flash('Team deleted successfully', 'success')
-    return redirect(url_for('manage_teams'))
-
-# Note: Database initialization is handled in api/index.py for Vercel
-
-@app.route('/attendance/<int:team_id>')
-@login_required
-def manage_attendance(team_id):
-    """Manage attendance for a team"""
-    if current_user.user_type not in ['admin', 'coach']:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    team = Team.query.get_or_404(team_id)
-    
-    # Check if coach has access to this team
-    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    # Get students in this team
-    students = User.query.filter_by(team_id=team_id, user_type='student').all()
-    
-    # Get recent attendance records
-    attendance_records = Attendance.query.filter_by(team_id=team_id).order_by(Attendance.session_date.desc()).limit(50).all()
-    
-    return render_template('attendance.html', team=team, students=students, attendance_records=attendance_records)
-
-@app.route('/attendance/<int:team_id>/record', methods=['POST'])
-@login_required
-def record_attendance(team_id):
-    """Record attendance for a team session"""
-    if current_user.user_type not in ['admin', 'coach']:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    team = Team.query.get_or_404(team_id)
-    
-    # Check if coach has access to this team
-    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
-        flash('Access denied', 'error')
-        return redirect(url_for('dashboard'))
-    
-    session_date = datetime.strptime(request.form.get('session_date'), '%Y-%m-%d').date()
-    
-    # Record attendance for each student
-    for student in team.students:
-        attended = request.form.get(f'attended_{student.id}') == 'on'
-        notes = request.form.get(f'notes_{student.id}', '')
-        
-        # Check if attendance already exists for this date
-        existing = Attendance.query.filter_by(
-            student_id=student.id,
-            team_id=team_id,
-            session_date=session_date
-        ).first()
-        
-        if existing:
-            existing.attended = attended
-            existing.notes = notes
-            existing.recorded_by = current_user.id
-        else:
-            attendance = Attendance(
-                student_id=student.id,
-                team_id=team_id,
-                session_date=session_date,
-                attended=attended,
-                notes=notes,
-                recorded_by=current_user.id
-            )
-            db.session.add(attendance)
-    
-    db.session.commit()
-    flash('Attendance recorded successfully', 'success')
-    return redirect(url_for('manage_attendance', team_id=team_id))
+        ensure_search_index()
+        archive.ensure_autoincrement()
+        CompletedLevels.backfill()
+        attendance_bits.backfill()
 
 if __name__ == '__main__':
     # Only run init_db in development
     if os.environ.get('FLASK_ENV') == 'development':
-        with app.app_context():
-            init_db()
+        init_db()
     
     # Development server
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Season rollover: move past-season Attendance and Evaluation rows into
+attendance_archive / evaluation_archive so the hot tables stay small.
+
+Rows keep their original ids, and the athlete_* / get_evaluation helpers read
+both tables, so athlete history pages don't change after a rollover.
+
+    python archive.py                      # archive everything before the current season
+    python archive.py --before 2025-08-01  # explicit boundary
+    python archive.py --dry-run
+"""
+
+import os
+import re
+import sys
+from datetime import date, datetime, time
+from flask import current_app
+from sqlalchemy.schema import CreateTable
+from jobs import task
+from models import db, Attendance, AttendanceArchive, Evaluation, EvaluationArchive, FormSubmission
+import leaderboard
+
+def season_boundary(today=None):
+    """Start date of the season containing today"""
+    today = today or date.today()
+    month = current_app.config.get('SEASON_START_MONTH', 8)
+    day = current_app.config.get('SEASON_START_DAY', 1)
+    start = date(today.year, month, day)
+    return start if today >= start else date(today.year - 1, month, day)
+
+def _rebuild_with_autoincrement(connection, table):
+    """Recreate a SQLite table created before it had AUTOINCREMENT, keeping its rows and indexes"""
+    temporary = f'{table.name}_rebuild'
+    create = str(CreateTable(table).compile(dialect=connection.dialect))
+    create = re.sub(rf'^\s*CREATE TABLE {table.name} ', f'CREATE TABLE {temporary} ', create)
+    existing = {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({table.name})')}
+    indexes = {row[0] for row in connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table.name,))}
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    connection.exec_driver_sql(create)
+    connection.exec_driver_sql(f'INSERT INTO {temporary} ({columns}) SELECT {columns} FROM {table.name}')
+    connection.exec_driver_sql(f'DROP TABLE {table.name}')
+    connection.exec_driver_sql(f'ALTER TABLE {temporary} RENAME TO {table.name}')
+    for index in table.indexes:
+        if index.name in indexes:
+            index.create(connection)
+
+def ensure_autoincrement():
+    """
+    SQLite only: make sure new attendance and evaluation rows can't reuse the
+    id of an archived one. Tables created before they were declared with
+    AUTOINCREMENT are rebuilt, and the id sequence is moved past the highest
+    archived id (safe to re-run).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.create_all()
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+        for model, archive_model in ((Attendance, AttendanceArchive), (Evaluation, EvaluationArchive)):
+            table = model.__table__
+            sql = connection.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).scalar()
+            if 'AUTOINCREMENT' not in sql.upper():
+                _rebuild_with_autoincrement(connection, table)
+            highest = connection.execute(db.select(db.func.max(archive_model.id))).scalar() or 0
+            if connection.exec_driver_sql('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?',
+                                          (highest, table.name)).rowcount == 0:
+                connection.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table.name, highest))
+        connection.commit()
+
+def _move_rows(model, archive_model, older_than, chunk_size, on_chunk=None):
+    """Copy matching rows into the archive table and delete them, one chunk per transaction"""
+    hot = model.__table__
+    columns = [column.name for column in hot.columns]
+    archived_at = datetime.now()
+    moved = 0
+    
+    while True:
+        ids = [id for (id,) in db.session.query(model.id).filter(older_than).order_by(model.id).limit(chunk_size)]
+        if not ids:
+            break
+        
+        rows = db.select(*[hot.c[name] for name in columns], db.literal(archived_at)).where(hot.c.id.in_(ids))
+        db.session.execute(db.insert(archive_model.__table__).from_select(columns + ['archived_at'], rows))
+        db.session.execute(db.delete(hot).where(hot.c.id.in_(ids)))
+        db.session.commit()
+        
+        moved += len(ids)
+        if on_chunk:
+            on_chunk(len(ids))
+    return moved
+
+def count_archivable(boundary):
+    """Rows that a rollover at this boundary would move"""
+    return {
+        'attendance': Attendance.query.filter(Attendance.session_date < boundary).count(),
+        'evaluations': Evaluation.query.filter(Evaluation.created_at < datetime.combine(boundary, time.min)).count()
+    }
+
+def archive_before(boundary, chunk_size=None, progress=None):
+    """Archive attendance and evaluations dated before boundary. Returns row counts."""
+    chunk_size = chunk_size or current_app.config.get('ARCHIVE_CHUNK_SIZE', 5000)
+    ensure_autoincrement()
+    db.create_all()
+    for index in Attendance.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    
+    total = sum(count_archivable(boundary).values())
+    moved = 0
+    
+    def on_chunk(count):
+        nonlocal moved
+        moved += count
+        if progress:
+            progress(moved * 100 // total, f'{moved}/{total} row(s) archived')
+    
+    counts = {
+        'attendance': _move_rows(Attendance, AttendanceArchive, Attendance.session_date < boundary, chunk_size, on_chunk),
+        'evaluations': _move_rows(Evaluation, EvaluationArchive,
+                                  Evaluation.created_at < datetime.combine(boundary, time.min), chunk_size, on_chunk)
+    }
+    # No device still holds a queued post from a past season
+    db.session.query(FormSubmission).filter(FormSubmission.created_at < datetime.combine(boundary, time.min)) \
+        .delete(synchronize_session=False)
+    # Leaderboards rank the current season only
+    leaderboard.mark_all_stale()
+    db.session.commit()
+    return counts
+
+# Archive-aware reads for history views
+
+def athlete_evaluations(athlete_id):
+    """All evaluations for an athlete, current and archived, newest first"""
+    current = Evaluation.query.filter_by(student_id=athlete_id).all()
+    archived = EvaluationArchive.query.filter_by(student_id=athlete_id).all()
+    return sorted(current + archived, key=lambda evaluation: evaluation.created_at, reverse=True)
+
+def athlete_attendance(athlete_id):
+    """All attendance for an athlete, current and archived, newest first"""
+    current = Attendance.query.filter_by(student_id=athlete_id).all()
+    archived = AttendanceArchive.query.filter_by(student_id=athlete_id).all()
+    return sorted(current + archived, key=lambda record: record.session_date, reverse=True)
+
+def get_evaluation(evaluation_id, archived=None):
+    """
+    Look up an evaluation by id: in the archive if archived, the hot table if
+    not, or the hot table then the archive if unknown (old links). Ids only
+    repeat between the two in SQLite databases from before ensure_autoincrement().
+    """
+    if archived:
+        return db.session.get(EvaluationArchive, evaluation_id)
+    if archived is not None:
+        return db.session.get(Evaluation, evaluation_id)
+    return db.session.get(Evaluation, evaluation_id) or db.session.get(EvaluationArchive, evaluation_id)
+
+@task('season_rollover', admin_label='Archive previous seasons')
+def season_rollover_task(job, before=None):
+    boundary = date.fromisoformat(before) if before else season_boundary()
+    counts = archive_before(boundary, progress=job.progress)
+    return dict(counts, before=boundary.isoformat())
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Archive attendance and evaluations from past seasons')
+    parser.add_argument('--before', type=date.fromisoformat, help='Archive rows dated before this day (YYYY-MM-DD)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would move')
+    options = parser.parse_args()
+    
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+    
+    with app.app_context():
+        boundary = options.before or season_boundary()
+        print(f"📅 Season boundary: {boundary}")
+        if options.dry_run:
+            counts = count_archivable(boundary)
+            print(f"Would archive {counts['attendance']} attendance and {counts['evaluations']} evaluation row(s)")
+        else:
+            counts = archive_before(boundary, progress=lambda percent, message: print(f"  {percent}% {message}"))
+            print(f"✅ Archived {counts['attendance']} attendance and {counts['evaluations']} evaluation row(s)")
@@ -0,0 +1,186 @@
+"""
+Versioned, read-only JSON API for the coach mobile app, served over ASGI:
+
+    uvicorn asgi:app --port 5002
+
+It runs next to the Flask WSGI app (which still serves every HTML page) and
+reads the same database through async SQLAlchemy, from the read replica when
+DATABASE_REPLICA_URL is set. Clients authenticate with the session cookie
+they get from logging in through the Flask /login page.
+
+    GET /api/v1/teams
+    GET /api/v1/teams/<id>                  team, roster and each athlete's latest evaluation
+    GET /api/v1/teams/<id>/attendance       optional ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    GET /api/v1/students/<id>/evaluations
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from flask.json.tag import TaggedJSONSerializer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import config
+from dataloader import Loaders, attendance_for_team
+from models import User, Team
+
+logger = logging.getLogger(__name__)
+
+settings = config.get(os.environ.get('FLASK_ENV', 'development'), config['development'])
+
+def async_database_url(url):
+    """Map a sync SQLAlchemy URL onto its async driver"""
+    if url.startswith('sqlite://'):
+        return url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    if url.startswith('postgresql://'):
+        # asyncpg spells libpq's sslmode as ssl
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1).replace('sslmode=', 'ssl=')
+    return url
+
+# Same signing setup as Flask's SecureCookieSessionInterface
+session_serializer = URLSafeTimedSerializer(
+    settings.SECRET_KEY,
+    salt='cookie-session',
+    serializer=TaggedJSONSerializer(),
+    signer_kwargs={'key_derivation': 'hmac', 'digest_method': hashlib.sha1}
+)
+SESSION_MAX_AGE = int(getattr(settings, 'PERMANENT_SESSION_LIFETIME', timedelta(days=31)).total_seconds())
+
+# Read-only, so prefer the replica when there is one
+engine = create_async_engine(
+    async_database_url(settings.SQLALCHEMY_REPLICA_URI or settings.SQLALCHEMY_DATABASE_URI),
+    pool_pre_ping=True
+)
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+async def current_user(headers):
+    """(id, user_type) of the logged-in user from the Flask session cookie"""
+    cookie = SimpleCookie(headers.get('cookie', ''))
+    if 'session' not in cookie:
+        raise HTTPError(401, 'Login required')
+    try:
+        data = session_serializer.loads(cookie['session'].value, max_age=SESSION_MAX_AGE)
+    except BadSignature:
+        raise HTTPError(401, 'Login required')
+    user_id = data.get('_user_id')
+    if not user_id:
+        raise HTTPError(401, 'Login required')
+
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(User.id, User.user_type).where(User.id == int(user_id)))).first()
+    if row is None or row.user_type not in ('admin', 'coach'):
+        raise HTTPError(403, 'Access denied')
+    return row
+
+def check_team_access(user, team):
+    if team is None:
+        raise HTTPError(404, 'Not found')
+    if user.user_type == 'coach' and team['coach_id'] != user.id:
+        raise HTTPError(403, 'Access denied')
+
+async def list_teams(user, loaders, query):
+    stmt = select(Team.id).order_by(Team.name)
+    if user.user_type == 'coach':
+        stmt = stmt.where(Team.coach_id == user.id)
+    async with engine.connect() as conn:
+        team_ids = (await conn.execute(stmt)).scalars().all()
+
+    teams, rosters = await loaders.team.load_many(team_ids), await loaders.students_by_team.load_many(team_ids)
+    return {'teams': [dict(team, student_count=len(roster or [])) for team, roster in zip(teams, rosters)]}
+
+async def get_team(user, loaders, query, team_id):
+    team = await loaders.team.load(team_id)
+    check_team_access(user, team)
+    students = await loaders.students_by_team.load(team_id) or []
+    evaluations = await loaders.latest_evaluation.load_many([student['id'] for student in students])
+    roster = [dict(student, latest_evaluation=evaluation) for student, evaluation in zip(students, evaluations)]
+    return {'team': dict(team, students=roster)}
+
+async def get_team_attendance(user, loaders, query, team_id):
+    check_team_access(user, await loaders.team.load(team_id))
+    try:
+        start = date.fromisoformat(query['from'][0]) if 'from' in query else None
+        end = date.fromisoformat(query['to'][0]) if 'to' in query else None
+    except ValueError:
+        raise HTTPError(400, 'Dates must be YYYY-MM-DD')
+    return {'attendance': await attendance_for_team(engine, team_id, start, end)}
+
+async def get_student_evaluations(user, loaders, query, student_id):
+    async with engine.connect() as conn:
+        student = (await conn.execute(
+            select(User.id, User.full_name, User.team_id).where(User.id == student_id, User.user_type == 'student')
+        )).first()
+    if student is None:
+        raise HTTPError(404, 'Not found')
+    if user.user_type != 'admin':
+        # Admins see every athlete, including ones not on a team yet
+        check_team_access(user, await loaders.team.load(student.team_id) if student.team_id else None)
+    return {
+        'student': {'id': student.id, 'full_name': student.full_name, 'team_id': student.team_id},
+        'evaluations': await loaders.evaluations_by_student.load(student_id) or []
+    }
+
+ROUTES = [
+    (re.compile(r'^/api/v1/teams/?$'), list_teams),
+    (re.compile(r'^/api/v1/teams/(\d+)/?$'), get_team),
+    (re.compile(r'^/api/v1/teams/(\d+)/attendance/?$'), get_team_attendance),
+    (re.compile(r'^/api/v1/students/(\d+)/evaluations/?$'), get_student_evaluations),
+]
+
+async def send_json(send, status, body):
+    payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    try:
+        if scope['method'] not in ('GET', 'HEAD'):
+            raise HTTPError(405, 'Method not allowed')
+        for pattern, handler in ROUTES:
+            match = pattern.match(scope['path'])
+            if match:
+                break
+        else:
+            raise HTTPError(404, 'Not found')
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        user = await current_user(headers)
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        body = await handler(user, Loaders(engine), query, *[int(arg) for arg in match.groups()])
+        await send_json(send, 200, body)
+    except HTTPError as e:
+        await send_json(send, e.status, {'error': e.message})
+    except Exception:
+        # Anything else would leave the client waiting on a response that never starts
+        logger.exception(f"{scope['method']} {scope['path']} failed")
+        await send_json(send, 500, {'error': 'Internal server error'})
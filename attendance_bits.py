@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Compact attendance bitsets (the attendance_bits table).
+
+Each row covers one athlete on one team for one season. Bit n of
+recorded_mask / attended_mask is day n counted from the season start, so a
+whole season fits in under 50 bytes per mask. Notes are stored only for the
+days that have one. Rates and streaks are popcounts and shifts on the masks
+instead of scans over Attendance rows.
+
+Attendance is still the source of truth: record_session() runs inside the
+same transaction as every Attendance write, and rebuild() regenerates the
+bitsets from Attendance and attendance_archive.
+
+    python attendance_bits.py --rebuild
+    python attendance_bits.py --verify
+"""
+
+import json
+import os
+import sys
+from archive import season_boundary
+from models import db, Attendance, AttendanceArchive, AttendanceBits
+
+def day_bit(season_start, session_date):
+    return 1 << (session_date - season_start).days
+
+def record_session(team_id, session_date, marks):
+    """
+    Mirror one team session into the bitsets. marks is {student_id: (attended, notes)};
+    notes of None leaves that day's note alone. Runs in the caller's transaction; the caller commits.
+    """
+    if not marks:
+        return
+    season_start = season_boundary(session_date)
+    bit = day_bit(season_start, session_date)
+    day = str((session_date - season_start).days)
+
+    rows = {row.student_id: row for row in AttendanceBits.query.filter(
+        AttendanceBits.team_id == team_id,
+        AttendanceBits.season_start == season_start,
+        AttendanceBits.student_id.in_(list(marks))
+    ).with_for_update()}
+
+    for student_id, (attended, notes) in marks.items():
+        row = rows.get(student_id)
+        if row is None:
+            row = AttendanceBits(student_id=student_id, team_id=team_id, season_start=season_start)
+            db.session.add(row)
+        row.recorded = row.recorded | bit
+        row.attended = row.attended | bit if attended else row.attended & ~bit
+
+        if notes is None:
+            continue  # Notes left as they were
+        row_notes = json.loads(row.notes) if row.notes else {}
+        if notes:
+            row_notes[day] = notes
+        else:
+            row_notes.pop(day, None)
+        row.notes = json.dumps(row_notes) if row_notes else None
+
+def current_streak(recorded, attended):
+    """Sessions attended in a row, counting back from the latest recorded session"""
+    absent = recorded & ~attended
+    return (attended >> absent.bit_length()).bit_count()
+
+def longest_streak(recorded, attended):
+    absent = recorded & ~attended
+    best = start = 0
+    while absent:
+        lowest = absent & -absent
+        best = max(best, ((attended & (lowest - 1)) >> start).bit_count())
+        start = lowest.bit_length()
+        absent ^= lowest
+    return max(best, (attended >> start).bit_count())
+
+def bits_stats(row):
+    recorded, attended = row.recorded, row.attended
+    sessions, present = recorded.bit_count(), attended.bit_count()
+    return {
+        'sessions': sessions,
+        'attended': present,
+        'rate': round(present / sessions, 3) if sessions else None,
+        'current_streak': current_streak(recorded, attended),
+        'longest_streak': longest_streak(recorded, attended)
+    }
+
+def team_summary(team_id, season_start=None):
+    """{student_id: stats} for a team's season, from one indexed read"""
+    season_start = season_start or season_boundary()
+    rows = AttendanceBits.query.filter_by(team_id=team_id, season_start=season_start).all()
+    return {row.student_id: bits_stats(row) for row in rows}
+
+def athlete_summary(student_id):
+    """Stats per team and season for one athlete, newest season first"""
+    rows = AttendanceBits.query.filter_by(student_id=student_id) \
+        .order_by(AttendanceBits.season_start.desc(), AttendanceBits.team_id).all()
+    return [dict(bits_stats(row), team_id=row.team_id, season_start=row.season_start) for row in rows]
+
+def _build_masks():
+    """Bitsets for every (student, team, season) from Attendance and attendance_archive"""
+    masks = {}
+    seasons = {}
+    for model in (Attendance, AttendanceArchive):
+        rows = db.session.query(model.student_id, model.team_id, model.session_date, model.attended, model.notes) \
+            .execution_options(yield_per=10000)
+        for student_id, team_id, session_date, attended, notes in rows:
+            season_start = seasons.get(session_date)
+            if season_start is None:
+                season_start = seasons[session_date] = season_boundary(session_date)
+            key = (student_id, team_id, season_start)
+            entry = masks.get(key)
+            if entry is None:
+                entry = masks[key] = [0, 0, {}]
+            bit = day_bit(season_start, session_date)
+            entry[0] |= bit
+            if attended:
+                entry[1] |= bit
+            if notes:
+                entry[2][str((session_date - season_start).days)] = notes
+    return masks
+
+def _to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+def rebuild(chunk_size=5000):
+    """Replace every bitset with one rebuilt from the attendance tables. Returns the row count."""
+    masks = _build_masks()
+    db.session.query(AttendanceBits).delete()
+    rows = [{
+        'student_id': student_id,
+        'team_id': team_id,
+        'season_start': season_start,
+        'recorded_mask': _to_bytes(recorded),
+        'attended_mask': _to_bytes(attended),
+        'notes': json.dumps(notes) if notes else None
+    } for (student_id, team_id, season_start), (recorded, attended, notes) in masks.items()]
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(db.insert(AttendanceBits), rows[start:start + chunk_size])
+    db.session.commit()
+    return len(rows)
+
+def backfill():
+    """Build the bitsets once, when the table is still empty"""
+    AttendanceBits.__table__.create(db.engine, checkfirst=True)
+    if not db.session.query(AttendanceBits).first():
+        rebuild()
+
+def verify():
+    """(student_id, team_id, season_start) keys whose bitsets don't match the attendance tables"""
+    expected = _build_masks()
+    mismatched = []
+    seen = set()
+    for row in AttendanceBits.query.yield_per(10000):
+        key = (row.student_id, row.team_id, row.season_start)
+        seen.add(key)
+        recorded, attended, notes = expected.get(key, (0, 0, {}))
+        if (row.recorded, row.attended, json.loads(row.notes) if row.notes else {}) != (recorded, attended, notes):
+            mismatched.append(key)
+    mismatched.extend(key for key in expected if key not in seen)
+    return mismatched
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintain the compact attendance bitsets')
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--rebuild', action='store_true', help='Regenerate every bitset from the attendance tables')
+    action.add_argument('--verify', action='store_true', help='Report bitsets that disagree with the attendance tables')
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+
+    with app.app_context():
+        if options.rebuild:
+            print(f"✅ Rebuilt {rebuild()} attendance bitset(s)")
+        else:
+            mismatched = verify()
+            for student_id, team_id, season_start in mismatched[:20]:
+                print(f"  ❌ student {student_id}, team {team_id}, season {season_start}")
+            print(f"{'❌' if mismatched else '✅'} {len(mismatched)} bitset(s) out of sync")
+            sys.exit(1 if mismatched else 0)
@@ -0,0 +1,93 @@
+"""
+Season attendance grid: a team's students x session dates, built from one
+query and pivoted in Python.
+
+Cells are packed into one string per student ('P' present, 'A' absent,
+'.' no record), which keeps both the template loop and the JSON small.
+"""
+
+from datetime import date
+from flask import current_app
+from sqlalchemy import null, select, union_all
+from archive import season_boundary
+from models import db, User, Attendance, AttendanceArchive
+
+PRESENT, ABSENT, MISSING = 'P', 'A', '.'
+
+def season_range(season=None):
+    """(start, end) of the season starting in the given year, default the current season"""
+    month = current_app.config.get('SEASON_START_MONTH', 8)
+    day = current_app.config.get('SEASON_START_DAY', 1)
+    start = date(season, month, day) if season else season_boundary()
+    return start, date(start.year + 1, month, day)
+
+def _attendance_source(start):
+    """Attendance rows for a season; past seasons may already be in the archive"""
+    columns = ('student_id', 'team_id', 'session_date', 'attended', 'notes')
+    if start >= season_boundary():
+        return Attendance.__table__
+    return union_all(
+        select(*[Attendance.__table__.c[name] for name in columns]),
+        select(*[AttendanceArchive.__table__.c[name] for name in columns])
+    ).subquery()
+
+def team_attendance_grid(team_id, season=None):
+    """
+    The team roster against every session date of the season, with per-athlete
+    and per-date attendance rates (present / recorded, None when nothing is recorded).
+    """
+    start, end = season_range(season)
+    source = _attendance_source(start)
+    # The team's season rows (found through the team/date index), whoever is on
+    # the team now, so athletes who have since moved or been deactivated keep
+    # their part of the season; plus one empty row per athlete on the team
+    # now, so those with no records still show
+    records = select(User.id, User.full_name, source.c.session_date, source.c.attended, source.c.notes) \
+        .join(User, User.id == source.c.student_id) \
+        .where(source.c.team_id == team_id, source.c.session_date >= start, source.c.session_date < end,
+               User.user_type == 'student')
+    roster = select(User.id, User.full_name, null(), null(), null()) \
+        .where(User.team_id == team_id, User.user_type == 'student')
+    grid = union_all(records, roster).subquery()
+    rows = db.session.execute(select(grid).order_by(grid.c.full_name, grid.c.id)).all()
+
+    dates = sorted(set(row.session_date for row in rows if row.session_date))
+    column = {session_date: index for index, session_date in enumerate(dates)}
+    date_present = [0] * len(dates)
+    date_recorded = [0] * len(dates)
+
+    students = []
+    by_id = {}
+    for student_id, full_name, session_date, attended, notes in rows:
+        student = by_id.get(student_id)
+        if student is None:
+            student = by_id[student_id] = {'id': student_id, 'full_name': full_name,
+                                           'cells': [MISSING] * len(dates), 'notes': {}}
+            students.append(student)
+        if session_date is None:
+            continue
+        index = column[session_date]
+        student['cells'][index] = PRESENT if attended else ABSENT
+        date_recorded[index] += 1
+        if attended:
+            date_present[index] += 1
+        if notes:
+            student['notes'][session_date.isoformat()] = notes
+
+    for student in students:
+        cells = ''.join(student['cells'])
+        present, absent = cells.count(PRESENT), cells.count(ABSENT)
+        student['cells'] = cells
+        student['present'] = present
+        student['recorded'] = present + absent
+        student['rate'] = round(present / (present + absent), 3) if present + absent else None
+
+    total_present, total_recorded = sum(date_present), sum(date_recorded)
+    return {
+        'season': {'start': start.isoformat(), 'end': end.isoformat()},
+        'dates': [session_date.isoformat() for session_date in dates],
+        'date_rates': [round(present / recorded, 3) if recorded else None
+                       for present, recorded in zip(date_present, date_recorded)],
+        'students': students,
+        'rate': round(total_present / total_recorded, 3) if total_recorded else None
+    }
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Write-behind check-ins for the morning rush.
+
+Each athlete gets a signed check-in link (printed as a QR code). Opening it
+only appends one row to the check_in table, so hundreds of check-ins a minute
+never contend for the team's Attendance rows. A flusher moves buffered
+check-ins into Attendance (and the attendance bitsets) in batched
+transactions every CHECKIN_FLUSH_INTERVAL seconds, backing off towards
+CHECKIN_IDLE_INTERVAL while the buffer stays empty.
+
+The flusher runs as its own process (the Procfile's `checkin`):
+
+    python checkin.py
+
+or, where that isn't deployed, as a thread in each web process started on
+the first check-in (CHECKIN_FLUSH_THREAD=1). Don't do both.
+"""
+
+import os
+import signal
+import sys
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import delete, select, tuple_, update
+import attendance_bits
+import live
+from models import db, Attendance, CheckIn, Team
+
+try:
+    import qrcode  # Optional, only needed to print QR codes on the check-in cards
+    import qrcode.image.svg
+except ImportError:
+    qrcode = None
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='checkin')
+
+def check_in_token(student_id):
+    """Token for an athlete's check-in link. It doesn't expire, so printed cards last the season."""
+    return _serializer().dumps(student_id)
+
+def read_check_in_token(token):
+    """Student id from a check-in token, or None if it was tampered with"""
+    try:
+        student_id = _serializer().loads(token)
+    except BadSignature:
+        return None
+    return student_id if isinstance(student_id, int) else None
+
+def qr_svg(url):
+    """Inline SVG QR code for a check-in URL, or None when qrcode isn't installed"""
+    if qrcode is None:
+        return None
+    image = qrcode.make(url, image_factory=qrcode.image.svg.SvgPathImage, box_size=8)
+    return image.to_string(encoding='unicode')
+
+def enqueue_check_in(student_id, team_id, checked_in_by, session_date=None):
+    """Buffer a check-in. One small INSERT, nothing else is read or locked."""
+    db.session.add(CheckIn(
+        student_id=student_id,
+        team_id=team_id,
+        session_date=session_date or date.today(),
+        checked_in_by=checked_in_by,
+        checked_in_at=datetime.now()
+    ))
+    db.session.commit()
+
+def flush_check_ins(batch_size=None):
+    """Move up to batch_size buffered check-ins into Attendance in one transaction. Returns how many."""
+    batch_size = batch_size or current_app.config.get('CHECKIN_BATCH_SIZE', 500)
+    batch = uuid.uuid4().hex
+
+    # Claim the oldest unclaimed rows. A concurrent flusher re-checks batch IS NULL and skips them.
+    pending = select(CheckIn.id).where(CheckIn.batch.is_(None)).order_by(CheckIn.id).limit(batch_size)
+    if not db.session.scalar(select(pending.exists())):
+        # Nothing buffered: a read, so an idle flusher never takes a write lock
+        db.session.rollback()
+        return 0
+    claimed = db.session.execute(
+        update(CheckIn).where(CheckIn.id.in_(pending.scalar_subquery()), CheckIn.batch.is_(None))
+        .values(batch=batch).execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return 0
+
+    try:
+        check_ins = {}
+        for student_id, team_id, session_date, checked_in_by in db.session.query(
+                CheckIn.student_id, CheckIn.team_id, CheckIn.session_date, CheckIn.checked_in_by
+        ).filter(CheckIn.batch == batch).order_by(CheckIn.id):
+            # Repeated scans of the same athlete collapse into one record
+            check_ins[(student_id, team_id, session_date)] = checked_in_by
+
+        existing = Attendance.query.filter(
+            tuple_(Attendance.student_id, Attendance.team_id, Attendance.session_date).in_(list(check_ins))
+        ).all()
+        for record in existing:
+            key = (record.student_id, record.team_id, record.session_date)
+            if not record.attended:
+                # Marked absent before they arrived
+                record.attended = True
+                record.recorded_by = check_ins[key]
+            del check_ins[key]
+
+        if check_ins:
+            db.session.execute(db.insert(Attendance), [{
+                'student_id': student_id,
+                'team_id': team_id,
+                'session_date': session_date,
+                'attended': True,
+                'recorded_by': checked_in_by
+            } for (student_id, team_id, session_date), checked_in_by in check_ins.items()])
+
+        sessions = defaultdict(dict)
+        for record in existing:
+            sessions[(record.team_id, record.session_date)][record.student_id] = (True, None)
+        for student_id, team_id, session_date in check_ins:
+            sessions[(team_id, session_date)][student_id] = (True, None)
+        clubs = dict(db.session.query(Team.id, Team.club_id).filter(Team.id.in_({team_id for team_id, _ in sessions})))
+        for (team_id, session_date), marks in sessions.items():
+            attendance_bits.record_session(team_id, session_date, marks)
+            live.publish(live.team_channels(team_id, clubs.get(team_id)), 'attendance', {
+                'team_id': team_id,
+                'session_date': session_date.isoformat(),
+                'marks': {student_id: True for student_id in marks}
+            })
+
+        db.session.execute(delete(CheckIn).where(CheckIn.batch == batch).execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return claimed
+
+def pending_count():
+    return db.session.query(CheckIn).filter(CheckIn.batch.is_(None)).count()
+
+class Flusher(threading.Thread):
+    """Flushes buffered check-ins until stopped"""
+
+    def __init__(self, app, stop_event):
+        super().__init__(name='checkin-flusher', daemon=True)
+        self.app = app
+        self.stop_event = stop_event
+
+    def run(self):
+        busy_interval = self.app.config.get('CHECKIN_FLUSH_INTERVAL', 0.25)
+        idle_interval = max(busy_interval, self.app.config.get('CHECKIN_IDLE_INTERVAL', 5))
+        batch_size = self.app.config.get('CHECKIN_BATCH_SIZE', 500)
+        interval = busy_interval
+        while not self.stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    flushed = flush_check_ins(batch_size)
+                if flushed == batch_size:
+                    continue  # More waiting, don't sleep
+                # Poll quickly during the rush, and less and less often while nothing arrives
+                interval = busy_interval if flushed else min(interval * 2, idle_interval)
+            except Exception as e:
+                self.app.logger.error(f"Check-in flush failed: {e}", exc_info=True)
+            self.stop_event.wait(interval)
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def ensure_flusher(app):
+    """Start this process's flusher thread if it isn't running (e.g. after a fork)"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = Flusher(app, threading.Event())
+            _flusher.start()
+    return _flusher
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Flush buffered check-ins into attendance')
+    parser.add_argument('--once', action='store_true', help='Flush everything pending and exit')
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+
+    with app.app_context():
+        db.create_all()
+        if options.once:
+            total = 0
+            while True:
+                flushed = flush_check_ins()
+                total += flushed
+                if not flushed:
+                    break
+            print(f"✅ Flushed {total} check-in(s)")
+            sys.exit(0)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    flusher = Flusher(app, stop_event)
+    flusher.start()
+    print(f"🚀 Flushing check-ins every {app.config['CHECKIN_FLUSH_INTERVAL']}s "
+          f"(up to {app.config['CHECKIN_IDLE_INTERVAL']}s when idle). Press Ctrl+C to stop.")
+    try:
+        while not stop_event.is_set():
+            stop_event.wait(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+    flusher.join()
+    print("✓ Flusher stopped")
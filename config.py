@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -10,6 +11,93 @@ class Config:
     # Use environment variable for production database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(os.path.dirname(__file__), "athlete_evaluation.db")}'
     
+    # Optional read replica (see replica.py). GET requests read from it unless
+    # the same browser wrote within REPLICA_PIN_SECONDS.
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+    
+    # Import each module in the views package on the first request that uses
+    # it, instead of at startup (see views/__init__.py)
+    LAZY_VIEWS = os.environ.get('LAZY_VIEWS', '1') == '1'
+    
+    # Login protection (see login_guard.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')  # Older hashes are upgraded at login
+    LOGIN_HASH_THREADS = int(os.environ.get('LOGIN_HASH_THREADS', 2))  # Concurrent password checks per process
+    LOGIN_HASH_QUEUE = int(os.environ.get('LOGIN_HASH_QUEUE', 8))  # Checks allowed to wait before logins get a 503
+    LOGIN_HASH_TIMEOUT = 10  # Seconds
+    LOGIN_FAILURES_PER_USER = (5, 60)  # (burst, seconds per extra attempt) of failed logins per username
+    LOGIN_FAILURES_PER_IP = (20, 3)  # The same per client IP
+    # Addresses or networks (comma-separated) of the proxies whose X-Forwarded-For
+    # gives the client IP, e.g. 127.0.0.1 behind nginx on the same host, or *
+    # where only the proxy can reach the app (Vercel). Empty trusts no one.
+    LOGIN_TRUSTED_PROXIES = os.environ.get('LOGIN_TRUSTED_PROXIES', '')
+    
+    # Background jobs (see jobs.py). Worker threads inside the web process are
+    # off by default; run `python jobs.py` as a separate worker process instead.
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 0))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # Seconds between queue polls
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_DELAY = 30  # Seconds, doubled after each failed attempt
+    JOB_STALE_AFTER = 600  # Seconds without a heartbeat before a running job is requeued
+    JOB_STALE_CHECK_INTERVAL = 60  # Seconds between each worker's checks for stale jobs
+    
+    # Season rollover (see archive.py). Rows dated before the start of the
+    # current season are moved to the archive tables.
+    SEASON_START_MONTH = int(os.environ.get('SEASON_START_MONTH', 8))
+    SEASON_START_DAY = int(os.environ.get('SEASON_START_DAY', 1))
+    ARCHIVE_CHUNK_SIZE = 5000  # Rows moved per transaction
+    
+    # Single-athlete check-ins (see checkin.py) are buffered in the check_in
+    # table and flushed to Attendance in batches. The flusher thread inside the
+    # web process is off by default; the Procfile runs `python checkin.py` as
+    # its own process instead. Turn it on only where that process isn't run.
+    CHECKIN_FLUSH_THREAD = os.environ.get('CHECKIN_FLUSH_THREAD', '0') == '1'
+    CHECKIN_FLUSH_INTERVAL = float(os.environ.get('CHECKIN_FLUSH_INTERVAL', 0.25))  # Seconds between flushes
+    CHECKIN_IDLE_INTERVAL = float(os.environ.get('CHECKIN_IDLE_INTERVAL', 5))  # Longest wait, backing off while nothing arrives
+    CHECKIN_BATCH_SIZE = 500  # Check-ins per flush transaction
+    
+    # Live boards (see live.py). 'postgres' relays events between processes
+    # with LISTEN/NOTIFY; 'memory' only reaches subscribers in the same process.
+    LIVE_BROKER = os.environ.get('LIVE_BROKER') or \
+        ('postgres' if (os.environ.get('DATABASE_URL') or '').startswith('postgres') else 'memory')
+    LIVE_STREAM_SECONDS = int(os.environ.get('LIVE_STREAM_SECONDS', 300))  # Streams close after this; browsers reconnect
+    # Open streams per process, each holding a gunicorn thread; keep it below GUNICORN_THREADS
+    LIVE_MAX_STREAMS = int(os.environ.get('LIVE_MAX_STREAMS', 4))
+    LIVE_HEARTBEAT_SECONDS = 15
+    LIVE_QUEUE_SIZE = 100  # Events buffered per subscriber before the oldest are dropped
+    
+    # Snow Stars leaderboards (see leaderboard.py)
+    LEADERBOARD_PAGE_SIZE = 25
+    
+    # Streamed admin tables (dashboard, manage_athletes, manage_teams)
+    STREAM_YIELD_PER = 500  # Rows fetched and rendered per batch
+    STREAM_CHUNK_SIZE = 16384  # Characters buffered before each write to the client
+    
+    # Rendered dashboard sections (see fragment_cache.py): memory, file:///dir,
+    # redis://host:port/db or none. The memory backend isn't shared between
+    # workers, so a write in one wouldn't invalidate the others' copies; for
+    # the same reason the temp-dir default is off on Vercel, where every
+    # instance has its own /tmp. Set a redis:// URL there to cache.
+    FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE') or \
+        ('none' if os.environ.get('VERCEL') else 'file://' + os.path.join(tempfile.gettempdir(), 'snow-stars-fragments'))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 600))  # Seconds; invalidation normally comes first
+    FRAGMENT_CACHE_MAX_ENTRIES = 2000  # memory backend only
+    REFERENCE_MAX_AGE = int(os.environ.get('REFERENCE_MAX_AGE', 60))  # Seconds before program/club/division lists reload anyway
+    
+    # Season report cards (see reports.py)
+    REPORTS_DIR = os.environ.get('REPORTS_DIR') or os.path.join(os.path.dirname(__file__), 'reports')
+    REPORT_PROCESSES = int(os.environ.get('REPORT_PROCESSES', 0)) or None  # None = one per CPU
+    
+    # Slow-query log (see slow_queries.py): statements slower than
+    # SLOW_QUERY_MS are logged with their plan; 0 turns it off.
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 250))
+    SLOW_QUERY_ANALYZE = os.environ.get('SLOW_QUERY_ANALYZE', '0') == '1'  # Postgres: EXPLAIN ANALYZE slow SELECTs, running them twice
+    SLOW_QUERY_EXPLAIN_EVERY = 300  # Seconds before the same statement's plan is taken again
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG') or \
+        os.path.join(tempfile.gettempdir(), 'snow-stars-slow-queries.jsonl')
+    SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024  # Rotated past this size
+    SLOW_QUERY_LOG_BACKUPS = 3
+    
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
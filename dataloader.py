@@ -0,0 +1,128 @@
+"""
+DataLoader-style batching for the async JSON API (asgi.py).
+
+Every load() made while resolving one level of a response is collected and
+answered by a single batch query, so nested resources such as
+team -> students -> latest evaluation cost one query per level no matter how
+many rows are involved. Loaders cache per request.
+"""
+
+import asyncio
+from collections import defaultdict
+from sqlalchemy import select, func
+from models import User, Team, Program, Evaluation, Attendance
+
+class DataLoader:
+    """Batches load(key) calls made in the same event loop turn into one batch_fn(keys) call"""
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self.cache = {}
+        self.queue = []
+
+    def load(self, key):
+        if key in self.cache:
+            return self.cache[key]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.cache[key] = future
+        self.queue.append((key, future))
+        if len(self.queue) == 1:
+            # Runs after every task already scheduled in this turn has queued its keys
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+
+    def load_many(self, keys):
+        return asyncio.gather(*[self.load(key) for key in keys])
+
+    async def _dispatch(self):
+        batch, self.queue = self.queue, []
+        try:
+            results = await self.batch_fn([key for key, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for key, future in batch:
+            future.set_result(results.get(key))
+
+class Loaders:
+    """The loaders for one API request, sharing an async engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.team = DataLoader(self._teams)
+        self.students_by_team = DataLoader(self._students_by_team)
+        self.latest_evaluation = DataLoader(self._latest_evaluations)
+        self.evaluations_by_student = DataLoader(self._evaluations_by_student)
+
+    async def _rows(self, stmt):
+        # Each batch gets its own pooled connection, so loaders can dispatch concurrently
+        async with self.engine.connect() as conn:
+            return (await conn.execute(stmt)).mappings().all()
+
+    async def _teams(self, team_ids):
+        Coach = User.__table__.alias('coach')
+        rows = await self._rows(
+            select(Team.id, Team.name, Team.coach_id, Team.club_id,
+                   Program.name.label('program'), Coach.c.full_name.label('coach'))
+            .join(Program, Program.id == Team.program_id)
+            .join(Coach, Coach.c.id == Team.coach_id)
+            .where(Team.id.in_(team_ids))
+        )
+        return {row['id']: dict(row) for row in rows}
+
+    async def _students_by_team(self, team_ids):
+        rows = await self._rows(
+            select(User.id, User.full_name, User.username, User.team_id, User.participates_snow_stars)
+            .where(User.user_type == 'student', User.team_id.in_(team_ids))
+            .order_by(User.full_name)
+        )
+        students = defaultdict(list)
+        for row in rows:
+            students[row['team_id']].append(dict(row))
+        return students
+
+    async def _latest_evaluations(self, student_ids):
+        latest = select(Evaluation.student_id, func.max(Evaluation.id).label('id')) \
+            .where(Evaluation.student_id.in_(student_ids)) \
+            .group_by(Evaluation.student_id).subquery()
+        rows = await self._rows(
+            select(*_evaluation_columns()).join(latest, latest.c.id == Evaluation.id)
+        )
+        return {row['student_id']: _evaluation_dict(row) for row in rows}
+
+    async def _evaluations_by_student(self, student_ids):
+        rows = await self._rows(
+            select(*_evaluation_columns())
+            .where(Evaluation.student_id.in_(student_ids))
+            .order_by(Evaluation.created_at.desc())
+        )
+        evaluations = defaultdict(list)
+        for row in rows:
+            evaluations[row['student_id']].append(_evaluation_dict(row))
+        return evaluations
+
+def _evaluation_columns():
+    return (Evaluation.id, Evaluation.student_id, Evaluation.coach_id, Evaluation.sport_type, Evaluation.level,
+            Evaluation.skills_score, Evaluation.attitude_score, Evaluation.performance_score,
+            Evaluation.movement_quality_score, Evaluation.balance_score, Evaluation.control_score,
+            Evaluation.awareness_score, Evaluation.comments, Evaluation.created_at)
+
+def _evaluation_dict(row):
+    evaluation = dict(row)
+    evaluation['created_at'] = row['created_at'].isoformat()
+    evaluation['average_score'] = round((row['skills_score'] + row['attitude_score'] + row['performance_score']) / 3, 2)
+    return evaluation
+
+async def attendance_for_team(engine, team_id, start=None, end=None):
+    """Attendance rows for a team, newest first"""
+    stmt = select(Attendance.id, Attendance.student_id, Attendance.session_date, Attendance.attended, Attendance.notes) \
+        .where(Attendance.team_id == team_id)
+    if start:
+        stmt = stmt.where(Attendance.session_date >= start)
+    if end:
+        stmt = stmt.where(Attendance.session_date <= end)
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt.order_by(Attendance.session_date.desc(), Attendance.student_id))).mappings().all()
+    return [dict(row, session_date=row['session_date'].isoformat()) for row in rows]
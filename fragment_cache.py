@@ -0,0 +1,370 @@
+"""
+Cache for rendered page fragments, invalidated by the writes that change them.
+
+A fragment is cached per user under a name and a list of dependency tags
+("coach:<id>", "team:<id>", "program:<id>"). Each tag has a random version
+token in the store; a fragment is saved along with the tokens its tags had
+before it was rendered and is only served while all of them still match.
+Invalidating a tag gives it a new token, which orphans every fragment that
+depended on it without having to find them. A tag that was evicted or
+expired gets a fresh token too, so eviction can only cause a miss, never a
+stale hit.
+
+Routes call invalidate() while they write; tags are bumped only when the
+transaction commits and dropped on rollback, so a fragment rendered from
+uncommitted data can't outlive it.
+
+Backends (FRAGMENT_CACHE):
+
+  memory                      LRU in this process only. Fine for the dev
+                              server or a single worker.
+  file:///path/to/dir         One file per entry, shared by every process on
+                              the host. The default, under the temp dir,
+                              except on Vercel (below).
+  redis://[:password@]host:port/db
+                              Anything that speaks the Redis protocol
+                              (Redis, Valkey, KeyDB, Dragonfly), shared by
+                              every host.
+  none                        Always render. The default on Vercel, where
+                              each instance has its own /tmp, so a write on
+                              one couldn't invalidate the others' entries.
+
+A broken backend never breaks a page: errors are logged and the fragment
+is rendered as if it were a miss.
+"""
+
+import abc
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+from flask import current_app
+from markupsafe import Markup
+from sqlalchemy import event
+from models import db
+
+PENDING_KEY = 'fragment_tags'
+
+class FragmentCacheError(Exception):
+    pass
+
+class Backend(abc.ABC):
+    """String keys to string values. Values set without a ttl never expire."""
+
+    @abc.abstractmethod
+    def get_many(self, keys):
+        pass
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    @abc.abstractmethod
+    def add(self, key, value):
+        """Set only if the key is missing. Returns True if it was set."""
+
+class NullBackend(Backend):
+    """Stores nothing, so tags have no version (tag_version() returns None)"""
+
+    def get_many(self, keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def add(self, key, value):
+        return False
+
+class MemoryBackend(Backend):
+    """Least recently used entries beyond max_entries are evicted"""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires and expires < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key, value):
+        with self._lock:
+            if self._get(key, time.monotonic()) is not None:
+                return False
+            self._set(key, value, None)
+            return True
+
+class FileBackend(Backend):
+    """
+    One file per key: the first line is the expiry (a Unix time, 0 for
+    never), the rest the value. Writes go to a temporary file first, so
+    readers never see half an entry.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                expires = float(f.readline())
+                value = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if expires and expires < time.time():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return value
+
+    def _write_temp(self, value, ttl):
+        temp = os.path.join(self.directory, f'.tmp-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}')
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(f'{time.time() + ttl if ttl else 0}\n')
+            f.write(value)
+        return temp
+
+    def get_many(self, keys):
+        return [self._read(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        os.replace(self._write_temp(value, ttl), self._path(key))
+
+    def add(self, key, value):
+        if self._read(key) is not None:  # Also clears out an expired entry
+            return False
+        temp = self._write_temp(value, None)
+        try:
+            # link() fails if another process created the entry first
+            os.link(temp, self._path(key))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temp)
+
+class RedisBackend(Backend):
+    """
+    Minimal Redis protocol (RESP) client: MGET, SET ... PX and SET ... NX are
+    all this needs, so it carries no client library. One connection per
+    thread, reopened after a fork or an error.
+    """
+
+    def __init__(self, url, timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.database = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0  # After a failed connect, don't make every page wait on the timeout
+
+    def _connect(self):
+        connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.connection = connection
+        self._local.reader = connection.makefile('rb')
+        self._local.pid = os.getpid()
+        if self.password:
+            self._command('AUTH', *([self.username] if self.username else []), self.password)
+        if self.database:
+            self._command('SELECT', self.database)
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def _command(self, *args):
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f'${len(data)}\r\n'.encode() + data + b'\r\n')
+        self._local.connection.sendall(b''.join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Redis closed the connection')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise FragmentCacheError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            return self._local.reader.read(length + 2)[:-2].decode('utf-8')
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise FragmentCacheError(f'Unexpected Redis reply {line!r}')
+
+    def _call(self, *args):
+        if getattr(self._local, 'connection', None) is None or self._local.pid != os.getpid():
+            if time.monotonic() < self._down_until:
+                raise ConnectionError('Redis unreachable, retrying shortly')
+            try:
+                self._connect()
+            except Exception:
+                self._disconnect()
+                self._down_until = time.monotonic() + 5
+                raise
+        try:
+            return self._command(*args)
+        except (OSError, ConnectionError):
+            self._disconnect()
+            raise
+
+    def get_many(self, keys):
+        return self._call('MGET', *keys)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self._call('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self._call('SET', key, value)
+
+    def add(self, key, value):
+        return self._call('SET', key, value, 'NX') is not None
+
+def backend_from_url(url, max_entries=2000):
+    if not url or url == 'none':
+        return NullBackend()
+    if url == 'memory':
+        return MemoryBackend(max_entries)
+    if url.startswith('file://'):
+        return FileBackend(urlparse(url).path)
+    if url.startswith('redis://'):
+        return RedisBackend(url)
+    raise FragmentCacheError(f"Unknown FRAGMENT_CACHE '{url}'; use memory, file:///dir, redis://host:port/db or none")
+
+class FragmentCache:
+    """The app's fragment cache (app.extensions['fragment_cache'])"""
+
+    def __init__(self, backend, ttl=600, prefix='fragment:'):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}tag:{tag}'
+
+    def _new_token(self, tag_key):
+        """Give a tag without one a token, or return the one another process just gave it"""
+        token = os.urandom(8).hex()
+        if not self.backend.add(tag_key, token):
+            token = self.backend.get_many([tag_key])[0]
+        return token
+
+    def tag_version(self, tag):
+        """
+        The tag's current token, for other caches keyed on it (see reference.py).
+        None if the backend fails or stores nothing.
+        """
+        tag_key = self._tag_key(tag)
+        try:
+            return self.backend.get_many([tag_key])[0] or self._new_token(tag_key)
+        except Exception as e:
+            current_app.logger.warning(f"Fragment cache read failed for tag {tag}: {e}")
+            return None
+
+    def fragment(self, name, user_id, tags, render):
+        """
+        The cached HTML for this user's fragment if none of its tags changed since
+        it was rendered, otherwise render() (which returns HTML) and cache that.
+        """
+        key = f'{self.prefix}{name}:user:{user_id}'
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        try:
+            cached, *versions = self.backend.get_many([key] + tag_keys)
+            if cached is not None and None not in versions:
+                entry = json.loads(cached)
+                if entry['tags'] == versions:
+                    return Markup(entry['html'])
+            # Tags never seen (or evicted) get a token now, before rendering, so a
+            # write that lands while we render still invalidates what we store
+            for index, version in enumerate(versions):
+                if version is None:
+                    versions[index] = self._new_token(tag_keys[index])
+        except Exception as e:
+            current_app.logger.warning(f"Fragment cache read failed, rendering {name} uncached: {e}")
+            return Markup(render())
+
+        html = render()
+        if None not in versions:
+            try:
+                self.backend.set(key, json.dumps({'tags': versions, 'html': str(html)}), self.ttl)
+            except Exception as e:
+                current_app.logger.warning(f"Fragment cache write failed for {name}: {e}")
+        return Markup(html)
+
+    def invalidate_now(self, tags):
+        for tag in set(tags):
+            try:
+                self.backend.set(self._tag_key(tag), os.urandom(8).hex())
+            except Exception as e:
+                current_app.logger.error(f"Fragment cache invalidation failed for {tag}: {e}")
+
+def invalidate(*tags):
+    """Invalidate fragments depending on these tags once the current transaction commits"""
+    db.session.info.setdefault(PENDING_KEY, set()).update(tags)
+
+def _invalidate_committed(session):
+    tags = session.info.pop(PENDING_KEY, None)
+    if tags:
+        current_app.extensions['fragment_cache'].invalidate_now(tags)
+
+def _discard(session, *args):
+    session.info.pop(PENDING_KEY, None)
+
+def init_fragment_cache(app):
+    config = app.config
+    backend = backend_from_url(config.get('FRAGMENT_CACHE', 'memory'), config.get('FRAGMENT_CACHE_MAX_ENTRIES', 2000))
+    cache = FragmentCache(backend, config.get('FRAGMENT_CACHE_TTL', 600))
+    app.extensions['fragment_cache'] = cache
+    event.listen(db.session, 'after_commit', _invalidate_committed)
+    event.listen(db.session, 'after_soft_rollback', _discard)
+    return cache
@@ -1,5 +1,8 @@
 """Gunicorn configuration for Snow School production deployment"""
 import multiprocessing
+import os
+import time
+import prefork
 
 # Server socket
 bind = "127.0.0.1:5000"
@@ -7,11 +10,21 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Threaded workers, so open live board streams (see live.py) don't each hold a
+# whole process. Each stream still holds a thread, so LIVE_MAX_STREAMS (4 by
+# default) caps them per worker below this, leaving the rest for pages.
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
 
+# Build the app and its reference data once in the master and fork workers
+# from it, so they share that memory (see prefork.py). GUNICORN_PRELOAD=0
+# has each worker build its own.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+prefork.preloading = preload_app
+
 # Logging
 accesslog = "-"
 errorlog = "-"
@@ -29,3 +42,24 @@ user = None
 group = None
 tmp_upload_dir = None
 
+
+# Server hooks
+def on_starting(server):
+    # Failed-login buckets in shared memory, so throttling holds across all workers
+    import login_guard
+    login_guard.share_across_workers()
+    if server.cfg.preload_app:
+        prefork.warm(server.app.wsgi(), server.log)
+
+
+def pre_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    # Fresh connection pools and threads, then the boot time and memory report
+    prefork.worker_ready(worker.wsgi, worker.log, worker.forked_at)
+
+
+def worker_exit(server, worker):
+    worker.log.info(f"Worker {worker.pid} exiting: {prefork.format_memory(prefork.memory_usage())}")
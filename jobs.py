@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Background job runner backed by the job table.
+
+Admin routes enqueue work with enqueue(); workers claim queued jobs with a
+conditional UPDATE so no external broker is needed. Workers run either as
+threads inside the web process (JOB_WORKER_THREADS) or as a separate process:
+
+    python jobs.py --threads 4
+"""
+
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from models import db, Job
+
+# Registered task functions by name
+TASKS = {}
+
+# Tasks admins may start from the jobs page (they take no arguments)
+ADMIN_TASKS = {}
+
+# Modules that register tasks beyond the built-in ones below. The web app
+# only imports them along with the views that use them, so workers load them.
+TASK_MODULES = ('archive', 'leaderboard', 'reports')
+
+def task(name, admin_label=None):
+    """Register a function as a background task. It is called as fn(job, **args)."""
+    def decorator(fn):
+        TASKS[name] = fn
+        if admin_label:
+            ADMIN_TASKS[name] = admin_label
+        return fn
+    return decorator
+
+def load_tasks():
+    """Import every module in TASK_MODULES so their tasks are registered"""
+    for name in TASK_MODULES:
+        importlib.import_module(name)
+
+class JobContext:
+    """Handle passed to running tasks for reporting progress"""
+    
+    def __init__(self, job_id):
+        self.id = job_id
+    
+    def progress(self, percent, message=None):
+        """Record progress and refresh the heartbeat. Commits the current session."""
+        db.session.execute(
+            update(Job).where(Job.id == self.id).values(
+                progress=max(0, min(int(percent), 100)),
+                message=message[:255] if message else None,
+                heartbeat_at=datetime.now()
+            )
+        )
+        db.session.commit()
+
+def new_job(task_name, created_by=None, max_attempts=None, **kwargs):
+    """A queued Job row for a task, not yet added to the session"""
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown task: {task_name}')
+    now = datetime.now()
+    return Job(
+        task=task_name,
+        args=json.dumps(kwargs),
+        status='queued',
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 3),
+        created_by=created_by,
+        created_at=now,
+        run_after=now
+    )
+
+def enqueue(task_name, created_by=None, max_attempts=None, **kwargs):
+    """Queue a task for a worker and return the Job row"""
+    job = new_job(task_name, created_by, max_attempts, **kwargs)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_next_job(worker_name):
+    """Claim the oldest runnable job. Returns its id, or None if the queue is empty."""
+    now = datetime.now()
+    job_id = db.session.query(Job.id).filter(
+        Job.status == 'queued',
+        Job.run_after <= now
+    ).order_by(Job.id).limit(1).scalar()
+    if job_id is None:
+        db.session.rollback()
+        return None
+    
+    # Only one worker can move the row out of 'queued'; the others match nothing
+    claimed = db.session.execute(
+        update(Job).where(Job.id == job_id, Job.status == 'queued').values(
+            status='running',
+            worker=worker_name,
+            attempts=Job.attempts + 1,
+            started_at=now,
+            heartbeat_at=now
+        )
+    ).rowcount
+    db.session.commit()
+    return job_id if claimed else None
+
+def run_job(job_id):
+    """Run a claimed job and store its result, or schedule a retry on failure"""
+    job = db.session.get(Job, job_id)
+    fn = TASKS.get(job.task)
+    args = json.loads(job.args) if job.args else {}
+    
+    try:
+        if fn is None:
+            raise LookupError(f'Unknown task: {job.task}')
+        result = fn(JobContext(job_id), **args)
+        job = db.session.get(Job, job_id)
+        job.status = 'done'
+        job.progress = 100
+        job.result = json.dumps(result)
+        job.error = None
+        job.finished_at = datetime.now()
+    except Exception as e:
+        current_app.logger.error(f"Job {job_id} ({job.task}) failed: {e}", exc_info=True)
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.error = f'{type(e).__name__}: {e}'
+        if job.attempts < job.max_attempts:
+            delay = current_app.config.get('JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_after = datetime.now() + timedelta(seconds=delay)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.now()
+    db.session.commit()
+
+def requeue_stale_jobs():
+    """
+    Put back jobs whose worker stopped sending heartbeats (e.g. it was killed).
+    Jobs that have used up their attempts are marked failed instead, so a job
+    that keeps killing its worker doesn't run forever. Returns the number requeued.
+    """
+    now = datetime.now()
+    cutoff = now - timedelta(seconds=current_app.config.get('JOB_STALE_AFTER', 600))
+    stale = (Job.status == 'running', Job.heartbeat_at < cutoff)
+    db.session.execute(
+        update(Job).where(*stale, Job.attempts >= Job.max_attempts).values(
+            status='failed',
+            error='Worker stopped responding',
+            finished_at=now
+        )
+    )
+    count = db.session.execute(
+        update(Job).where(*stale).values(
+            status='queued',
+            run_after=now
+        )
+    ).rowcount
+    db.session.commit()
+    return count
+
+class Worker(threading.Thread):
+    """Polls the job table and runs jobs until stopped"""
+    
+    def __init__(self, app, name, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.app = app
+        self.stop_event = stop_event
+    
+    def run(self):
+        poll_interval = self.app.config.get('JOB_POLL_INTERVAL', 1.0)
+        stale_check_interval = self.app.config.get('JOB_STALE_CHECK_INTERVAL', 60)
+        next_stale_check = time.monotonic() + stale_check_interval
+        while not self.stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    # Jobs orphaned by a worker that died while this one keeps running
+                    if time.monotonic() >= next_stale_check:
+                        next_stale_check = time.monotonic() + stale_check_interval
+                        requeued = requeue_stale_jobs()
+                        if requeued:
+                            self.app.logger.info(f"Requeued {requeued} stale job(s)")
+                    job_id = claim_next_job(self.name)
+                    if job_id is not None:
+                        run_job(job_id)
+                        continue
+            except Exception as e:
+                self.app.logger.error(f"Job worker {self.name} error: {e}", exc_info=True)
+            self.stop_event.wait(poll_interval)
+
+def start_workers(app, count):
+    """Start worker threads. Returns the threads and the event that stops them."""
+    load_tasks()
+    stop_event = threading.Event()
+    with app.app_context():
+        db.create_all()
+        requeued = requeue_stale_jobs()
+        if requeued:
+            app.logger.info(f"Requeued {requeued} stale job(s)")
+    
+    prefix = f'{socket.gethostname()}-{os.getpid()}'
+    workers = [Worker(app, f'{prefix}-{i}', stop_event) for i in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers, stop_event
+
+# Built-in maintenance tasks
+
+@task('rebuild_search_index', admin_label='Rebuild athlete search index')
+def rebuild_search_index_task(job):
+    from search import ensure_search_index, rebuild_search_index
+    ensure_search_index()
+    rebuild_search_index()
+    return {'rebuilt': True}
+
+@task('backfill_completed_levels', admin_label='Backfill completed levels')
+def backfill_completed_levels_task(job):
+    from models import CompletedLevels
+    duplicates = CompletedLevels.backfill()
+    return {'rows': db.session.query(CompletedLevels).count(),
+            'duplicate_levels': [f'student {student_id} {sport_type} level {level}: evaluations {evaluation_ids}'
+                                 for student_id, sport_type, level, evaluation_ids in duplicates]}
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--threads', type=int, default=2, help='Number of worker threads')
+    options = parser.parse_args()
+    
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+    # Use the imported module so tasks registered by app modules are visible
+    import jobs
+    
+    workers, stop_event = jobs.start_workers(app, options.threads)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    print(f"🚀 Started {options.threads} job worker(s). Press Ctrl+C to stop.")
+    try:
+        while not stop_event.is_set():
+            stop_event.wait(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+    for worker in workers:
+        worker.join()
+    print("✓ Workers stopped")
@@ -0,0 +1,205 @@
+"""
+Snow Stars leaderboards per program, team, club or division and level.
+
+Ranks are computed in the database with RANK() and PERCENT_RANK() over
+Evaluation.snow_stars_average_score and cached in leaderboard_entry, one
+partition per (scope, scope_id, level). Writes never rank anything: a new
+evaluation marks the partitions its athlete belongs to as stale (mark_stale(),
+in the same transaction, which also creates partitions that were never
+built), bulk roster changes (roster.py) mark the partitions their athletes
+leave and join, and a season rollover marks them all. Each of these queues one
+refresh_leaderboards job, which rebuilds the stale partitions with a single
+INSERT ... SELECT each.
+
+Reads never write. A fresh partition is read from leaderboard_entry: a page
+of the top N is a range scan on ix_leaderboard_entry_rank and "my rank" a
+primary-key lookup. A stale partition, or one that was never built, is ranked
+straight from evaluation until the job has rebuilt it, so pages are never out
+of date even without a worker running (just slower). Deactivated athletes
+(see roster.py) aren't ranked.
+"""
+
+from datetime import datetime
+from sqlalchemy import Float, delete, exists, func, insert, literal, select, tuple_, type_coerce, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, User, Evaluation, Job, LeaderboardEntry, LeaderboardScope
+import jobs
+import roster
+
+SCOPES = {
+    'program': User.program_id,
+    'team': User.team_id,
+    'club': User.club_id,
+    'division': User.division_id
+}
+SPORT = 'snow_stars'
+REFRESH_TASK = 'refresh_leaderboards'
+
+class LeaderboardError(Exception):
+    pass
+
+def _check_scope(scope):
+    if scope not in SCOPES:
+        raise LeaderboardError(f"Unknown leaderboard scope '{scope}'; use one of {', '.join(SCOPES)}")
+
+def _queue_refresh():
+    """Queue a refresh_leaderboards job in the caller's transaction, unless one is already waiting"""
+    if not db.session.scalar(select(exists().where(Job.task == REFRESH_TASK, Job.status == 'queued'))):
+        db.session.add(jobs.new_job(REFRESH_TASK))
+
+def mark_stale(student_id, level):
+    """Flag the student's leaderboards at this level for a refresh. Runs in the caller's transaction."""
+    mark_stale_many([(db.session.get(User, student_id), level)])
+
+def mark_stale_many(students_levels):
+    """mark_stale() for several (student, level) pairs in one INSERT ... ON CONFLICT"""
+    partitions = {(scope, getattr(student, column.key), level)
+                  for student, level in students_levels
+                  for scope, column in SCOPES.items() if getattr(student, column.key) is not None}
+    if partitions:
+        dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+        db.session.execute(
+            dialect.insert(LeaderboardScope).values([
+                {'scope': scope, 'scope_id': scope_id, 'level': level, 'stale': True, 'athletes': 0}
+                for scope, scope_id, level in sorted(partitions)
+            ]).on_conflict_do_update(index_elements=['scope', 'scope_id', 'level'], set_={'stale': True})
+        )
+        _queue_refresh()
+
+def mark_scopes_stale(scope_ids):
+    """Flag every level of these (scope, scope_id) leaderboards for a refresh, e.g. after athletes move. Runs in the caller's transaction."""
+    if scope_ids:
+        db.session.execute(
+            update(LeaderboardScope).where(tuple_(LeaderboardScope.scope, LeaderboardScope.scope_id).in_(sorted(scope_ids)))
+            .values(stale=True).execution_options(synchronize_session=False)
+        )
+        _queue_refresh()
+
+def mark_all_stale():
+    """Flag every leaderboard for a refresh, e.g. after a season rollover. Runs in the caller's transaction."""
+    db.session.execute(update(LeaderboardScope).values(stale=True).execution_options(synchronize_session=False))
+    _queue_refresh()
+
+def _ranked(scope, scope_id, level):
+    """A partition ranked from the evaluation table with window functions, as a subquery"""
+    score = Evaluation.snow_stars_average_score
+    return select(
+        Evaluation.student_id.label('student_id'),
+        score.label('score'),
+        func.rank().over(order_by=score.desc()).label('rank'),
+        # Numeric by default; a float like the cached column
+        type_coerce(func.percent_rank().over(order_by=score.desc()), Float).label('percent_rank')
+    ).join(User, User.id == Evaluation.student_id).where(
+        SCOPES[scope] == scope_id,
+        Evaluation.sport_type == SPORT,
+        Evaluation.level == level,
+        score.isnot(None),
+        ~roster.deactivated(User.id)
+    ).subquery()
+
+def refresh(scope, scope_id, level):
+    """Rebuild one partition's entries. Returns the athlete count."""
+    _check_scope(scope)
+    ranked = _ranked(scope, scope_id, level)
+    db.session.execute(delete(LeaderboardEntry).where(
+        LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id, LeaderboardEntry.level == level
+    ))
+    db.session.execute(insert(LeaderboardEntry).from_select(
+        ['scope', 'scope_id', 'level', 'student_id', 'score', 'rank', 'percent_rank'],
+        select(literal(scope), literal(scope_id), literal(level),
+               ranked.c.student_id, ranked.c.score, ranked.c.rank, ranked.c.percent_rank)
+    ))
+    return db.session.query(func.count()).select_from(LeaderboardEntry).filter(
+        LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id, LeaderboardEntry.level == level
+    ).scalar()
+
+@jobs.task(REFRESH_TASK, admin_label='Rebuild stale leaderboards')
+def refresh_leaderboards_task(job):
+    """Rebuild stale partitions, one transaction each, until none are left"""
+    total = db.session.scalar(select(func.count()).select_from(LeaderboardScope).where(LeaderboardScope.stale))
+    refreshed = 0
+    while True:
+        keys = db.session.execute(
+            select(LeaderboardScope.scope, LeaderboardScope.scope_id, LeaderboardScope.level)
+            .where(LeaderboardScope.stale).order_by(LeaderboardScope.refreshed_at).limit(100)
+        ).all()
+        if not keys:
+            return {'refreshed': refreshed}
+        for key in keys:
+            # Locked, so an evaluation saved while this rebuilds marks it stale again afterwards
+            state = db.session.get(LeaderboardScope, tuple(key), with_for_update=True, populate_existing=True)
+            if state is not None and state.stale:
+                state.athletes = refresh(*key)
+                state.stale = False
+                state.refreshed_at = datetime.now()
+                refreshed += 1
+            db.session.commit()
+        # More can go stale while this runs, so the count can pass the total
+        job.progress(min(refreshed * 100 // max(total, 1), 99), f'{refreshed} leaderboard(s) rebuilt')
+
+def _partition(scope, scope_id, level):
+    """(entries subquery, athlete count, refreshed_at): the cached partition if it's fresh, otherwise ranked from evaluation"""
+    _check_scope(scope)
+    state = db.session.get(LeaderboardScope, (scope, scope_id, level))
+    if state is not None and not state.stale:
+        entries = select(LeaderboardEntry.student_id, LeaderboardEntry.score, LeaderboardEntry.rank,
+                         LeaderboardEntry.percent_rank).where(
+            LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id, LeaderboardEntry.level == level
+        ).subquery()
+        return entries, state.athletes, state.refreshed_at
+    entries = _ranked(scope, scope_id, level)
+    return entries, db.session.scalar(select(func.count()).select_from(entries)), datetime.now()
+
+def top(scope, scope_id, level, limit=25, after=None):
+    """
+    One page of a leaderboard in rank order, as dicts with the athlete's name.
+    after is the (rank, student_id) of the last row of the previous page.
+    """
+    entries, athletes, refreshed_at = _partition(scope, scope_id, level)
+    query = select(entries, User.full_name).join(User, User.id == entries.c.student_id)
+    if after is not None:
+        query = query.where(tuple_(entries.c.rank, entries.c.student_id) > tuple_(*after))
+    rows = db.session.execute(query.order_by(entries.c.rank, entries.c.student_id).limit(limit)).all()
+    return {
+        'scope': scope,
+        'scope_id': scope_id,
+        'level': level,
+        'athletes': athletes,
+        'refreshed_at': refreshed_at.isoformat(timespec='seconds'),
+        'entries': [_entry(row, row.full_name) for row in rows],
+        'next': [rows[-1].rank, rows[-1].student_id] if len(rows) == limit else None
+    }
+
+def rank_of(scope, scope_id, level, student_id):
+    """A student's place on a leaderboard, or None if they aren't ranked on it"""
+    entries, athletes, _ = _partition(scope, scope_id, level)
+    entry = db.session.execute(select(entries).where(entries.c.student_id == student_id)).first()
+    if entry is None:
+        return None
+    return dict(_entry(entry), athletes=athletes)
+
+def my_ranks(student):
+    """Every leaderboard the student is ranked on, one per scope and evaluated Snow Stars level"""
+    levels = [level for (level,) in db.session.query(Evaluation.level).filter(
+        Evaluation.student_id == student.id, Evaluation.sport_type == SPORT).order_by(Evaluation.level)]
+    ranks = []
+    for level in levels:
+        for scope, column in SCOPES.items():
+            scope_id = getattr(student, column.key)
+            if scope_id is None:
+                continue
+            entry = rank_of(scope, scope_id, level, student.id)
+            if entry is not None:
+                ranks.append(dict(entry, scope=scope, scope_id=scope_id, level=level))
+    return ranks
+
+def _entry(entry, full_name=None):
+    row = {
+        'student_id': entry.student_id,
+        'score': round(entry.score, 2),
+        'rank': entry.rank,
+        'percent_rank': round(entry.percent_rank, 4)
+    }
+    if full_name is not None:
+        row['full_name'] = full_name
+    return row
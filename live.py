@@ -0,0 +1,258 @@
+"""
+Live attendance and evaluation boards over Server-Sent Events.
+
+Routes call publish() while they write; the events go out only when the
+transaction commits and are dropped on rollback. Every event goes to the
+team's channel ("team:<id>") and, when the team belongs to a club, to the
+club's channel ("club:<id>").
+
+Two brokers:
+
+  memory    Events fan out to subscribers in this process only. Fine for the
+            dev server or a single gunicorn worker.
+  postgres  Events are sent with pg_notify() inside the committing
+            transaction. One listener thread per process LISTENs and fans
+            them out locally, so every worker sees every event.
+
+Each subscriber has a small bounded queue, and an event is serialized once
+no matter how many subscribers receive it. A subscriber that falls behind
+loses its oldest events instead of holding up the publisher. Streams close
+after LIVE_STREAM_SECONDS; EventSource reconnects by itself, which keeps
+long-lived connections from pinning gunicorn threads forever.
+
+Each open stream holds one of a gthread worker's threads, so a process
+serves at most LIVE_MAX_STREAMS at once and answers more with a 503 (the
+board retries a little later). Keep it below gunicorn's threads so pages
+always have some left.
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from flask import Response, current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import aliased
+from models import db, User, Attendance, Evaluation
+
+NOTIFY_CHANNEL = 'live_board'
+PENDING_KEY = 'live_events'
+
+class Broker:
+    """In-process pub/sub: channel name -> subscriber queues"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = queue.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def fanout(self, channel, message):
+        """Hand an already formatted SSE message to every subscriber of a channel"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            while True:
+                try:
+                    subscription.put_nowait(message)
+                    break
+                except queue.Full:
+                    # Slow reader: drop its oldest event rather than block the publisher
+                    try:
+                        subscription.get_nowait()
+                    except queue.Empty:
+                        pass
+
+broker = Broker()
+_stream_slots = threading.BoundedSemaphore(4)
+
+def sse_message(event_name, data):
+    return f'event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n'
+
+def team_channels(team_id, club_id=None):
+    channels = [f'team:{team_id}']
+    if club_id:
+        channels.append(f'club:{club_id}')
+    return channels
+
+def publish(channels, event_name, data):
+    """Queue an event for the channels; it is sent when the current transaction commits"""
+    db.session.info.setdefault(PENDING_KEY, []).append((channels, event_name, data))
+
+def _use_postgres(session):
+    return current_app.config.get('LIVE_BROKER') == 'postgres' and \
+        session.get_bind().dialect.name == 'postgresql'
+
+def _notify(session):
+    """NOTIFY inside the transaction, so Postgres delivers the events only if it commits"""
+    if not session.info.get(PENDING_KEY) or not _use_postgres(session):
+        return
+    for channels, event_name, data in session.info.pop(PENDING_KEY):
+        message = sse_message(event_name, data)
+        for channel in channels:
+            session.execute(text('SELECT pg_notify(:notify_channel, :payload)'), {
+                'notify_channel': NOTIFY_CHANNEL,
+                'payload': json.dumps({'channel': channel, 'message': message})
+            })
+
+def _fanout_committed(session):
+    for channels, event_name, data in session.info.pop(PENDING_KEY, ()):
+        message = sse_message(event_name, data)
+        for channel in channels:
+            broker.fanout(channel, message)
+
+def _discard(session, *args):
+    session.info.pop(PENDING_KEY, None)
+
+class Listener(threading.Thread):
+    """LISTENs on its own Postgres connection and fans notifications out to this process's subscribers"""
+
+    def __init__(self, app):
+        super().__init__(name='live-listener', daemon=True)
+        self.app = app
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self.app.logger.error(f"Live board listener failed, reconnecting: {e}", exc_info=True)
+                time.sleep(2)
+
+    def _listen(self):
+        with self.app.app_context():
+            raw = db.engine.raw_connection()
+        raw.detach()  # Held for the life of the thread, never returned to the pool
+        connection = raw.dbapi_connection
+        try:
+            connection.autocommit = True
+            connection.cursor().execute(f'LISTEN {NOTIFY_CHANNEL}')
+            while True:
+                if select.select([connection], [], [], 30) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = json.loads(connection.notifies.pop(0).payload)
+                    broker.fanout(notification['channel'], notification['message'])
+        finally:
+            connection.close()
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def ensure_listener(app):
+    """Start this process's LISTEN thread if the postgres broker is in use (again after a fork)"""
+    global _listener, _listener_pid
+    with app.app_context():
+        if app.config.get('LIVE_BROKER') != 'postgres' or db.engine.dialect.name != 'postgresql':
+            return None
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid() or not _listener.is_alive():
+            _listener = Listener(app)
+            _listener_pid = os.getpid()
+            _listener.start()
+    return _listener
+
+def stream(app, channel):
+    """text/event-stream response relaying a channel until the client leaves or the stream times out"""
+    if not _stream_slots.acquire(blocking=False):
+        return Response('Too many live boards open, try again shortly', status=503, mimetype='text/plain',
+                        headers={'Retry-After': '30'})
+    ensure_listener(app)
+    heartbeat = app.config.get('LIVE_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + app.config.get('LIVE_STREAM_SECONDS', 300)
+    subscription = broker.subscribe(channel)
+
+    closed = threading.Event()
+
+    def close():
+        if not closed.is_set():
+            closed.set()
+            broker.unsubscribe(channel, subscription)
+            _stream_slots.release()
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    yield subscription.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            close()
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let a proxy buffer the stream
+    })
+    # Also on close, since generate() never runs its finally if the client leaves before the first write
+    response.call_on_close(close)
+    return response
+
+def evaluation_event(evaluation, student, coach_name):
+    return {
+        'team_id': student.team_id,
+        'student_id': student.id,
+        'student_name': student.full_name,
+        'coach_name': coach_name,
+        'sport_type': evaluation.sport_type,
+        'level': evaluation.level,
+        'created_at': evaluation.created_at.isoformat(timespec='minutes')
+    }
+
+def board_state(team_ids, limit=20):
+    """Starting point for a board: roster, today's attendance and today's evaluations for the teams"""
+    roster = db.session.query(User.id, User.full_name, User.team_id) \
+        .filter(User.team_id.in_(team_ids), User.user_type == 'student').order_by(User.full_name).all()
+    today = date.today()
+    attendance = dict(db.session.query(Attendance.student_id, Attendance.attended)
+                      .filter(Attendance.team_id.in_(team_ids), Attendance.session_date == today))
+    coach = aliased(User)
+    evaluations = db.session.query(Evaluation, User, coach.full_name) \
+        .join(User, User.id == Evaluation.student_id).join(coach, coach.id == Evaluation.coach_id) \
+        .filter(User.team_id.in_(team_ids), Evaluation.created_at >= datetime.combine(today, datetime.min.time())) \
+        .order_by(Evaluation.created_at.desc()).limit(limit).all()
+    return {
+        'date': today.isoformat(),
+        'roster': [{'id': student_id, 'full_name': full_name, 'team_id': team_id,
+                    'attended': attendance.get(student_id)} for student_id, full_name, team_id in roster],
+        'evaluations': [evaluation_event(evaluation, student, coach_name)
+                        for evaluation, student, coach_name in evaluations]
+    }
+
+def init_live(app):
+    """Register the commit hooks that send published events"""
+    global _stream_slots
+    broker.queue_size = app.config.get('LIVE_QUEUE_SIZE', 100)
+    _stream_slots = threading.BoundedSemaphore(app.config.get('LIVE_MAX_STREAMS', 4))
+    event.listen(db.session, 'before_commit', _notify)
+    event.listen(db.session, 'after_commit', _fanout_committed)
+    event.listen(db.session, 'after_soft_rollback', _discard)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Keeps password checks from eating every worker's CPU.
+
+Hashing pool
+    Password hashes are checked on a small per-process thread pool
+    (LOGIN_HASH_THREADS). At most LOGIN_HASH_QUEUE more checks may wait for
+    it; past that, logins are turned away with 503 straight away instead of
+    queueing up behind a burst. pbkdf2 releases the GIL, so the pool threads
+    really do run in parallel.
+
+Failure throttling
+    Failed logins spend a token from a bucket per username and per client
+    IP. An empty bucket rejects further attempts with 429 before any hashing
+    happens. The client IP comes from X-Forwarded-For only when the request
+    arrives from one of LOGIN_TRUSTED_PROXIES, so it can't be spoofed by
+    reaching the app directly. Buckets live in this process's memory, or, when gunicorn's
+    master calls share_across_workers() before forking (see
+    gunicorn_config.py), in a fixed-size shared memory table that every
+    worker uses.
+
+Rehashing
+    After a successful login, hashes made with an older method or iteration
+    count are replaced with one made with PASSWORD_HASH_METHOD.
+
+Benchmark login latency under a burst of good and bad logins:
+
+    python login_guard.py --username coach1 --password coach123 --requests 400 --concurrency 32
+"""
+
+import hashlib
+import ipaddress
+import mmap
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class LoginBusy(Exception):
+    """Too many password checks already waiting in this process"""
+
+class TokenBuckets:
+    """
+    Token buckets keyed by string. Each bucket holds up to `capacity` tokens
+    and regains one every `refill_seconds`.
+    """
+
+    def retry_after(self, key, capacity, refill_seconds):
+        """Seconds until the bucket has a token again, 0 if it has one now"""
+        def peek(tokens):
+            return tokens, 0 if tokens >= 1 else (1 - tokens) * refill_seconds
+        return self._apply(key, capacity, refill_seconds, peek)
+
+    def spend(self, key, capacity, refill_seconds):
+        """Take a token (it may go empty). Returns the tokens left."""
+        def take(tokens):
+            tokens = max(tokens - 1, 0)
+            return tokens, tokens
+        return self._apply(key, capacity, refill_seconds, take)
+
+    def reset(self, key, capacity, refill_seconds):
+        return self._apply(key, capacity, refill_seconds, lambda tokens: (capacity, None))
+
+    @staticmethod
+    def _refill(tokens, updated, capacity, refill_seconds, now):
+        return min(capacity, tokens + (now - updated) / refill_seconds)
+
+class MemoryBuckets(TokenBuckets):
+    """Buckets for this process only, keeping the most recently used max_keys"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _apply(self, key, capacity, refill_seconds, operation):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, result = operation(self._refill(tokens, updated, capacity, refill_seconds, now))
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return result
+
+class SharedBuckets(TokenBuckets):
+    """
+    Buckets in an anonymous shared memory map, visible to every process forked
+    after it is created. Keys hash into a fixed table of slots (key hash,
+    tokens, last update); a full probe window evicts its least recently
+    updated slot.
+    """
+
+    SLOT = struct.Struct('Qdd')
+    PROBES = 8
+
+    def __init__(self, slots=8192):
+        self.slots = slots
+        # Only gunicorn's master needs multiprocessing, so it isn't imported at startup
+        import multiprocessing
+        self._memory = mmap.mmap(-1, self.SLOT.size * slots)
+        self._lock = multiprocessing.Lock()
+
+    @staticmethod
+    def _hash(key):
+        # Never 0, which marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def _find(self, key_hash):
+        start = key_hash % self.slots
+        candidates = [(start + probe) % self.slots for probe in range(self.PROBES)]
+        oldest = None
+        for slot in candidates:
+            slot_hash, tokens, updated = self.SLOT.unpack_from(self._memory, slot * self.SLOT.size)
+            if slot_hash == key_hash:
+                return slot, (tokens, updated)
+            if slot_hash == 0:
+                return slot, None
+            if oldest is None or updated < oldest[1]:
+                oldest = (slot, updated)
+        return oldest[0], None
+
+    def _apply(self, key, capacity, refill_seconds, operation):
+        # CLOCK_MONOTONIC is system-wide, so times compare across processes
+        now = time.monotonic()
+        key_hash = self._hash(key)
+        with self._lock:
+            slot, state = self._find(key_hash)
+            tokens, updated = state if state is not None else (capacity, now)
+            tokens, result = operation(self._refill(tokens, updated, capacity, refill_seconds, now))
+            self.SLOT.pack_into(self._memory, slot * self.SLOT.size, key_hash, tokens, now)
+        return result
+
+_shared_buckets = None
+
+def share_across_workers(slots=8192):
+    """Create the shared bucket table. Call in the gunicorn master, before workers fork."""
+    global _shared_buckets
+    if _shared_buckets is None:
+        _shared_buckets = SharedBuckets(slots)
+    return _shared_buckets
+
+def trusted_proxies(value):
+    """LOGIN_TRUSTED_PROXIES as a list of networks, or True for '*'"""
+    entries = [entry.strip() for entry in value.split(',') if entry.strip()]
+    if '*' in entries:
+        return True
+    return [ipaddress.ip_network(entry, strict=False) for entry in entries]
+
+class LoginGuard:
+    """The app's hashing pool, failure buckets and password policy (app.extensions['login_guard'])"""
+
+    def __init__(self, app):
+        config = app.config
+        self.method = config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        self.user_limit = config.get('LOGIN_FAILURES_PER_USER', (5, 60))
+        self.ip_limit = config.get('LOGIN_FAILURES_PER_IP', (20, 3))
+        self.trusted_proxies = trusted_proxies(config.get('LOGIN_TRUSTED_PROXIES', ''))
+        self.timeout = config.get('LOGIN_HASH_TIMEOUT', 10)
+        threads = config.get('LOGIN_HASH_THREADS', 2)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='login-hash')
+        self._slots = threading.BoundedSemaphore(threads + config.get('LOGIN_HASH_QUEUE', 8))
+
+    @cached_property
+    def buckets(self):
+        """
+        Picked on first use rather than in __init__: a preloading gunicorn master
+        builds the app before on_starting creates the shared table.
+        """
+        return _shared_buckets or MemoryBuckets()
+
+    @cached_property
+    def _dummy_hash(self):
+        """Checked against when a username doesn't exist, so the response takes as long as a real check"""
+        return generate_password_hash('not-a-password', method=self.method)
+
+    def hash_password(self, password):
+        return generate_password_hash(password, method=self.method)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self._dummy_hash.split('$', 1)[0]
+
+    def check_password(self, password_hash, password):
+        """Verify on the hashing pool. Raises LoginBusy when the pool's queue is full."""
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            return self._pool.submit(check_password_hash, password_hash or self._dummy_hash, password) \
+                .result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def client_ip(self, request):
+        # Behind nginx or Vercel the last X-Forwarded-For entry is the address the proxy saw
+        if request.access_route and self._trusted(request.remote_addr):
+            return request.access_route[-1]
+        return request.remote_addr or 'unknown'
+
+    def _trusted(self, address):
+        if self.trusted_proxies is True:
+            return True
+        try:
+            address = ipaddress.ip_address(address or '')
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def _limits(self, username, ip):
+        return ((f'user:{username.lower()}', *self.user_limit), (f'ip:{ip}', *self.ip_limit))
+
+    def retry_after(self, username, ip):
+        """Seconds the caller must wait before trying again, 0 if they may try now"""
+        return max(self.buckets.retry_after(key, capacity, refill) for key, capacity, refill in self._limits(username, ip))
+
+    def record_failure(self, username, ip):
+        for key, capacity, refill in self._limits(username, ip):
+            self.buckets.spend(key, capacity, refill)
+
+    def record_success(self, username):
+        key, capacity, refill = self._limits(username, '')[0]
+        self.buckets.reset(key, capacity, refill)
+
+def init_login_guard(app):
+    guard = LoginGuard(app)
+    app.extensions['login_guard'] = guard
+    return guard
+
+def _benchmark(username, password, total, concurrency, bad_ratio):
+    """Fire a burst of logins at the app in this process and report latency percentiles"""
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+    app.config['SESSION_COOKIE_SECURE'] = False
+
+    statuses = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def one_login(index):
+        bad = index % 100 < bad_ratio * 100
+        form = {'username': username if index % 2 or not bad else f'nobody-{index}',
+                'password': password if not bad else 'wrong-password'}
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/login', data=form)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_login, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{total} logins, {concurrency} concurrent, {bad_ratio:.0%} bad: {total / wall:.1f}/s")
+    print(f"  p50 {percentile(0.5):.0f}ms  p95 {percentile(0.95):.0f}ms  p99 {percentile(0.99):.0f}ms  max {latencies[-1] * 1000:.0f}ms")
+    print(f"  status codes: {dict(sorted(statuses.items()))}")
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark login latency under a burst')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--bad-ratio', type=float, default=0.5, help='Share of attempts with a wrong password or username')
+    options = parser.parse_args()
+    _benchmark(options.username, options.password, options.requests, options.concurrency, options.bad_ratio)
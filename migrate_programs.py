@@ -1,26 +1,40 @@
 #!/usr/bin/env python3
 """
-Migration script to update programs from old structure to new racing age groups.
-This script:
-1. Identifies teams associated with old programs
-2. Removes old programs (only if safe to do so)
-3. Creates new programs (U12, U14, U16, U18/U21) if they don't exist
+Migrate programs from the old structure to the new racing age groups.
+
+The migration is declarative: PROGRAM_MAPPING says which new program each old
+program's teams and athletes move to. Everything happens in one transaction:
+1. Creates the new programs (U12, U14, U16, U18/U21) the mapping moves to that
+   don't exist yet
+2. Moves the program_id of teams, athletes and deactivated athletes' records
+   with one bulk UPDATE each
+3. Removes the old programs
+4. Records the migration in program_migration, so running it again is a no-op
+
+Nothing is interactive, so it can run from CI/CD:
+
+    python migrate_programs.py --dry-run
+    python migrate_programs.py
+    python migrate_programs.py --name high-flyers-fix --map "High Flyers=U14"
 """
 
-import os
+import json
 import sys
-from flask import Flask
-from models import db, Program, Team, Club
-
-# Old program names to remove
-OLD_PROGRAMS = [
-    'Snowflakes',
-    'High Flyers',
-    'Trail Blazers',
-    'LIT',
-    'Adult',
-    'Terrain Park'
-]
+from sqlalchemy import case, delete, func, update
+from models import db, Program, Team, User, AthleteDeactivation, ProgramMigration
+import reference
+
+MIGRATION_NAME = 'racing-age-groups'
+
+# Old program -> new program its teams and athletes move to
+PROGRAM_MAPPING = {
+    'Snowflakes': 'U12',
+    'High Flyers': 'U12',
+    'Trail Blazers': 'U14',
+    'Terrain Park': 'U16',
+    'LIT': 'U18/U21',
+    'Adult': 'U18/U21'
+}
 
 # New programs to create
 NEW_PROGRAMS = [
@@ -30,140 +44,167 @@ NEW_PROGRAMS = [
     ('U18/U21', 'Under 18/21 racing program', 'daily', 10, None)
 ]
 
-def migrate_programs():
-    """Migrate programs from old structure to new racing age groups"""
-    app = Flask(__name__)
-    
-    # Load configuration
-    env = os.environ.get('FLASK_ENV', 'development')
-    from config import config
-    app.config.from_object(config.get(env, config['development']))
-    
-    db.init_app(app)
-    
-    with app.app_context():
-        print("=" * 60)
-        print("Program Migration Script")
-        print("=" * 60)
-        print()
-        
-        # Step 1: Check for teams associated with old programs
-        print("Step 1: Checking for teams associated with old programs...")
-        teams_to_update = []
-        
-        for old_program_name in OLD_PROGRAMS:
-            old_program = Program.query.filter_by(name=old_program_name).first()
-            if old_program:
-                teams = Team.query.filter_by(program_id=old_program.id).all()
-                if teams:
-                    print(f"  ⚠️  Found {len(teams)} team(s) associated with '{old_program_name}':")
-                    for team in teams:
-                        print(f"     - {team.name} (ID: {team.id})")
-                        teams_to_update.append((team, old_program_name))
-        
-        if teams_to_update:
-            print()
-            print("⚠️  WARNING: There are teams associated with old programs!")
-            print("   These teams need to be reassigned to new programs before migration.")
-            print("   You can either:")
-            print("   1. Reassign teams manually in the admin interface, or")
-            print("   2. Delete these teams if they're no longer needed")
-            print()
-            response = input("Do you want to continue? This will fail if teams still exist. (yes/no): ")
-            if response.lower() != 'yes':
-                print("Migration cancelled.")
-                return False
-            
-            # Double-check that teams were handled
-            remaining_teams = []
-            for old_program_name in OLD_PROGRAMS:
-                old_program = Program.query.filter_by(name=old_program_name).first()
-                if old_program:
-                    teams = Team.query.filter_by(program_id=old_program.id).all()
-                    remaining_teams.extend(teams)
-            
-            if remaining_teams:
-                print(f"❌ ERROR: Still {len(remaining_teams)} team(s) associated with old programs!")
-                print("   Please reassign or delete these teams first:")
-                for team in remaining_teams:
-                    print(f"   - {team.name} (ID: {team.id})")
-                return False
-        
-        print("✓ No teams blocking migration")
-        print()
-        
-        # Step 2: Remove old programs
-        print("Step 2: Removing old programs...")
-        removed_count = 0
-        for old_program_name in OLD_PROGRAMS:
-            old_program = Program.query.filter_by(name=old_program_name).first()
-            if old_program:
-                # Double-check no teams are associated
-                teams = Team.query.filter_by(program_id=old_program.id).all()
-                if teams:
-                    print(f"  ⚠️  Skipping '{old_program_name}' - still has {len(teams)} team(s)")
-                    continue
-                
-                print(f"  🗑️  Removing '{old_program_name}'...")
-                db.session.delete(old_program)
-                removed_count += 1
-        
-        if removed_count > 0:
-            db.session.commit()
-            print(f"✓ Removed {removed_count} old program(s)")
-        else:
-            print("✓ No old programs to remove (or they're still in use)")
-        print()
-        
-        # Step 3: Create new programs
-        print("Step 3: Creating new programs...")
-        created_count = 0
-        for program_name, description, freq_type, freq_value, freq_days in NEW_PROGRAMS:
-            existing = Program.query.filter_by(name=program_name).first()
-            if existing:
-                print(f"  ✓ '{program_name}' already exists")
-            else:
-                print(f"  ➕ Creating '{program_name}'...")
-                new_program = Program(
-                    name=program_name,
-                    description=description,
-                    frequency_type=freq_type,
-                    frequency_value=freq_value,
-                    frequency_days=freq_days
+class MigrationError(Exception):
+    pass
+
+def _counts_by_program(column, program_ids):
+    return dict(
+        db.session.query(column, func.count()).filter(column.in_(program_ids)).group_by(column).all()
+    )
+
+def apply_program_migration(name, mapping, new_programs=NEW_PROGRAMS, dry_run=False):
+    """
+    Apply one program migration inside an app context.
+    Returns None if it was already applied, otherwise a summary dict with
+    per-program row counts. With dry_run nothing is written.
+    """
+    if db.session.get(ProgramMigration, name):
+        return None
+
+    chained = set(mapping) & set(mapping.values())
+    if chained:
+        raise MigrationError(f"Programs can't be both migrated and migration targets: {', '.join(sorted(chained))}")
+
+    # Every program involved, in one query. Names aren't unique, so an old name may match several rows.
+    programs = db.session.query(Program.id, Program.name) \
+        .filter(Program.name.in_(set(mapping) | set(mapping.values()))).order_by(Program.id).all()
+    old_programs = [(program_id, program_name) for program_id, program_name in programs if program_name in mapping]
+    new_ids = {}
+    for program_id, program_name in programs:
+        if program_name not in mapping:
+            new_ids.setdefault(program_name, program_id)
+
+    # Only the new programs this mapping moves something to
+    to_create = [spec for spec in new_programs if spec[0] in set(mapping.values()) and spec[0] not in new_ids]
+    unknown = set(mapping.values()) - set(new_ids) - set(spec[0] for spec in to_create)
+    if unknown:
+        raise MigrationError(f"Target program(s) don't exist and aren't created by this migration: {', '.join(sorted(unknown))}")
+
+    old_ids = [program_id for program_id, _ in old_programs]
+    team_counts = _counts_by_program(Team.program_id, old_ids) if old_ids else {}
+    athlete_counts = _counts_by_program(User.program_id, old_ids) if old_ids else {}
+    summary = {
+        'name': name,
+        'created': [spec[0] for spec in to_create],
+        'programs': [{
+            'id': program_id,
+            'name': program_name,
+            'target': mapping[program_name],
+            'teams': team_counts.get(program_id, 0),
+            'athletes': athlete_counts.get(program_id, 0)
+        } for program_id, program_name in old_programs],
+        'teams_moved': sum(team_counts.values()),
+        'athletes_moved': sum(athlete_counts.values()),
+        'programs_removed': len(old_ids)
+    }
+    if dry_run:
+        return summary
+
+    try:
+        # Claim the migration name first, so a concurrent run fails on the primary key before moving anything
+        db.session.add(ProgramMigration(
+            name=name,
+            mapping=json.dumps(mapping, sort_keys=True),
+            teams_moved=summary['teams_moved'],
+            athletes_moved=summary['athletes_moved'],
+            programs_removed=summary['programs_removed']
+        ))
+        for program_name, description, freq_type, freq_value, freq_days in to_create:
+            program = Program(
+                name=program_name,
+                description=description,
+                frequency_type=freq_type,
+                frequency_value=freq_value,
+                frequency_days=freq_days
+            )
+            db.session.add(program)
+            db.session.flush()
+            new_ids[program_name] = program.id
+        db.session.flush()
+
+        if old_ids:
+            targets = {program_id: new_ids[mapping[program_name]] for program_id, program_name in old_programs}
+            for model in (Team, User, AthleteDeactivation):
+                db.session.execute(
+                    update(model)
+                    .where(model.program_id.in_(old_ids))
+                    .values(program_id=case(targets, value=model.program_id))
+                    .execution_options(synchronize_session=False)
                 )
-                db.session.add(new_program)
-                created_count += 1
-        
-        if created_count > 0:
-            db.session.commit()
-            print(f"✓ Created {created_count} new program(s)")
-        else:
-            print("✓ All new programs already exist")
-        print()
-        
-        # Step 4: Summary
+            db.session.execute(
+                delete(Program).where(Program.id.in_(old_ids)).execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # The delete above is a Core statement the flush hook doesn't see
+    reference.changed()
+
+    return summary
+
+def print_summary(summary, dry_run):
+    create, move = ('Would create', 'Would move') if dry_run else ('Created', 'Moved')
+    for program_name in summary['created']:
+        print(f"  ➕ {create} '{program_name}'")
+    for program in summary['programs']:
+        print(f"  ➡️  '{program['name']}' (ID: {program['id']}) -> '{program['target']}': "
+              f"{program['teams']} team(s), {program['athletes']} athlete(s)")
+    print()
+    print(f"{move} {summary['teams_moved']} team(s) and {summary['athletes_moved']} athlete(s), "
+          f"{'removing' if dry_run else 'removed'} {summary['programs_removed']} old program(s)")
+
+def migrate_programs(name=MIGRATION_NAME, mapping=None, dry_run=False):
+    """Apply a program migration against the configured database. Returns True on success."""
+    # The app itself (built by create_app()), so the commit hooks that
+    # invalidate cached pages and program lists run here too
+    from app import app
+
+    with app.app_context():
         print("=" * 60)
-        print("Migration Summary")
+        print(f"Program Migration: {name}{' (dry run)' if dry_run else ''}")
         print("=" * 60)
-        all_programs = Program.query.all()
-        print(f"Total programs in database: {len(all_programs)}")
-        print("\nCurrent programs:")
-        for program in sorted(all_programs, key=lambda p: p.name):
-            teams_count = len(program.teams)
-            print(f"  - {program.name}: {teams_count} team(s)")
         print()
-        print("✅ Migration completed successfully!")
+
+        ProgramMigration.__table__.create(db.engine, checkfirst=True)
+        try:
+            summary = apply_program_migration(name, mapping or PROGRAM_MAPPING, dry_run=dry_run)
+        except MigrationError as e:
+            print(f"❌ ERROR: {e}")
+            return False
+
+        if summary is None:
+            print(f"✓ '{name}' was already applied, nothing to do")
+            return True
+
+        print_summary(summary, dry_run)
         print()
-        
+        print("✅ Dry run complete, nothing was changed" if dry_run else "✅ Migration completed successfully!")
         return True
 
+def parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs:
+        old, sep, new = pair.partition('=')
+        if not sep or not old.strip() or not new.strip():
+            raise SystemExit(f"Invalid --map '{pair}', expected OLD=NEW")
+        mapping[old.strip()] = new.strip()
+    return mapping
+
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Move teams and athletes from old programs to new ones')
+    parser.add_argument('--dry-run', action='store_true', help='Show what would change without writing anything')
+    parser.add_argument('--name', default=MIGRATION_NAME, help='Migration name recorded once applied')
+    parser.add_argument('--map', action='append', default=[], metavar='OLD=NEW',
+                        help='Program mapping (repeatable); replaces the built-in mapping')
+    options = parser.parse_args()
+
     try:
-        success = migrate_programs()
+        success = migrate_programs(options.name, parse_mapping(options.map), options.dry_run)
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f"\n❌ ERROR: Migration failed: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
-
@@ -1,7 +1,11 @@
+import json
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
+from replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Division(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,6 +87,24 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class AthleteDeactivation(db.Model):
+    """
+    An athlete taken off the roster by a bulk admin change (see roster.py),
+    with the team, coach and program they had at the time
+    """
+    __tablename__ = 'athlete_deactivation'
+    
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # What they had is only a record, so deleting the team, coach or program clears it instead of being refused
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='SET NULL'), nullable=True)
+    coach_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    program_id = db.Column(db.Integer, db.ForeignKey('program.id', ondelete='SET NULL'), nullable=True)
+    deactivated_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    deactivated_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<AthleteDeactivation {self.student_id}>'
+
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -97,10 +119,180 @@ class Attendance(db.Model):
     team = db.relationship('Team', backref='attendance_records')
     recorder = db.relationship('User', foreign_keys=[recorded_by], backref='recorded_attendance')
     
+    # AUTOINCREMENT keeps SQLite from reusing ids of rows moved to attendance_archive
+    __table_args__ = (
+        db.Index('ix_attendance_team_date', 'team_id', 'session_date'),
+        {'sqlite_autoincrement': True},
+    )
+    
     def __repr__(self):
         return f'<Attendance {self.student.username} - {self.session_date}>'
 
-class Evaluation(db.Model):
+class AttendanceArchive(db.Model):
+    """Attendance rows from past seasons, moved out of the hot table by archive.py"""
+    __tablename__ = 'attendance_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Same id as the original row
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
+    session_date = db.Column(db.Date, nullable=False)
+    attended = db.Column(db.Boolean, default=True)
+    notes = db.Column(db.Text, nullable=True)
+    recorded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    student = db.relationship('User', foreign_keys=[student_id])
+    team = db.relationship('Team')
+    recorder = db.relationship('User', foreign_keys=[recorded_by])
+    
+    def __repr__(self):
+        return f'<AttendanceArchive {self.student_id} - {self.session_date}>'
+
+class AttendanceBits(db.Model):
+    """
+    Compact attendance: one row per athlete, team and season. Bit n of the
+    masks is day n of the season (see attendance_bits.py). Kept in sync with
+    Attendance, which stays the source of truth during the transition.
+    """
+    __tablename__ = 'attendance_bits'
+    
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), primary_key=True)
+    season_start = db.Column(db.Date, primary_key=True)
+    recorded_mask = db.Column(db.LargeBinary, nullable=False, default=b'')  # Days with a record, present or absent
+    attended_mask = db.Column(db.LargeBinary, nullable=False, default=b'')  # Days marked present
+    notes = db.Column(db.Text, nullable=True)  # JSON {day: note}, only for days that have one
+    
+    __table_args__ = (
+        db.Index('ix_attendance_bits_team_season', 'team_id', 'season_start'),
+    )
+    
+    @property
+    def recorded(self):
+        return int.from_bytes(self.recorded_mask or b'', 'little')
+    
+    @recorded.setter
+    def recorded(self, value):
+        self.recorded_mask = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+    
+    @property
+    def attended(self):
+        return int.from_bytes(self.attended_mask or b'', 'little')
+    
+    @attended.setter
+    def attended(self, value):
+        self.attended_mask = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+    
+    def __repr__(self):
+        return f'<AttendanceBits {self.student_id} {self.team_id} {self.season_start}>'
+
+class CheckIn(db.Model):
+    """Buffered single-athlete check-ins, moved into Attendance in batches by checkin.py"""
+    __tablename__ = 'check_in'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
+    session_date = db.Column(db.Date, nullable=False)
+    checked_in_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    checked_in_at = db.Column(db.DateTime, nullable=False)
+    batch = db.Column(db.String(32), nullable=True)  # Set by the flusher that claimed the row
+    
+    def __repr__(self):
+        return f'<CheckIn {self.student_id} {self.session_date}>'
+
+class FormSubmission(db.Model):
+    """
+    Offline-capable form posts already saved, by the submission_id the page
+    adds to each one (see pwa.claim_submission)
+    """
+    __tablename__ = 'form_submission'
+    
+    key = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<FormSubmission {self.key}>'
+
+class LeaderboardScope(db.Model):
+    """One cached leaderboard: a program, team, club or division at one Snow Stars level"""
+    __tablename__ = 'leaderboard_scope'
+    
+    scope = db.Column(db.String(20), primary_key=True)  # 'program', 'team', 'club' or 'division'
+    scope_id = db.Column(db.Integer, primary_key=True)
+    level = db.Column(db.Integer, primary_key=True)
+    stale = db.Column(db.Boolean, nullable=False, default=True)  # Set by writes (see leaderboard.py), cleared by the refresh job
+    athletes = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<LeaderboardScope {self.scope} {self.scope_id} level {self.level}>'
+
+class LeaderboardEntry(db.Model):
+    """Ranked rows of a cached leaderboard, written by leaderboard.refresh()"""
+    __tablename__ = 'leaderboard_entry'
+    
+    scope = db.Column(db.String(20), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True)
+    level = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    percent_rank = db.Column(db.Float, nullable=False)
+    
+    # Pages of a leaderboard are a range scan in rank order
+    __table_args__ = (
+        db.Index('ix_leaderboard_entry_rank', 'scope', 'scope_id', 'level', 'rank', 'student_id'),
+    )
+    
+    def __repr__(self):
+        return f'<LeaderboardEntry {self.scope} {self.scope_id} {self.student_id} #{self.rank}>'
+
+class EvaluationScores:
+    """Score averages shared by Evaluation and EvaluationArchive"""
+    
+    @property
+    def average_score(self):
+        return round((self.skills_score + self.attitude_score + self.performance_score) / 3, 2)
+    
+    @property
+    def step_average_score(self):
+        """Average score for STEP program (skiers)"""
+        if self.technical_score and self.edging_score and self.pressure_control_score and self.turn_shape_score:
+            return round((self.technical_score + self.edging_score + self.pressure_control_score + self.turn_shape_score) / 4, 2)
+        return None
+    
+    @property
+    def rip_average_score(self):
+        """Average score for RIP program (snowboarders)"""
+        if self.board_control_score and self.edge_awareness_score and self.body_positioning_score and self.turn_control_score:
+            return round((self.board_control_score + self.edge_awareness_score + self.body_positioning_score + self.turn_control_score) / 4, 2)
+        return None
+    
+    @hybrid_property
+    def snow_stars_average_score(self):
+        """Average score for Snow Stars program (ACA)"""
+        if self.movement_quality_score and self.balance_score and self.control_score and self.awareness_score:
+            return round((self.movement_quality_score + self.balance_score + self.control_score + self.awareness_score) / 4, 2)
+        return None
+    
+    @snow_stars_average_score.expression
+    def snow_stars_average_score(cls):
+        """
+        The same average in SQL, for ranking in the database (see leaderboard.py).
+        Left unrounded: SQL rounds 6.975 differently than Python rounds the float,
+        so callers round with round(score, 2) for display.
+        """
+        scores = (cls.movement_quality_score, cls.balance_score, cls.control_score, cls.awareness_score)
+        return db.case(
+            (db.and_(*[score != 0 for score in scores]), (scores[0] + scores[1] + scores[2] + scores[3]) / 4),
+            else_=None
+        )
+
+class Evaluation(EvaluationScores, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     coach_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -131,33 +323,248 @@ class Evaluation(db.Model):
     comments = db.Column(db.Text)
     created_at = db.Column(db.DateTime, nullable=False)
     
+    # One evaluation per level per student. AUTOINCREMENT keeps SQLite from
+    # reusing ids of rows moved to evaluation_archive.
+    __table_args__ = (
+        db.Index('uq_evaluation_student_sport_level', 'student_id', 'sport_type', 'level', unique=True),
+        {'sqlite_autoincrement': True},
+    )
+    
     student = db.relationship('User', foreign_keys=[student_id], backref='evaluations_received')
     coach = db.relationship('User', foreign_keys=[coach_id])
     
-    @property
-    def average_score(self):
-        return round((self.skills_score + self.attitude_score + self.performance_score) / 3, 2)
+    archived = False  # See EvaluationArchive; links pass it on to archive.get_evaluation()
     
-    @property
-    def step_average_score(self):
-        """Average score for STEP program (skiers)"""
-        if self.technical_score and self.edging_score and self.pressure_control_score and self.turn_shape_score:
-            return round((self.technical_score + self.edging_score + self.pressure_control_score + self.turn_shape_score) / 4, 2)
-        return None
+    def __repr__(self):
+        return f'<Evaluation {self.id}>'
+
+class EvaluationArchive(EvaluationScores, db.Model):
+    """Evaluations from past seasons, moved out of the hot table by archive.py"""
+    __tablename__ = 'evaluation_archive'
     
-    @property
-    def rip_average_score(self):
-        """Average score for RIP program (snowboarders)"""
-        if self.board_control_score and self.edge_awareness_score and self.body_positioning_score and self.turn_control_score:
-            return round((self.board_control_score + self.edge_awareness_score + self.body_positioning_score + self.turn_control_score) / 4, 2)
-        return None
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Same id as the original row
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    coach_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    sport_type = db.Column(db.String(20), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    skills_score = db.Column(db.Float, nullable=False)
+    attitude_score = db.Column(db.Float, nullable=False)
+    performance_score = db.Column(db.Float, nullable=False)
+    technical_score = db.Column(db.Float, nullable=True)
+    edging_score = db.Column(db.Float, nullable=True)
+    pressure_control_score = db.Column(db.Float, nullable=True)
+    turn_shape_score = db.Column(db.Float, nullable=True)
+    board_control_score = db.Column(db.Float, nullable=True)
+    edge_awareness_score = db.Column(db.Float, nullable=True)
+    body_positioning_score = db.Column(db.Float, nullable=True)
+    turn_control_score = db.Column(db.Float, nullable=True)
+    movement_quality_score = db.Column(db.Float, nullable=True)
+    balance_score = db.Column(db.Float, nullable=True)
+    control_score = db.Column(db.Float, nullable=True)
+    awareness_score = db.Column(db.Float, nullable=True)
+    comments = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    
+    student = db.relationship('User', foreign_keys=[student_id])
+    coach = db.relationship('User', foreign_keys=[coach_id])
+    
+    archived = True
+    
+    def __repr__(self):
+        return f'<EvaluationArchive {self.id}>'
+
+class CompletedLevels(db.Model):
+    """Bitmask of evaluated levels per athlete and sport (bit n-1 set = level n done)"""
+    __tablename__ = 'completed_levels'
+    
+    MAX_LEVEL = 7
+    
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    sport_type = db.Column(db.String(20), primary_key=True)
+    levels_mask = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def bit(level):
+        """The mask bit for a level; ValueError outside 1..MAX_LEVEL"""
+        if not isinstance(level, int) or not 1 <= level <= CompletedLevels.MAX_LEVEL:
+            raise ValueError(f'Level must be between 1 and {CompletedLevels.MAX_LEVEL}, not {level!r}')
+        return 1 << (level - 1)
     
     @property
-    def snow_stars_average_score(self):
-        """Average score for Snow Stars program (ACA)"""
-        if self.movement_quality_score and self.balance_score and self.control_score and self.awareness_score:
-            return round((self.movement_quality_score + self.balance_score + self.control_score + self.awareness_score) / 4, 2)
-        return None
+    def levels(self):
+        return [level for level in range(1, self.levels_mask.bit_length() + 1)
+                if self.levels_mask & (1 << (level - 1))]
+    
+    @staticmethod
+    def get_levels(student_id, sport_type):
+        """Completed levels for a student and sport from a single primary-key read"""
+        row = db.session.get(CompletedLevels, (student_id, sport_type))
+        return row.levels if row else []
+    
+    @staticmethod
+    def claim_level(student_id, sport_type, level):
+        """
+        Mark a level as completed inside the current transaction.
+        Returns False if the level was already completed.
+        """
+        bit = CompletedLevels.bit(level)
+        # The bit test and set happen in one UPDATE, so a concurrent submission
+        # for the same level blocks on the row lock and then matches nothing
+        result = db.session.execute(
+            db.update(CompletedLevels)
+            .where(CompletedLevels.student_id == student_id,
+                   CompletedLevels.sport_type == sport_type,
+                   CompletedLevels.levels_mask.op('&')(bit) == 0)
+            .values(levels_mask=CompletedLevels.levels_mask.op('|')(bit))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return True
+        
+        if db.session.get(CompletedLevels, (student_id, sport_type)):
+            return False
+        
+        db.session.add(CompletedLevels(student_id=student_id, sport_type=sport_type, levels_mask=bit))
+        db.session.flush()
+        return True
+
+    @staticmethod
+    def claim_levels(sport_type, levels, existing):
+        """
+        claim_level() for many students at once: levels is {student_id: level},
+        existing the student ids that already have a completed_levels row.
+        One UPDATE for those, one INSERT for the rest. Returns False if any
+        level was already completed; the caller should roll back.
+        """
+        bits = {student_id: CompletedLevels.bit(level) for student_id, level in levels.items()}
+        update_ids = [student_id for student_id in bits if student_id in existing]
+        if update_ids:
+            bit = db.case({student_id: bits[student_id] for student_id in update_ids}, value=CompletedLevels.student_id)
+            result = db.session.execute(
+                db.update(CompletedLevels)
+                .where(CompletedLevels.student_id.in_(update_ids),
+                       CompletedLevels.sport_type == sport_type,
+                       CompletedLevels.levels_mask.op('&')(bit) == 0)
+                .values(levels_mask=CompletedLevels.levels_mask.op('|')(bit))
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(update_ids):
+                return False
+
+        new_rows = [{'student_id': student_id, 'sport_type': sport_type, 'levels_mask': bit}
+                    for student_id, bit in bits.items() if student_id not in existing]
+        if new_rows:
+            # A concurrent first claim for one of these students raises IntegrityError here
+            db.session.execute(db.insert(CompletedLevels), new_rows)
+        return True
+
+    @staticmethod
+    def duplicates():
+        """(student_id, sport_type, level, evaluation ids) wherever a level was evaluated more than once"""
+        keys = (Evaluation.student_id, Evaluation.sport_type, Evaluation.level)
+        counted = db.session.query(*keys).group_by(*keys).having(db.func.count() > 1).all()
+        return [(*key, [evaluation_id for evaluation_id, in db.session.query(Evaluation.id).filter(
+                    *(column == value for column, value in zip(keys, key))).order_by(Evaluation.id)])
+                for key in counted]
+    
+    @staticmethod
+    def backfill():
+        """
+        Build bitmasks from existing evaluations and add the unique level index.
+        Returns the duplicate evaluations (see duplicates()) that keep the
+        index from being created; they're logged, and left for an admin to
+        resolve, since which of them to keep is a judgement call.
+        """
+        duplicates = CompletedLevels.duplicates()
+        for student_id, sport_type, level, evaluation_ids in duplicates:
+            current_app.logger.warning(f"Student {student_id} has {len(evaluation_ids)} {sport_type} evaluations for "
+                                       f"level {level} (ids {', '.join(map(str, evaluation_ids))}); "
+                                       f"not adding uq_evaluation_student_sport_level until only one is left")
+        for index in Evaluation.__table__.indexes:
+            if not (index.unique and duplicates):
+                index.create(db.engine, checkfirst=True)
+        
+        if db.session.query(CompletedLevels).first():
+            return duplicates
+        
+        masks = {}
+        rows = db.session.query(Evaluation.student_id, Evaluation.sport_type, Evaluation.level).union(
+            db.session.query(EvaluationArchive.student_id, EvaluationArchive.sport_type, EvaluationArchive.level)
+        )
+        for student_id, sport_type, level in rows:
+            try:
+                bit = CompletedLevels.bit(level)
+            except ValueError:
+                current_app.logger.warning(f"Skipping student {student_id}'s {sport_type} evaluation for level {level}")
+                continue
+            key = (student_id, sport_type)
+            masks[key] = masks.get(key, 0) | bit
+        
+        if masks:
+            db.session.execute(db.insert(CompletedLevels), [
+                {'student_id': student_id, 'sport_type': sport_type, 'levels_mask': mask}
+                for (student_id, sport_type), mask in masks.items()
+            ])
+            db.session.commit()
+        return duplicates
     
     def __repr__(self):
-        return f'<Evaluation {self.id}>'
+        return f'<CompletedLevels {self.student_id} {self.sport_type} {self.levels_mask:b}>'
+
+class Job(db.Model):
+    """Background job queued from the admin interface and run by jobs.py workers"""
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(100), nullable=False)
+    args = db.Column(db.Text, nullable=True)  # JSON-encoded keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0)  # Percent complete
+    message = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON-encoded return value
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    worker = db.Column(db.String(100), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    run_after = db.Column(db.DateTime, nullable=False)  # Delays retries
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+    
+    creator = db.relationship('User', foreign_keys=[created_by])
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.task} {self.status}>'
+
+class ProgramMigration(db.Model):
+    """Program migrations already applied by migrate_programs.py, so reruns are no-ops"""
+    __tablename__ = 'program_migration'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    mapping = db.Column(db.Text, nullable=False)  # JSON-encoded {old program: new program}
+    teams_moved = db.Column(db.Integer, nullable=False, default=0)
+    athletes_moved = db.Column(db.Integer, nullable=False, default=0)
+    programs_removed = db.Column(db.Integer, nullable=False, default=0)
+    applied_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<ProgramMigration {self.name}>'
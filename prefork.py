@@ -0,0 +1,88 @@
+"""
+Gunicorn preloading (preload_app in gunicorn_config.py).
+
+The master builds the app once, and warm() then imports every view module,
+compiles every template and loads the reference data (see reference.py)
+before any worker is forked. Workers start with all of it already in memory
+and share those pages copy-on-write instead of each building a copy, and a
+replacement worker boots in milliseconds. gc.freeze() keeps the collector
+from writing to (and so copying) those objects in every worker.
+
+What can't be shared is redone in each worker by worker_ready(): database
+connections inherited from the master are dropped from the pools, and
+in-process job threads, which don't survive a fork, are started there.
+Each worker logs how long it took to boot and its memory: RSS, its
+proportional share (PSS, shared pages split between the processes using
+them) and how much of it is still shared.
+"""
+
+import gc
+import os
+import time
+
+# Set by gunicorn_config.py when the master preloads the app; create_app()
+# then leaves per-process threads to worker_ready()
+preloading = False
+
+def memory_usage():
+    """This process's memory in MB: rss always, pss/shared/private where /proc/self/smaps_rollup exists"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    except OSError:
+        import resource
+        import sys
+        # Peak rather than current RSS; ru_maxrss is in kilobytes on Linux, bytes on macOS
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3)}
+    kb = {name: int(value.split()[0]) for name, value in fields.items() if value.strip().endswith('kB')}
+    return {
+        'rss': kb['Rss'] / 1e3,
+        'pss': kb['Pss'] / 1e3,
+        'shared': (kb['Shared_Clean'] + kb['Shared_Dirty']) / 1e3,
+        'private': (kb['Private_Clean'] + kb['Private_Dirty']) / 1e3
+    }
+
+def format_memory(usage):
+    return ', '.join(f'{name} {mb:.1f}MB' for name, mb in usage.items())
+
+def _dispose_engines(app, close):
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+def warm(app, log):
+    """Load everything workers can share. Call in the master after the app is built, before forking."""
+    import pwa
+    import reference
+    from views import LazyView
+    started = time.monotonic()
+    modules = set()
+    for view in app.view_functions.values():
+        if isinstance(view, LazyView):
+            view.view  # Imports its module
+            modules.add(view.__module__)
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        pwa.shell_version(app.static_folder)
+        data = reference.snapshot()
+    # Workers open their own connections; the master's would be shared sockets
+    _dispose_engines(app, close=True)
+    gc.collect()
+    gc.freeze()
+    log.info(f"Preloaded {len(modules)} view modules, {len(templates)} templates, {len(data.programs)} programs, "
+             f"{len(data.clubs)} clubs and {len(data.divisions)} divisions in "
+             f"{(time.monotonic() - started) * 1000:.0f}ms: {format_memory(memory_usage())}")
+
+def worker_ready(app, log, forked_at):
+    """Per-process setup in a worker once it has the app; forked_at is time.monotonic() just before the fork"""
+    if preloading:
+        # Anything the master connected after warm() belongs to the master
+        _dispose_engines(app, close=False)
+        if app.config.get('JOB_WORKER_THREADS'):
+            import jobs
+            jobs.start_workers(app, app.config['JOB_WORKER_THREADS'])
+    log.info(f"Worker {os.getpid()} booted in {(time.monotonic() - forked_at) * 1000:.0f}ms: "
+             f"{format_memory(memory_usage())}")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Read-only row projections for list views.
+
+Pages that only print a table don't need User or Team instances: those carry
+every column (password_hash included), an identity-map entry and change
+tracking. The queries here select just the columns the templates print and
+return frozen, slots-only dataclasses built straight from the result rows.
+Nothing they hold is tracked by the session.
+
+Measure the savings on the current database:
+
+    python projections.py --rows 10000
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from models import db, User, Team, Club, Division, Program, CompletedLevels, AthleteDeactivation
+
+@dataclass(frozen=True, slots=True)
+class AthleteRow:
+    id: int
+    username: str
+    full_name: str
+    email: str
+    team_id: Optional[int]
+    team_name: Optional[str]
+    club_name: Optional[str]
+    division_name: Optional[str]
+    coach_name: Optional[str]
+    program_name: Optional[str]
+    participates_snow_stars: bool
+    levels_mask: Optional[int]  # Completed Snow Stars levels
+    deactivated: bool
+
+    @property
+    def highest_level(self):
+        return self.levels_mask.bit_length() if self.levels_mask else 0
+
+@dataclass(frozen=True, slots=True)
+class TeamRow:
+    id: int
+    name: str
+    program_id: int
+    program_name: str
+    coach_id: int
+    coach_name: str
+    club_id: Optional[int]
+    student_count: int
+
+@dataclass(frozen=True, slots=True)
+class TeamOption:
+    id: int
+    name: str
+    program_id: int
+    coach_id: int
+    program_name: str
+    coach_name: str
+
+@dataclass(frozen=True, slots=True)
+class StaffRow:
+    id: int
+    username: str
+    full_name: str
+    email: str
+    user_type: str
+    coach_name: Optional[str]
+
+@dataclass(frozen=True, slots=True)
+class CoachOption:
+    id: int
+    full_name: str
+
+def project(row_class, stmt, yield_per=None):
+    """
+    One row_class per result row; the statement's columns must be in field order.
+    With yield_per the rows are streamed a batch at a time instead of listed.
+    """
+    if yield_per:
+        result = db.session.execute(stmt, execution_options={'yield_per': yield_per})
+        return (row_class(*row) for row in result)
+    return [row_class(*row) for row in db.session.execute(stmt)]
+
+def athletes_query(*criteria):
+    coach = aliased(User)
+    return select(
+        User.id, User.username, User.full_name, User.email, User.team_id, Team.name, Club.name,
+        Division.name, coach.full_name, Program.name, User.participates_snow_stars, CompletedLevels.levels_mask,
+        AthleteDeactivation.student_id.is_not(None)
+    ).outerjoin(Team, Team.id == User.team_id) \
+        .outerjoin(Club, Club.id == User.club_id) \
+        .outerjoin(Division, Division.id == User.division_id) \
+        .outerjoin(coach, coach.id == User.coach_id) \
+        .outerjoin(Program, Program.id == User.program_id) \
+        .outerjoin(CompletedLevels, (CompletedLevels.student_id == User.id) & (CompletedLevels.sport_type == 'snow_stars')) \
+        .outerjoin(AthleteDeactivation, AthleteDeactivation.student_id == User.id) \
+        .where(User.user_type == 'student', *criteria) \
+        .order_by(User.id)
+
+def teams_query(*criteria):
+    student_counts = select(User.team_id, func.count().label('students')) \
+        .where(User.user_type == 'student').group_by(User.team_id).subquery()
+    coach = aliased(User)
+    return select(
+        Team.id, Team.name, Team.program_id, Program.name, Team.coach_id, coach.full_name, Team.club_id,
+        func.coalesce(student_counts.c.students, 0)
+    ).join(Program, Program.id == Team.program_id) \
+        .join(coach, coach.id == Team.coach_id) \
+        .outerjoin(student_counts, student_counts.c.team_id == Team.id) \
+        .where(*criteria) \
+        .order_by(Team.id)
+
+def team_options_query():
+    coach = aliased(User)
+    return select(Team.id, Team.name, Team.program_id, Team.coach_id, Program.name, coach.full_name) \
+        .join(Program, Program.id == Team.program_id) \
+        .join(coach, coach.id == Team.coach_id) \
+        .order_by(Team.id)
+
+def staff_query():
+    coach = aliased(User)
+    return select(User.id, User.username, User.full_name, User.email, User.user_type, coach.full_name) \
+        .outerjoin(coach, coach.id == User.coach_id) \
+        .where(User.user_type != 'student') \
+        .order_by(User.id)
+
+def coach_options_query():
+    return select(User.id, User.full_name).where(User.user_type == 'coach').order_by(User.id)
+
+def _measure(build):
+    import gc
+    import time
+    import tracemalloc
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    started = time.process_time()
+    rows = build()
+    elapsed = time.process_time() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), elapsed, retained, peak
+
+def _benchmark(limit):
+    """ORM instances vs projections for the athletes roster, as manage_athletes shows it"""
+    from sqlalchemy.orm import joinedload
+
+    def orm_rows():
+        rows = db.session.query(User, CompletedLevels.levels_mask) \
+            .outerjoin(CompletedLevels, (CompletedLevels.student_id == User.id) & (CompletedLevels.sport_type == 'snow_stars')) \
+            .filter(User.user_type == 'student') \
+            .options(joinedload(User.club), joinedload(User.division), joinedload(User.team),
+                     joinedload(User.coach), joinedload(User.program)) \
+            .order_by(User.id).limit(limit).all()
+        for user, _ in rows:
+            # What the template reads from each row
+            user.team and user.team.name, user.club and user.club.name, user.coach and user.coach.full_name
+        return rows
+
+    def projected_rows():
+        return project(AthleteRow, athletes_query().limit(limit))
+
+    for name, build in (('ORM instances', orm_rows), ('projections', projected_rows)):
+        build()  # Warm the statement cache
+        count, elapsed, retained, peak = _measure(build)
+        print(f"  {name:14} {count:,} rows  cpu {elapsed * 1000:.0f}ms  "
+              f"held {retained / 1e6:.1f}MB  peak {peak / 1e6:.1f}MB")
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+    parser = argparse.ArgumentParser(description='Compare ORM instances and row projections for the athletes roster')
+    parser.add_argument('--rows', type=int, default=10000)
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+
+    with app.app_context():
+        print(f"📏 Athletes roster, {options.rows:,} rows")
+        _benchmark(options.rows)
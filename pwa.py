@@ -0,0 +1,86 @@
+"""
+Progressive web app support: the web app manifest and the service worker.
+
+The service worker (templates/sw.js) precaches the static shell in SHELL,
+serves roster and attendance pages stale-while-revalidate, and queues
+attendance and evaluation posts in IndexedDB while the device is offline,
+replaying them when the connection returns. Its cache version is a hash of
+the shell files, so changing any of them installs a new worker and
+refreshes the precache on every device.
+
+A post the worker gave up waiting for may still have reached the server, so
+the page gives every post a submission_id and the views that accept queued
+posts save each id only once (claim_submission()). Queued posts also carry
+the id of the user who made them (submitted_by): the worker only replays a
+user's posts while that user is logged in, and the views refuse any that
+arrive under someone else's session (foreign_submission()).
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from functools import lru_cache
+from flask import request
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from models import db, FormSubmission
+
+# Files under static/ every page needs, cached when the worker installs
+SHELL = (
+    'css/style.css',
+    'js/app.js',
+    'img/icon.svg',
+    'img/alpine-ontario-logo.png',
+    'img/horseshoe-logo.png',
+    'offline.html'
+)
+
+def shell_version(static_folder):
+    paths = [os.path.join(static_folder, filename) for filename in SHELL]
+    return _hash_files(tuple((path, os.path.getmtime(path)) for path in paths))
+
+@lru_cache(maxsize=8)
+def _hash_files(paths_mtimes):
+    digest = hashlib.blake2b(digest_size=8)
+    for path, _ in paths_mtimes:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def manifest(url_for):
+    return {
+        'name': 'Alpine Ontario Snow Stars',
+        'short_name': 'Snow Stars',
+        'start_url': url_for('dashboard'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#f7fafc',
+        'theme_color': '#0f4c81',
+        'icons': [
+            {'src': url_for('static', filename='img/icon.svg'), 'sizes': 'any', 'type': 'image/svg+xml', 'purpose': 'any maskable'}
+        ]
+    }
+
+def foreign_submission():
+    """True if the post was made by another user than the one now logged in (a shared device)"""
+    submitted_by = request.form.get('submitted_by', type=int)
+    return submitted_by is not None and submitted_by != current_user.id
+
+def claim_submission():
+    """
+    Record the post's submission_id in the current transaction, before the
+    view writes anything. False if a post with that id was already saved:
+    it's a replay of a post that went through but timed out on the device.
+    Posts without an id (no service worker) are always new.
+    """
+    key = request.form.get('submission_id')
+    if not key:
+        return True
+    db.session.add(FormSubmission(key=key[:36], user_id=current_user.id, endpoint=request.endpoint,
+                                  created_at=datetime.now()))
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
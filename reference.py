@@ -0,0 +1,110 @@
+"""
+Programs, clubs and divisions for the pages' dropdowns and lists, kept in
+memory instead of queried on every request.
+
+They only change when an admin edits one, so each process holds a single
+snapshot of slots rows (as in projections.py) and reloads it when it's out
+of date. Any commit that adds, changes or deletes one of these rows bumps the
+"reference" tag in the fragment cache (see fragment_cache.py), which every
+worker on the host (or every host, with Redis) checks before using its
+snapshot. Writes that bypass the app's sessions (psql, another host's
+cache) can't bump the tag, so a snapshot is also reloaded once it's
+REFERENCE_MAX_AGE seconds old, and the data tools call changed() when they
+finish. Under gunicorn the master loads the snapshot before forking (see
+prefork.py), so workers share one copy until the data changes.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from itertools import chain
+from typing import Optional
+from flask import current_app
+from sqlalchemy import event, select
+from models import db, Program, Club, Division
+import fragment_cache
+
+TAG = 'reference'
+
+@dataclass(frozen=True, slots=True)
+class ProgramOption:
+    id: int
+    name: str
+
+@dataclass(frozen=True, slots=True)
+class ClubRow:
+    id: int
+    name: str
+    description: Optional[str]
+
+@dataclass(frozen=True, slots=True)
+class DivisionOption:
+    id: int
+    name: str
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    version: Optional[str]  # The tag's token when loading started
+    loaded_at: float  # time.monotonic()
+    programs: tuple
+    clubs: tuple
+    divisions: tuple
+
+_snapshot = None
+_lock = threading.Lock()
+
+def _rows(row_class, stmt):
+    # Always from the primary: a lagging replica would leave a stale snapshot
+    # in place until the next change
+    return tuple(row_class(*row) for row in db.session.execute(stmt, bind_arguments={'bind': db.engine}))
+
+def _load(version):
+    return Snapshot(
+        version=version,
+        loaded_at=time.monotonic(),
+        programs=_rows(ProgramOption, select(Program.id, Program.name).order_by(Program.id)),
+        clubs=_rows(ClubRow, select(Club.id, Club.name, Club.description).order_by(Club.id)),
+        divisions=_rows(DivisionOption, select(Division.id, Division.name).order_by(Division.id))
+    )
+
+def snapshot():
+    """This process's snapshot, reloaded first if the data changed since it was taken or it's too old"""
+    global _snapshot
+    # Read the version before the rows, so a change committed while loading
+    # leaves the snapshot already out of date rather than wrongly current
+    version = current_app.extensions['fragment_cache'].tag_version(TAG)
+    current = _snapshot
+    # Without a version (no shared cache, or it failed) only the age tells
+    if current is not None and current.version == version and \
+            time.monotonic() - current.loaded_at < current_app.config.get('REFERENCE_MAX_AGE', 60):
+        return current
+    with _lock:
+        if _snapshot is current:
+            _snapshot = _load(version)
+        return _snapshot
+
+def programs():
+    return snapshot().programs
+
+def clubs():
+    return snapshot().clubs
+
+def divisions():
+    return snapshot().divisions
+
+def changed():
+    """
+    Mark every process's snapshot out of date now, for writes that don't go
+    through an app session flush: Core UPDATE/DELETE, raw SQL, bulk loads
+    """
+    global _snapshot
+    current_app.extensions['fragment_cache'].invalidate_now([TAG])
+    _snapshot = None
+
+def _note_changes(session, flush_context):
+    if any(isinstance(obj, (Program, Club, Division)) for obj in chain(session.new, session.dirty, session.deleted)):
+        fragment_cache.invalidate(TAG)
+
+def init_reference(app):
+    """Register the flush hook that marks the snapshots stale"""
+    event.listen(db.session, 'after_flush', _note_changes)
@@ -0,0 +1,62 @@
+"""
+Optional read-replica routing.
+
+When DATABASE_REPLICA_URL is set, SELECTs made while handling GET/HEAD
+requests go to the replica engine. Everything else stays on the primary:
+writes, non-GET requests, code running outside a request (CLI scripts, job
+workers), and requests from a browser that wrote within the last
+REPLICA_PIN_SECONDS, so people always see their own changes.
+
+To try it locally, point DATABASE_REPLICA_URL at a copy of the SQLite file
+(or at a second local Postgres fed by streaming replication).
+"""
+
+import time
+import sqlalchemy as sa
+from flask import g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = '_primary_until'
+
+def reads_from_replica():
+    """Whether reads in the current context may use the replica"""
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return False
+    if g.get('use_primary'):
+        return False
+    return flask_session.get(PIN_KEY, 0) < time.time()
+
+def use_primary():
+    """Send the rest of the current request's reads to the primary"""
+    g.use_primary = True
+
+class RoutingSession(Session):
+    """db.session class that sends safe reads to the 'replica' bind when one is configured"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and 'replica' in self._db.engines:
+            is_read = isinstance(clause, sa.sql.selectable.SelectBase) and \
+                getattr(clause, '_for_update_arg', None) is None
+            if self._flushing or not is_read:
+                # Once this session writes, keep it on the primary so it reads its own changes
+                self.info['primary'] = True
+            elif not self.info.get('primary') and reads_from_replica():
+                return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def init_replica(app):
+    """Register the replica bind and the read-your-writes hook. Call before db.init_app()."""
+    replica_uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not replica_uri:
+        return
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds['replica'] = replica_uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    @app.after_request
+    def pin_after_write(response):
+        if request.method not in SAFE_METHODS:
+            flask_session[PIN_KEY] = time.time() + app.config.get('REPLICA_PIN_SECONDS', 5)
+        return response
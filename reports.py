@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Batch season report cards.
+
+All athletes, evaluations and attendance for a club or program are loaded in
+bulk (one query per table, including the archive tables past seasons were
+moved to), then each athlete's report is rendered in a process pool.
+Finished reports are written to a staging directory next to the zip, so a
+run that fails part way resumes where it stopped instead of starting over.
+The directory is named after a hash of the data, so a retry after the data
+changed starts afresh instead of mixing old and new reports.
+
+    python reports.py --club-id 1 --output report-cards.zip --processes 4
+"""
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from flask import current_app
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jobs import task
+from models import db, User, Evaluation, EvaluationArchive, Attendance, AttendanceArchive, Team, Program, Club
+
+try:
+    from weasyprint import HTML  # Optional, only needed for PDF output
+except ImportError:
+    HTML = None
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+FORMATS = ('html', 'pdf')
+
+# Created lazily in each pool process
+_env = None
+
+def _athlete_scope(query, club_id=None, program_id=None):
+    query = query.filter(User.user_type == 'student')
+    if club_id:
+        query = query.filter(User.club_id == club_id)
+    if program_id:
+        query = query.filter(User.program_id == program_id)
+    return query
+
+def prefetch_report_data(club_id=None, program_id=None):
+    """Load everything the report cards need as plain dicts, current and archived seasons"""
+    Coach = db.aliased(User)
+    athlete_rows = _athlete_scope(
+        db.session.query(User.id, User.full_name, Club.name, Program.name, Team.name, Coach.full_name)
+        .outerjoin(Club, Club.id == User.club_id)
+        .outerjoin(Program, Program.id == User.program_id)
+        .outerjoin(Team, Team.id == User.team_id)
+        .outerjoin(Coach, Coach.id == User.coach_id),
+        club_id, program_id
+    ).order_by(User.id).all()
+
+    athletes = {}
+    for athlete_id, full_name, club, program, team, coach in athlete_rows:
+        athletes[athlete_id] = {
+            'id': athlete_id,
+            'full_name': full_name,
+            'club': club,
+            'program': program,
+            'team': team,
+            'coach': coach,
+            'evaluations': [],
+            'attendance': []
+        }
+
+    Coach = db.aliased(User)
+    evaluations = []
+    for model in (EvaluationArchive, Evaluation):
+        evaluations.extend(_athlete_scope(
+            db.session.query(model, Coach.full_name)
+            .join(User, User.id == model.student_id)
+            .join(Coach, Coach.id == model.coach_id),
+            club_id, program_id
+        ).filter(model.sport_type == 'snow_stars').all())
+    evaluations.sort(key=lambda row: (row[0].student_id, row[0].level, row[0].created_at))
+
+    for evaluation, coach_name in evaluations:
+        athletes[evaluation.student_id]['evaluations'].append({
+            'date': evaluation.created_at.strftime('%Y-%m-%d'),
+            'level': evaluation.level,
+            'coach': coach_name,
+            'skills_score': evaluation.skills_score,
+            'attitude_score': evaluation.attitude_score,
+            'performance_score': evaluation.performance_score,
+            'movement_quality_score': evaluation.movement_quality_score,
+            'balance_score': evaluation.balance_score,
+            'control_score': evaluation.control_score,
+            'awareness_score': evaluation.awareness_score,
+            'average_score': evaluation.average_score,
+            'comments': evaluation.comments
+        })
+
+    attendance = []
+    for model in (AttendanceArchive, Attendance):
+        attendance.extend(_athlete_scope(
+            db.session.query(model.student_id, model.session_date, model.attended)
+            .join(User, User.id == model.student_id),
+            club_id, program_id
+        ).all())
+    attendance.sort(key=lambda row: (row[0], row[1]))
+
+    for student_id, session_date, attended in attendance:
+        athletes[student_id]['attendance'].append((session_date.strftime('%Y-%m-%d'), bool(attended)))
+
+    for athlete in athletes.values():
+        levels = [evaluation['level'] for evaluation in athlete['evaluations']]
+        athlete['highest_level'] = max(levels) if levels else 0
+        athlete['attended_count'] = sum(1 for _, attended in athlete['attendance'] if attended)
+        athlete['attendance_rate'] = athlete['attended_count'] / len(athlete['attendance']) if athlete['attendance'] else 0
+
+    return list(athletes.values())
+
+def report_filename(athlete, fmt):
+    slug = re.sub(r'[^a-z0-9]+', '-', athlete['full_name'].lower()).strip('-') or 'athlete'
+    return f"{athlete['id']:06d}-{slug}.{fmt}"
+
+def render_report(athlete, fmt='html'):
+    """Render one report card. Returns bytes."""
+    global _env
+    if _env is None:
+        _env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+    html = _env.get_template('report_card.html').render(athlete=athlete, generated_on=date.today().isoformat())
+    if fmt == 'pdf':
+        return HTML(string=html).write_pdf()
+    return html.encode('utf-8')
+
+def _render_to_file(args):
+    """Pool worker: render a report and move it into place atomically"""
+    athlete, fmt, staging_dir = args
+    path = os.path.join(staging_dir, report_filename(athlete, fmt))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(render_report(athlete, fmt))
+    os.replace(tmp_path, path)
+    return path
+
+def generate_report_cards(output_path, club_id=None, program_id=None, fmt='html', processes=None, progress=None):
+    """
+    Write one report card per athlete into a zip at output_path.
+    Call inside an app context. progress(percent, message) is called as reports finish.
+    Returns the number of athletes included.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown report format: {fmt}')
+    if fmt == 'pdf' and HTML is None:
+        raise RuntimeError('PDF report cards require weasyprint (pip install weasyprint)')
+
+    athletes = prefetch_report_data(club_id, program_id)
+    # The database isn't needed while rendering, so don't hold a connection open
+    db.session.remove()
+
+    # Reports already rendered from exactly this data can be reused; any from
+    # a run over different data are thrown away
+    version = hashlib.sha1(json.dumps(athletes, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    staging_dir = f'{output_path}.{version}.parts'
+    for stale in glob.glob(glob.escape(output_path) + '.*.parts'):
+        if stale != staging_dir:
+            shutil.rmtree(stale, ignore_errors=True)
+    os.makedirs(staging_dir, exist_ok=True)
+    done = set(name for name in os.listdir(staging_dir) if not name.endswith('.tmp'))
+    pending = [athlete for athlete in athletes if report_filename(athlete, fmt) not in done]
+
+    total = len(athletes)
+    finished = total - len(pending)
+    if pending:
+        # Spawned (not forked) children, since this may run inside a threaded worker
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            work = [(athlete, fmt, staging_dir) for athlete in pending]
+            chunksize = max(1, len(work) // ((processes or os.cpu_count() or 1) * 4))
+            for _ in executor.map(_render_to_file, work, chunksize=chunksize):
+                finished += 1
+                if progress and finished % 50 == 0:
+                    progress(finished * 100 // total, f'{finished}/{total} report cards rendered')
+
+    # Assemble the archive only once every report exists, then drop the staging files
+    tmp_zip = output_path + '.tmp'
+    with zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for athlete in athletes:
+            name = report_filename(athlete, fmt)
+            archive.write(os.path.join(staging_dir, name), name)
+    os.replace(tmp_zip, output_path)
+    shutil.rmtree(staging_dir)
+
+    return total
+
+def report_archive_path(club_id=None, program_id=None, fmt='html'):
+    """Stable output path per scope, so a retried job finds the staging directory (see generate_report_cards)"""
+    reports_dir = current_app.config['REPORTS_DIR']
+    os.makedirs(reports_dir, exist_ok=True)
+    return os.path.join(reports_dir, f'report-cards-club{club_id or "all"}-program{program_id or "all"}-{fmt}.zip')
+
+@task('report_cards')
+def report_cards_task(job, club_id=None, program_id=None, fmt='html'):
+    output_path = report_archive_path(club_id, program_id, fmt)
+    count = generate_report_cards(
+        output_path,
+        club_id=club_id,
+        program_id=program_id,
+        fmt=fmt,
+        processes=current_app.config.get('REPORT_PROCESSES'),
+        progress=job.progress
+    )
+    return {'path': output_path, 'count': count}
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate season report cards')
+    parser.add_argument('--club-id', type=int, help='Only athletes in this club')
+    parser.add_argument('--program-id', type=int, help='Only athletes in this program')
+    parser.add_argument('--format', choices=FORMATS, default='html')
+    parser.add_argument('--processes', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--output', default='report-cards.zip')
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+
+    with app.app_context():
+        count = generate_report_cards(
+            os.path.abspath(options.output),
+            club_id=options.club_id,
+            program_id=options.program_id,
+            fmt=options.format,
+            processes=options.processes,
+            progress=lambda percent, message: print(f"  {percent}% {message}")
+        )
+    print(f"✅ Wrote {count} report card(s) to {options.output}")
@@ -0,0 +1,197 @@
+"""
+Bulk roster changes for admins: move athletes to a team, reassign their
+coach, change their program, deactivate them or reactivate them.
+
+A change applies to a Selection of athletes, either ticked one by one on the
+athletes page or everyone matching club, division, program, team and coach
+filters, and runs as one set-based UPDATE (plus an INSERT ... SELECT to
+deactivate) however many athletes that is. preview() counts the athletes the
+change would touch; apply() passes that count back and the change is
+refused, in the same transaction as the writes, if the statements touch a
+different number of rows, so an admin never commits a change to a selection
+that moved after they looked at it.
+
+Deactivated athletes keep their accounts and history but leave their team
+and coach (AthleteDeactivation records what they had), are logged out (see
+load_user in app.py), and are left out of every later selection except
+reactivate's, which puts them back on the team and coach they had (unless
+they've been given new ones since). Reactivate's team and coach filters
+match the team and coach the athletes had when they were deactivated.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import aliased
+from models import db, User, Team, Program, AthleteDeactivation
+import fragment_cache
+import leaderboard
+
+OPERATIONS = {
+    'move_team': 'Move to team',
+    'reassign_coach': 'Reassign coach',
+    'change_program': 'Change program',
+    'deactivate': 'Deactivate',
+    'reactivate': 'Reactivate'
+}
+FILTERS = ('club_id', 'division_id', 'program_id', 'team_id', 'coach_id')
+PREVIEW_NAMES = 10
+ID_BATCH = 1000  # Ids per IN list, well under SQLite's bound parameter limit
+
+class RosterError(Exception):
+    pass
+
+def deactivated(student_id):
+    """EXISTS condition: the athlete (an id or a User.id column) has been deactivated"""
+    return select(AthleteDeactivation.student_id).where(AthleteDeactivation.student_id == student_id).exists()
+
+@dataclass(frozen=True, slots=True)
+class Selection:
+    """Athletes by id, by filters, or both (an athlete must match all of them)"""
+    athlete_ids: tuple = ()
+    club_id: Optional[int] = None
+    division_id: Optional[int] = None
+    program_id: Optional[int] = None
+    team_id: Optional[int] = None
+    coach_id: Optional[int] = None
+
+    @classmethod
+    def from_form(cls, form):
+        """From athlete_ids and filter_<name> fields"""
+        return cls(tuple(sorted(set(form.getlist('athlete_ids', type=int)))),
+                   **{name: form.get(f'filter_{name}', type=int) for name in FILTERS})
+
+    @property
+    def filters(self):
+        return {name: getattr(self, name) for name in FILTERS if getattr(self, name) is not None}
+
+    def criteria(self, deactivated_only=False):
+        """Active athletes matching the selection, or deactivated ones (by the team and coach they had)"""
+        if not self.athlete_ids and not self.filters:
+            raise RosterError('Tick some athletes or choose at least one filter')
+        criteria = [User.user_type == 'student']
+        filters = self.filters
+        if deactivated_only:
+            had = {name: filters.pop(name) for name in ('team_id', 'coach_id') if name in filters}
+            criteria.append(User.id.in_(select(AthleteDeactivation.student_id).where(
+                *(getattr(AthleteDeactivation, name) == value for name, value in had.items())).correlate(None)))
+        else:
+            criteria.append(~deactivated(User.id))
+        if self.athlete_ids:
+            criteria.append(User.id.in_(self.athlete_ids))
+        criteria.extend(getattr(User, name) == value for name, value in filters.items())
+        return criteria
+
+@dataclass(frozen=True, slots=True)
+class Preview:
+    operation: str
+    target: Optional[str]  # Name of the team, coach or program
+    count: int
+    names: tuple  # The first PREVIEW_NAMES athletes it changes
+
+def _change(operation, target_id):
+    """(target name, column values, condition for athletes the values would change); values are None to (re)activate"""
+    if operation not in OPERATIONS:
+        raise RosterError(f"Unknown roster change '{operation}'")
+    if operation in ('deactivate', 'reactivate'):
+        return None, None, None
+    if target_id is None:
+        raise RosterError(f'{OPERATIONS[operation]}: choose where to move them')
+    if operation == 'move_team':
+        team = db.session.get(Team, target_id)
+        if team is None:
+            raise RosterError('Team not found')
+        # The team's coach and program come with it, as when an athlete is created on a team
+        values = {'team_id': team.id, 'coach_id': team.coach_id, 'program_id': team.program_id}
+        if team.club_id is not None:
+            values['club_id'] = team.club_id
+        name = team.name
+    elif operation == 'reassign_coach':
+        coach = db.session.get(User, target_id)
+        if coach is None or coach.user_type != 'coach':
+            raise RosterError('Coach not found')
+        values, name = {'coach_id': coach.id}, coach.full_name
+    else:
+        program = db.session.get(Program, target_id)
+        if program is None:
+            raise RosterError('Program not found')
+        values, name = {'program_id': program.id}, program.name
+    changes = or_(*(getattr(User, column).is_distinct_from(value) for column, value in values.items()))
+    return name, values, changes
+
+def _where(operation, selection, changes):
+    return selection.criteria(operation == 'reactivate') + ([changes] if changes is not None else [])
+
+def preview(operation, selection, target_id=None):
+    """How many athletes the change would touch, and the first few of their names"""
+    name, _, changes = _change(operation, target_id)
+    where = _where(operation, selection, changes)
+    count = db.session.scalar(select(func.count()).select_from(User).where(*where))
+    names = db.session.scalars(select(User.full_name).where(*where).order_by(User.full_name).limit(PREVIEW_NAMES)).all()
+    return Preview(operation, name, count, tuple(names))
+
+def apply(operation, selection, target_id=None, expected=None, admin_id=None):
+    """
+    Make the change in the current transaction and return how many athletes
+    it touched. Raises RosterError, leaving the caller to roll back, if that
+    isn't the expected count from preview().
+    """
+    _, values, changes = _change(operation, target_id)
+    where = _where(operation, selection, changes)
+    # What the athletes are leaving, for the caches and leaderboards below
+    before = db.session.execute(
+        select(User.team_id, User.coach_id, User.program_id, User.club_id, User.division_id).where(*where).distinct()
+    ).all()
+    if operation == 'deactivate':
+        # The selection no longer matches them once recorded, so take their ids from the rows written
+        student_ids = db.session.scalars(insert(AthleteDeactivation).from_select(
+            ['student_id', 'team_id', 'coach_id', 'program_id', 'deactivated_by', 'deactivated_at'],
+            select(User.id, User.team_id, User.coach_id, User.program_id, literal(admin_id), literal(datetime.now()))
+            .where(*where)
+        ).returning(AthleteDeactivation.student_id)).all()
+        count = len(student_ids)
+        for start in range(0, count, ID_BATCH):
+            db.session.execute(
+                update(User).where(User.id.in_(student_ids[start:start + ID_BATCH])).values(team_id=None, coach_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        after = []
+    elif operation == 'reactivate':
+        record = (select(AthleteDeactivation.team_id, AthleteDeactivation.coach_id, User.program_id, User.club_id,
+                          User.division_id)
+                  .join(User, User.id == AthleteDeactivation.student_id).where(*where))
+        after = db.session.execute(record.distinct()).all()
+        # Joined to the team and coach so one deleted since (SQLite doesn't apply ON DELETE) isn't restored
+        had = lambda column, model: (select(column).join(model, model.id == column)
+                                     .where(AthleteDeactivation.student_id == User.id).scalar_subquery())
+        count = db.session.execute(
+            update(User).where(*where)
+            .values(team_id=func.coalesce(User.team_id, had(AthleteDeactivation.team_id, Team)),
+                    coach_id=func.coalesce(User.coach_id, had(AthleteDeactivation.coach_id, aliased(User))))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.execute(
+            delete(AthleteDeactivation).where(AthleteDeactivation.student_id.in_(select(User.id).where(*where)))
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        count = db.session.execute(
+            update(User).where(*where).values(**values).execution_options(synchronize_session=False)
+        ).rowcount
+        after = [(values.get('team_id'), values.get('coach_id'), values.get('program_id'), values.get('club_id'),
+                  values.get('division_id'))]
+    if expected is not None and count != expected:
+        raise RosterError(f'The selection changed since the preview ({count} athletes now, not {expected}). '
+                          'Nothing was changed; preview it again.')
+
+    tags, scopes = set(), set()
+    for team_id, coach_id, program_id, club_id, division_id in before + after:
+        tags.update(f'{kind}:{value}' for kind, value in (('team', team_id), ('coach', coach_id), ('program', program_id))
+                    if value is not None)
+        scopes.update((scope, value) for scope, value in (('team', team_id), ('program', program_id), ('club', club_id),
+                                                          ('division', division_id))
+                      if value is not None)
+    fragment_cache.invalidate(*tags)
+    leaderboard.mark_scopes_stale(scopes)
+    return count
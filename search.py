@@ -0,0 +1,136 @@
+"""
+Indexed athlete search for typeahead lookups.
+
+SQLite keeps an FTS5 table (user_search) in sync with the user table through
+triggers and answers prefix queries from it. Postgres uses pg_trgm GIN indexes
+so ILIKE lookups on name, username and email stay indexed.
+"""
+
+import re
+from sqlalchemy import table, column, literal_column, text
+from models import db, User, Team
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+user_search = table('user_search', column('rowid'))
+
+# Scope filters are applied alongside the text match, so each gets an index
+SCOPE_INDEXES = [
+    ('ix_user_type_club', 'user_type, club_id'),
+    ('ix_user_type_division', 'user_type, division_id'),
+    ('ix_user_type_program', 'user_type, program_id'),
+    ('ix_user_type_team', 'user_type, team_id'),
+]
+
+SQLITE_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(
+        full_name, username, email,
+        content='user', content_rowid='id', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON user BEGIN
+        INSERT INTO user_search(rowid, full_name, username, email)
+        VALUES (new.id, new.full_name, new.username, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, full_name, username, email)
+        VALUES ('delete', old.id, old.full_name, old.username, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF full_name, username, email ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, full_name, username, email)
+        VALUES ('delete', old.id, old.full_name, old.username, old.email);
+        INSERT INTO user_search(rowid, full_name, username, email)
+        VALUES (new.id, new.full_name, new.username, new.email);
+    END""",
+]
+
+POSTGRES_STATEMENTS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_user_full_name_trgm ON "user" USING gin (full_name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_user_username_trgm ON "user" USING gin (username gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_user_email_trgm ON "user" USING gin (email gin_trgm_ops)',
+]
+
+def ensure_search_index():
+    """Create the search index for the configured database (safe to re-run)"""
+    dialect = db.engine.dialect.name
+    user_table = '"user"' if dialect == 'postgresql' else 'user'
+
+    with db.engine.begin() as conn:
+        for name, columns in SCOPE_INDEXES:
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {user_table} ({columns})'))
+
+        if dialect == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_search'"
+            )).first()
+            for statement in SQLITE_STATEMENTS:
+                conn.execute(text(statement))
+            if not exists:
+                # Index rows that were written before the triggers existed
+                conn.execute(text("INSERT INTO user_search(user_search) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            for statement in POSTGRES_STATEMENTS:
+                conn.execute(text(statement))
+
+def rebuild_search_index():
+    """Re-index every user row (SQLite only; Postgres indexes maintain themselves)"""
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO user_search(user_search) VALUES ('rebuild')"))
+
+def _fts_query(q):
+    """Turn free text into an FTS5 prefix query: 'jo sm' -> '"jo"* "sm"*'"""
+    tokens = re.findall(r'\w+', q.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def _like_pattern(q):
+    escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def search_athletes(q, club_id=None, division_id=None, program_id=None, team_id=None,
+                    coach_id=None, limit=DEFAULT_LIMIT):
+    """
+    Search athletes by full name, username or email.
+    Returns compact dicts (id, name, username, team) ready for JSON.
+    """
+    q = (q or '').strip()
+    if not q:
+        return []
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+    stmt = db.select(User.id, User.full_name, User.username, Team.name) \
+        .outerjoin(Team, Team.id == User.team_id) \
+        .where(User.user_type == 'student')
+
+    if club_id:
+        stmt = stmt.where(User.club_id == club_id)
+    if division_id:
+        stmt = stmt.where(User.division_id == division_id)
+    if program_id:
+        stmt = stmt.where(User.program_id == program_id)
+    if team_id:
+        stmt = stmt.where(User.team_id == team_id)
+    if coach_id:
+        stmt = stmt.where(Team.coach_id == coach_id)
+
+    if db.engine.dialect.name == 'sqlite':
+        match = _fts_query(q)
+        if not match:
+            return []
+        stmt = stmt.join(user_search, user_search.c.rowid == User.id) \
+            .where(text('user_search MATCH :match').bindparams(match=match)) \
+            .order_by(literal_column('user_search.rank'))
+    else:
+        pattern = _like_pattern(q)
+        stmt = stmt.where(db.or_(
+            User.full_name.ilike(pattern, escape='\\'),
+            User.username.ilike(pattern, escape='\\'),
+            User.email.ilike(pattern, escape='\\')
+        )).order_by(User.full_name)
+
+    rows = db.session.execute(stmt.limit(limit)).all()
+    return [
+        {'id': id, 'name': name, 'username': username, 'team': team}
+        for id, name, username, team in rows
+    ]
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Synthetic load-testing data: clubs, coaches, teams, athletes, attendance and
+evaluations in realistic proportions.
+
+    python seed_data.py --athletes 100000 --attendance 1000000
+
+Rows bypass the ORM. Postgres loads them with COPY FROM STDIN, one connection
+per table (and several for attendance) wherever foreign keys allow tables to
+load side by side. SQLite loads everything with executemany in a single
+transaction. Every generated account shares one precomputed password hash
+(--password, default "password123"), so no time goes into pbkdf2.
+
+Ids are assigned here, following the current maximum of each table, so run
+it against a database nobody else is writing to.
+"""
+
+import io
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from werkzeug.security import generate_password_hash
+import attendance_bits
+from archive import season_boundary
+from models import db, Division, Club, Program, Team, User, Attendance, Evaluation, CompletedLevels
+import reference
+
+FIRST_NAMES = ['Liam', 'Olivia', 'Noah', 'Emma', 'Ethan', 'Charlotte', 'Lucas', 'Amelia', 'Benjamin', 'Ava',
+               'William', 'Sophia', 'Jack', 'Chloe', 'Owen', 'Mia', 'Leo', 'Harper', 'Logan', 'Abigail',
+               'Jacob', 'Ella', 'Theo', 'Zoe', 'Hunter', 'Nora', 'Finn', 'Avery', 'Nathan', 'Maya']
+LAST_NAMES = ['Smith', 'Brown', 'Tremblay', 'Martin', 'Roy', 'Wilson', 'Macdonald', 'Gagnon', 'Johnson',
+              'Taylor', 'Campbell', 'Anderson', 'Leblanc', 'Lee', 'Clark', 'Walker', 'Young', 'Wright',
+              'Scott', 'Mitchell', 'Lavoie', 'Bouchard', 'Murphy', 'Stewart', 'Thompson', 'White']
+COMMENTS = [None, None, None, 'Great progress this session', 'Work on balance in steeper terrain',
+            'Ready for the next level', 'Strong edging, keep hands forward']
+
+COPY_CHUNK_ROWS = 50000
+INSERT_CHUNK_ROWS = 10000
+
+class Table:
+    """One table's generated rows, split into partitions that may load in parallel"""
+
+    def __init__(self, model, columns, partitions):
+        self.table = model.__table__
+        self.columns = columns
+        self.partitions = partitions  # Callables returning row iterators
+
+def _timestamp(day, hour=10):
+    return f'{day.isoformat()} {hour:02d}:00:00.000000'
+
+def _full_name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+def _next_ids(*models):
+    return {model: (db.session.query(db.func.max(model.id)).scalar() or 0) + 1 for model in models}
+
+def _partition(start, count, parts):
+    """Split range(start, start + count) into up to `parts` contiguous ranges"""
+    size = -(-count // max(1, parts)) if count else 0
+    return [(first, min(size, start + count - first)) for first in range(start, start + count, size or 1)]
+
+def plan_dataset(athletes, attendance, evaluations_per_athlete=2, athletes_per_team=20, clubs=50,
+                 password='password123', seed=42, parallel=4):
+    """
+    Describe the dataset as load phases. Tables within a phase only reference
+    tables from earlier phases, so they can load concurrently.
+    Call inside an app context.
+    """
+    ids = _next_ids(Club, User, Team, Attendance, Evaluation)
+    program_ids = [program_id for program_id, in db.session.query(Program.id).order_by(Program.id)]
+    if not program_ids:
+        raise RuntimeError('No programs found. Start the app once (or run init_db) before seeding.')
+    division_ids = [division_id for division_id, in db.session.query(Division.id)] or [None]
+
+    password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+    now = _timestamp(date.today())
+    first_session = season_boundary() + timedelta(days=(5 - season_boundary().weekday()) % 7)  # First Saturday
+
+    team_count = -(-athletes // athletes_per_team)
+    coach_count = -(-team_count // 2)  # Two teams per coach
+    club_ids = list(range(ids[Club], ids[Club] + clubs))
+    coach_ids = list(range(ids[User], ids[User] + coach_count))
+    first_student = ids[User] + coach_count
+    coach_club = {coach_id: club_ids[i % clubs] for i, coach_id in enumerate(coach_ids)}
+
+    def team_of(student_id):
+        index = (student_id - first_student) // athletes_per_team
+        return ids[Team] + index, coach_ids[index // 2], program_ids[index % len(program_ids)]
+
+    def club_rows():
+        for club_id in club_ids:
+            yield club_id, f'Load Test Club {club_id}', 'Synthetic club for load testing', now
+
+    def coach_rows():
+        rng = random.Random(seed)
+        for coach_id in coach_ids:
+            yield (coach_id, f'seed-coach-{coach_id}', f'seed-coach-{coach_id}@example.com', password_hash,
+                   f'Coach {_full_name(rng)}', 'coach', coach_club[coach_id], None, False, False, False,
+                   None, None, None, now)
+
+    def team_rows():
+        for index in range(team_count):
+            coach_id = coach_ids[index // 2]
+            yield (ids[Team] + index, f'Load Test Team {ids[Team] + index}',
+                   program_ids[index % len(program_ids)], coach_id, coach_club[coach_id], 'team', now)
+
+    def student_rows(start, count):
+        def rows():
+            rng = random.Random(seed + start)
+            for student_id in range(start, start + count):
+                team_id, coach_id, program_id = team_of(student_id)
+                yield (student_id, f'seed-athlete-{student_id}', f'seed-athlete-{student_id}@example.com',
+                       password_hash, _full_name(rng), 'student', coach_club[coach_id], rng.choice(division_ids),
+                       False, False, True, coach_id, team_id, program_id, now)
+        return rows
+
+    # Attendance ids follow student order, so each partition knows its id range up front
+    per_student, extra = divmod(attendance, athletes) if athletes else (0, 0)
+
+    def attendance_start(student_id):
+        offset = student_id - first_student
+        return ids[Attendance] + offset * per_student + min(offset, extra)
+
+    def attendance_rows(start, count):
+        def rows():
+            rng = random.Random(seed + start)
+            attendance_id = attendance_start(start)
+            for student_id in range(start, start + count):
+                team_id, coach_id, _ = team_of(student_id)
+                sessions = per_student + (1 if student_id - first_student < extra else 0)
+                for session in range(sessions):
+                    session_date = first_session + timedelta(days=7 * session)
+                    attended = rng.random() < 0.88
+                    yield (attendance_id, student_id, team_id, session_date.isoformat(), attended,
+                           None if attended or rng.random() < 0.7 else 'Sick', coach_id, _timestamp(session_date))
+                    attendance_id += 1
+        return rows
+
+    def evaluation_rows(start, count):
+        def rows():
+            rng = random.Random(seed + start + 1)
+            evaluation_id = ids[Evaluation] + (start - first_student) * evaluations_per_athlete
+            for student_id in range(start, start + count):
+                _, coach_id, _ = team_of(student_id)
+                for level in range(1, evaluations_per_athlete + 1):
+                    scores = [round(rng.uniform(5, 10), 1) for _ in range(7)]
+                    yield (evaluation_id, student_id, coach_id, 'snow_stars', level, *scores, rng.choice(COMMENTS),
+                           _timestamp(first_session + timedelta(days=14 * level)))
+                    evaluation_id += 1
+        return rows
+
+    def completed_rows(start, count):
+        def rows():
+            mask = (1 << evaluations_per_athlete) - 1
+            for student_id in range(start, start + count):
+                yield student_id, 'snow_stars', mask
+        return rows
+
+    student_parts = _partition(first_student, athletes, parallel)
+    user_columns = ['id', 'username', 'email', 'password_hash', 'full_name', 'user_type', 'club_id', 'division_id',
+                    'participates_skier', 'participates_snowboarder', 'participates_snow_stars', 'coach_id',
+                    'team_id', 'program_id', 'created_at']
+    phases = [
+        [Table(Club, ['id', 'name', 'description', 'created_at'], [club_rows])],
+        [Table(User, user_columns, [coach_rows])],
+        [Table(Team, ['id', 'name', 'program_id', 'coach_id', 'club_id', 'team_type', 'created_at'], [team_rows])],
+        [Table(User, user_columns, [student_rows(*part) for part in student_parts])],
+        [
+            Table(Attendance, ['id', 'student_id', 'team_id', 'session_date', 'attended', 'notes', 'recorded_by',
+                               'created_at'], [attendance_rows(*part) for part in student_parts]),
+        ]
+    ]
+    if evaluations_per_athlete:
+        phases[-1] += [
+            Table(Evaluation, ['id', 'student_id', 'coach_id', 'sport_type', 'level', 'skills_score', 'attitude_score',
+                               'performance_score', 'movement_quality_score', 'balance_score', 'control_score',
+                               'awareness_score', 'comments', 'created_at'],
+                  [evaluation_rows(*part) for part in student_parts]),
+            Table(CompletedLevels, ['student_id', 'sport_type', 'levels_mask'],
+                  [completed_rows(*part) for part in student_parts]),
+        ]
+    return phases
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex format, with its backslash escaped for COPY's text format
+        return '\\\\x' + bytes(value).hex()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+def copy_statement(engine, table, columns):
+    quote = engine.dialect.identifier_preparer.quote
+    return f'COPY {quote(table.name)} ({", ".join(quote(column) for column in columns)}) FROM STDIN'
+
+def copy_rows(cursor, sql, rows):
+    """Postgres: send a list of row tuples through COPY on a DBAPI cursor"""
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(map(_copy_value, row)) + '\n' for row in rows)
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+
+def _copy_partition(engine, table, columns, rows):
+    """Postgres: stream one partition through COPY on its own connection and transaction"""
+    sql = copy_statement(engine, table, columns)
+    connection = engine.raw_connection()
+    count = 0
+    try:
+        cursor = connection.cursor()
+        for chunk in _chunks(rows(), COPY_CHUNK_ROWS):
+            copy_rows(cursor, sql, chunk)
+            count += len(chunk)
+        connection.commit()
+    finally:
+        connection.close()
+    return count
+
+def reset_sequences(engine, tables):
+    """Postgres: move id sequences past the explicitly inserted ids"""
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for table in tables:
+            if 'id' in table.c and table.c.id.autoincrement is not False:
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{quote(table.name)}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {quote(table.name)}))"
+                )
+
+def load_postgres(engine, phases, parallel, report):
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        for phase in phases:
+            started = time.perf_counter()
+            futures = [(item, executor.submit(_copy_partition, engine, item.table, item.columns, rows))
+                       for item in phase for rows in item.partitions]
+            counts = {}
+            for item, future in futures:
+                counts[item.table.name] = counts.get(item.table.name, 0) + future.result()
+            report(counts, time.perf_counter() - started)
+    reset_sequences(engine, set(item.table for phase in phases for item in phase))
+
+def load_sqlite(engine, phases, report):
+    """SQLite: one connection, one transaction, executemany per chunk"""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for phase in phases:
+            started = time.perf_counter()
+            counts = {}
+            for item in phase:
+                sql = f'INSERT INTO "{item.table.name}" ({", ".join(item.columns)}) ' \
+                      f'VALUES ({", ".join("?" for _ in item.columns)})'
+                for rows in item.partitions:
+                    for chunk in _chunks(rows(), INSERT_CHUNK_ROWS):
+                        cursor.executemany(sql, chunk)
+                        counts[item.table.name] = counts.get(item.table.name, 0) + len(chunk)
+            report(counts, time.perf_counter() - started)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def seed_dataset(athletes=100000, attendance=1000000, evaluations_per_athlete=2, athletes_per_team=20, clubs=50,
+                 password='password123', seed=42, parallel=4, report=None):
+    """Generate and load a synthetic dataset. Call inside an app context."""
+    report = report or (lambda counts, seconds: None)
+    phases = plan_dataset(athletes, attendance, evaluations_per_athlete, athletes_per_team, clubs,
+                          password, seed, parallel)
+    # Don't hold the planning queries' transaction open (SQLite would block its own loader)
+    db.session.remove()
+    if db.engine.dialect.name == 'postgresql':
+        load_postgres(db.engine, phases, parallel, report)
+    else:
+        load_sqlite(db.engine, phases, report)
+
+    started = time.perf_counter()
+    report({'attendance_bits': attendance_bits.rebuild()}, time.perf_counter() - started)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Load a large synthetic dataset for load testing')
+    parser.add_argument('--athletes', type=int, default=100000)
+    parser.add_argument('--attendance', type=int, default=1000000, help='Total attendance rows')
+    parser.add_argument('--evaluations-per-athlete', type=int, default=2, help='Snow Stars levels evaluated per athlete')
+    parser.add_argument('--athletes-per-team', type=int, default=20)
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--password', default='password123', help='Password shared by every generated account')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed, for repeatable datasets')
+    parser.add_argument('--parallel', type=int, default=4, help='Concurrent COPY connections (Postgres only)')
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app, init_db
+
+    def report(counts, seconds):
+        rows = sum(counts.values())
+        tables = ', '.join(f'{count:,} {name}' for name, count in counts.items())
+        print(f"  ✓ {tables} in {seconds:.1f}s ({rows / max(seconds, 0.001):,.0f} rows/s)")
+
+    init_db()
+    with app.app_context():
+        print(f"🌱 Seeding {options.athletes:,} athletes and {options.attendance:,} attendance rows "
+              f"into {db.engine.dialect.name}...")
+        started = time.perf_counter()
+        seed_dataset(
+            athletes=options.athletes,
+            attendance=options.attendance,
+            evaluations_per_athlete=options.evaluations_per_athlete,
+            athletes_per_team=options.athletes_per_team,
+            clubs=options.clubs,
+            password=options.password,
+            seed=options.seed,
+            parallel=options.parallel,
+            report=report
+        )
+        # Bulk inserts, so the app's workers wouldn't otherwise notice the new programs and clubs
+        reference.changed()
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
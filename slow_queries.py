@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Slow-query log.
+
+Every statement the app's engines run is timed, and any slower than
+SLOW_QUERY_MS is appended to SLOW_QUERY_LOG as a line of JSON with:
+
+  - the Flask endpoint that ran it (or the thread name, for job workers and
+    the check-in flusher)
+  - the shape of its bound parameters: types and counts, never values
+  - its query plan: EXPLAIN on Postgres (EXPLAIN ANALYZE for SELECTs with
+    SLOW_QUERY_ANALYZE on, which runs the query a second time) or EXPLAIN
+    QUERY PLAN on SQLite
+
+Plans are taken on the same connection straight after the statement, at
+most once per statement every SLOW_QUERY_EXPLAIN_EVERY seconds in each
+process. On Postgres they run inside a savepoint, so a failed EXPLAIN can't
+abort the request's transaction.
+
+Every process on the host appends to the same file, which is rotated past
+SLOW_QUERY_LOG_BYTES keeping SLOW_QUERY_LOG_BACKUPS old ones. The admin page
+at /admin/slow-queries ranks statements by total time; so does:
+
+    python slow_queries.py --sort total --limit 20
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from flask import has_request_context, request
+from sqlalchemy import event
+from models import db
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation isn't coordinated between processes
+    fcntl = None
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+SORTS = ('total', 'count', 'mean', 'max')
+
+# A parenthesised list of two or more placeholders, as expanded IN lists and VALUES rows render
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)'
+_PLACEHOLDER_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)')
+
+def normalize(statement):
+    """The statement on one line with placeholder lists collapsed, so IN lists of any length group together"""
+    return _PLACEHOLDER_LIST.sub('(...)', ' '.join(statement.split()))
+
+def _runs(items):
+    """[(label, count)] with consecutive equal labels counted once"""
+    runs = []
+    for item in items:
+        if runs and runs[-1][0] == item:
+            runs[-1][1] += 1
+        else:
+            runs.append([item, 1])
+    return [(label, count) for label, count in runs]
+
+def _type_name(value):
+    return 'None' if value is None else type(value).__name__
+
+def parameter_shape(parameters, executemany=False):
+    """Parameter types, e.g. "(int, str × 2)" or "{team_id_1 × 500: int}"; "40 × (...)" for executemany"""
+    if executemany:
+        return f'{len(parameters)} × {parameter_shape(parameters[0])}' if parameters else '0 rows'
+    if isinstance(parameters, dict):
+        # Expanded IN lists are named name_1, name_2, ...
+        items = [(re.sub(r'_\d+$', '', name), _type_name(value)) for name, value in parameters.items()]
+        return '{' + ', '.join(f'{name}{f" × {count}" if count > 1 else ""}: {kind}'
+                               for (name, kind), count in _runs(items)) + '}'
+    return '(' + ', '.join(kind if count == 1 else f'{kind} × {count}'
+                           for kind, count in _runs(_type_name(value) for value in parameters or ())) + ')'
+
+def _sqlite_plan(rows):
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as an indented tree"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+class RotatingLog:
+    """
+    JSON lines file shared by every process on the host. Each entry is one
+    write() on an O_APPEND descriptor, so lines from different workers don't
+    interleave. Whichever process pushes the file past max_bytes rotates it
+    under a lock file; the others see the file was replaced and reopen it.
+    """
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def paths(self):
+        """Oldest first"""
+        return [f'{self.path}.{index}' for index in range(self.backups, 0, -1)] + [self.path]
+
+    def _stale(self):
+        if self._fd is None or self._pid != os.getpid():
+            return True
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+
+    def _rotate(self):
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have rotated it while we waited for the lock
+            if not self._stale():
+                for index in range(self.backups - 1, 0, -1):
+                    if os.path.exists(f'{self.path}.{index}'):
+                        os.replace(f'{self.path}.{index}', f'{self.path}.{index + 1}')
+                if self.backups:
+                    os.replace(self.path, f'{self.path}.1')
+                else:
+                    os.remove(self.path)
+        self._reopen()
+
+    def write(self, line):
+        data = (line + '\n').encode('utf-8')
+        with self._lock:
+            if self._stale():
+                self._reopen()
+            os.write(self._fd, data)
+            if os.fstat(self._fd).st_size > self.max_bytes:
+                self._rotate()
+
+    def entries(self):
+        for path in self.paths():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue  # Cut short by a crash
+            except FileNotFoundError:
+                continue
+
+class SlowQueryRecorder:
+    """Times statements on the app's engines and logs the slow ones (app.extensions['slow_queries'])"""
+
+    def __init__(self, app):
+        config = app.config
+        self.threshold_ms = config.get('SLOW_QUERY_MS', 250)
+        self.analyze = config.get('SLOW_QUERY_ANALYZE', False)
+        self.explain_every = config.get('SLOW_QUERY_EXPLAIN_EVERY', 300)
+        self.log = RotatingLog(config['SLOW_QUERY_LOG'], config.get('SLOW_QUERY_LOG_BYTES', 5 * 1024 * 1024),
+                               config.get('SLOW_QUERY_LOG_BACKUPS', 3))
+        self.logger = app.logger
+        self._explained = {}  # Statement fingerprint -> time.monotonic() of its last plan
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        try:
+            self.record(conn, cursor, statement, parameters, executemany, elapsed_ms)
+        except Exception as e:
+            # Never fail the query because it couldn't be logged
+            self.logger.warning(f"Slow query not recorded: {e}")
+
+    def record(self, conn, cursor, statement, parameters, executemany, elapsed_ms):
+        normalized = normalize(statement)
+        fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        source = request.endpoint if has_request_context() else threading.current_thread().name
+        plan_kind = plan = None
+        now = time.monotonic()
+        if now - self._explained.get(fingerprint, -self.explain_every) >= self.explain_every:
+            self._explained[fingerprint] = now
+            plan_kind, plan = self.explain(conn, statement, parameters[0] if executemany and parameters else parameters)
+        self.log.write(json.dumps({
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(elapsed_ms, 1),
+            'source': source,
+            'fingerprint': fingerprint,
+            'statement': normalized,
+            'parameters': parameter_shape(parameters, executemany),
+            'rowcount': cursor.rowcount if cursor.rowcount >= 0 else None,
+            'plan_kind': plan_kind,
+            'plan': plan
+        }))
+        self.logger.warning(f"Slow query ({elapsed_ms:.0f}ms) in {source}: {normalized[:200]}")
+
+    def explain(self, conn, statement, parameters):
+        """(kind, plan text) for the statement, or (None, None) if this database or statement can't be explained"""
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+        if verb not in EXPLAINABLE:
+            return None, None
+        dialect = conn.dialect.name
+        # A separate cursor: the statement's own rows haven't been fetched yet
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if dialect == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                return 'EXPLAIN QUERY PLAN', _sqlite_plan(cursor.fetchall())
+            if dialect == 'postgresql':
+                kind = 'EXPLAIN ANALYZE' if self.analyze and verb in ('SELECT', 'WITH') else 'EXPLAIN'
+                cursor.execute('SAVEPOINT slow_query_explain')
+                try:
+                    cursor.execute(f'{kind} {statement}', parameters)
+                    return kind, '\n'.join(row[0] for row in cursor.fetchall())
+                finally:
+                    # Also undoes whatever EXPLAIN ANALYZE ran
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                    cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return None, None
+        except Exception as e:
+            self.logger.warning(f"Couldn't EXPLAIN slow query: {e}")
+            return None, None
+        finally:
+            cursor.close()
+
+@dataclass(slots=True)
+class Offender:
+    """One statement's entries in the slow-query log, summed up"""
+    fingerprint: str
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_at: str = ''
+    parameters: str = ''
+    plan_kind: str = None
+    plan: str = None
+    sources: Counter = field(default_factory=Counter)
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count
+
+def rank(entries, sort='total', limit=50):
+    """Statements by total, count, mean or max time, slowest first"""
+    offenders = {}
+    for entry in entries:
+        offender = offenders.get(entry['fingerprint'])
+        if offender is None:
+            offender = offenders[entry['fingerprint']] = Offender(entry['fingerprint'], entry['statement'])
+        offender.count += 1
+        offender.total_ms += entry['ms']
+        offender.max_ms = max(offender.max_ms, entry['ms'])
+        offender.last_at = max(offender.last_at, entry['at'])
+        offender.parameters = entry['parameters']
+        offender.sources[entry['source']] += 1
+        if entry.get('plan'):
+            offender.plan_kind, offender.plan = entry['plan_kind'], entry['plan']
+    key = {'total': 'total_ms', 'count': 'count', 'mean': 'mean_ms', 'max': 'max_ms'}[sort]
+    return sorted(offenders.values(), key=lambda offender: getattr(offender, key), reverse=True)[:limit]
+
+def init_slow_queries(app):
+    """Time every statement on the app's engines. Call after db.init_app()."""
+    recorder = SlowQueryRecorder(app)
+    app.extensions['slow_queries'] = recorder
+    if recorder.threshold_ms > 0:
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', recorder.before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', recorder.after_cursor_execute)
+    return recorder
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Rank the statements in the slow-query log')
+    parser.add_argument('--sort', choices=SORTS, default='total')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--plans', action='store_true', help='Print each statement\'s latest plan')
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(__file__))
+    from app import app
+
+    recorder = app.extensions['slow_queries']
+    offenders = rank(recorder.log.entries(), options.sort, options.limit)
+    print(f"🐢 {len(offenders)} slowest statements in {recorder.log.path} (over {recorder.threshold_ms:g}ms, by {options.sort})")
+    for offender in offenders:
+        sources = ', '.join(f'{source} ×{count}' for source, count in offender.sources.most_common(3))
+        print(f"\n  {offender.count:5}× total {offender.total_ms:,.0f}ms  mean {offender.mean_ms:,.0f}ms  "
+              f"max {offender.max_ms:,.0f}ms  [{sources}]")
+        print(f"  {offender.statement[:300]}")
+        print(f"  parameters {offender.parameters}")
+        if options.plans and offender.plan:
+            print(f"  {offender.plan_kind}:")
+            print('\n'.join('    ' + line for line in offender.plan.splitlines()))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long the app takes to import, how much memory it
+holds and how long its first request takes, each measured in a fresh
+process the way a cold Vercel instance or a new gunicorn worker starts.
+Runs with the views package loaded lazily (LAZY_VIEWS=1) and up front
+(LAZY_VIEWS=0) so the two can be compared.
+
+    python startup.py --runs 5 --path /login
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+def _measure(path):
+    """Run in the child process: import the app, serve one request, print the numbers as JSON"""
+    import resource
+    import time
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    booted_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    status = app.app.test_client().get(path).status_code
+    served = time.perf_counter()
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'request_ms': (served - imported) * 1000,
+        'boot_mb': booted_rss * scale / 1e6,
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6,
+        'modules': len(sys.modules),
+        'status': status
+    }))
+
+def _run(lazy, path):
+    env = dict(os.environ, LAZY_VIEWS='1' if lazy else '0')
+    output = subprocess.run([sys.executable, __file__, '--child', '--path', path], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def _benchmark(runs, path):
+    from gunicorn_config import workers
+    results = {}
+    for lazy in (False, True):
+        samples = [_run(lazy, path) for _ in range(runs)]
+        results[lazy] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+    print(f"🚀 Cold start, median of {runs} fresh processes, first request GET {path}")
+    for lazy, label in ((False, 'eager views'), (True, 'lazy views')):
+        r = results[lazy]
+        print(f"  {label:12} import {r['import_ms']:.0f}ms  first request {r['request_ms']:.0f}ms "
+              f"(HTTP {r['status']})  boot RSS {r['boot_mb']:.1f}MB  peak RSS {r['peak_mb']:.1f}MB  "
+              f"{r['modules']:.0f} modules")
+    eager, lazy = results[False], results[True]
+    print(f"  Saved per cold Vercel instance: {eager['import_ms'] + eager['request_ms'] - lazy['import_ms'] - lazy['request_ms']:.0f}ms "
+          f"to first response, {eager['peak_mb'] - lazy['peak_mb']:.1f}MB")
+    print(f"  Saved across {workers} gunicorn workers (gunicorn_config.py, no preload): "
+          f"{(eager['boot_mb'] - lazy['boot_mb']) * workers:.1f}MB at boot")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare app startup with lazily and eagerly loaded views')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per mode')
+    parser.add_argument('--path', default='/login', help='First request each process serves')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if options.child:
+        _measure(options.path)
+    else:
+        _benchmark(options.runs, options.path)
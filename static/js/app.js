@@ -0,0 +1,104 @@
+// Registers the service worker and shows the connection / offline queue banner (see pwa.py)
+
+(function() {
+    const script = document.currentScript;
+    const banner = document.getElementById('connection-banner');
+    const userId = script.dataset.userId || null;
+    let pending = 0;
+
+    function show(message, category) {
+        if (!banner) return;
+        banner.textContent = message;
+        banner.className = 'connection-banner connection-banner-' + category;
+        banner.hidden = false;
+    }
+
+    function update() {
+        if (!navigator.onLine) {
+            show('Offline: showing saved pages.' + (pending
+                ? ` ${pending} submission${pending === 1 ? '' : 's'} waiting to be sent.`
+                : ' Attendance and evaluations you submit will be sent when the signal returns.'), 'offline');
+        } else if (pending) {
+            show(`Sending ${pending} saved submission${pending === 1 ? '' : 's'}...`, 'info');
+        } else if (banner && banner.classList.contains('connection-banner-offline')) {
+            banner.hidden = true;
+        }
+    }
+
+    // Each post gets a fresh id, so one the service worker queues after a
+    // timeout isn't saved twice when it's replayed (pwa.claim_submission)
+    document.addEventListener('submit', function(event) {
+        const form = event.target;
+        if (form.method.toLowerCase() !== 'post' || !window.crypto || !crypto.randomUUID) return;
+        let field = form.querySelector('input[name="submission_id"]');
+        if (!field) {
+            field = document.createElement('input');
+            field.type = 'hidden';
+            field.name = 'submission_id';
+            form.appendChild(field);
+        }
+        field.value = crypto.randomUUID();
+        // Queued posts are only replayed for the user who made them
+        if (userId) {
+            let owner = form.querySelector('input[name="submitted_by"]');
+            if (!owner) {
+                owner = document.createElement('input');
+                owner.type = 'hidden';
+                owner.name = 'submitted_by';
+                form.appendChild(owner);
+            }
+            owner.value = userId;
+        }
+    });
+
+    function showHeld(held) {
+        if (!banner) return;
+        show(`${held} submission${held === 1 ? '' : 's'} saved on this device by another user will be sent when they log in. `, 'offline');
+        const discard = document.createElement('button');
+        discard.type = 'button';
+        discard.className = 'btn btn-sm btn-secondary';
+        discard.textContent = 'Discard';
+        discard.addEventListener('click', function() {
+            if (!confirm(`Discard ${held} submission${held === 1 ? '' : 's'} made by another user? They won't be sent.`)) return;
+            navigator.serviceWorker.ready.then(function(registration) {
+                registration.active.postMessage({type: 'discard-held', user: userId});
+            });
+        });
+        banner.appendChild(discard);
+    }
+
+    if (!('serviceWorker' in navigator)) return;
+
+    navigator.serviceWorker.register(script.dataset.serviceWorker, {scope: '/'}).catch(function(error) {
+        console.warn('Service worker registration failed', error);
+    });
+
+    navigator.serviceWorker.addEventListener('message', function(event) {
+        const data = event.data || {};
+        if (data.type !== 'queue') return;
+        pending = data.pending;
+        if (data.needsLogin) {
+            show(`${pending} saved submission${pending === 1 ? '' : 's'} will be sent after you log in again.`, 'offline');
+        } else if (data.rejected && data.rejected.length) {
+            show(`${data.rejected.length} saved submission${data.rejected.length === 1 ? ' was' : 's were'} not accepted: `
+                 + data.rejected.join(' '), 'error');
+        } else if (data.held && !pending) {
+            showHeld(data.held);
+        } else {
+            update();
+        }
+    });
+
+    navigator.serviceWorker.ready.then(function(registration) {
+        registration.active.postMessage({type: navigator.onLine ? 'replay' : 'status', user: userId});
+    });
+
+    window.addEventListener('online', function() {
+        update();
+        navigator.serviceWorker.ready.then(function(registration) {
+            registration.active.postMessage({type: 'replay', user: userId});
+        });
+    });
+    window.addEventListener('offline', update);
+    update();
+})();
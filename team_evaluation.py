@@ -0,0 +1,112 @@
+"""
+Whole-team Snow Stars evaluation sheet.
+
+On level-testing days a coach scores a team's athletes back to back. The
+sheet loads the roster, participation flags and completed levels in one
+query, takes every athlete's scores in a single form post and validates
+them all before anything is written. Either every evaluation on the sheet
+is saved, in one transaction, or none is and each bad row gets its own
+error message.
+
+Form fields are named <field>_<student_id>; a row left completely blank is
+skipped.
+"""
+
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Evaluation, CompletedLevels
+import fragment_cache
+import leaderboard
+import live
+
+SPORT = 'snow_stars'
+MAX_LEVEL = CompletedLevels.MAX_LEVEL
+SCORE_FIELDS = (
+    ('skills_score', 'Skills'),
+    ('attitude_score', 'Attitude'),
+    ('performance_score', 'Performance'),
+    ('movement_quality_score', 'Movement Quality'),
+    ('balance_score', 'Balance'),
+    ('control_score', 'Control'),
+    ('awareness_score', 'Awareness')
+)
+
+def load_roster(team_id, coach_id):
+    """(student, completed levels mask) for the team's athletes assigned to the coach, by name"""
+    return db.session.query(User, CompletedLevels.levels_mask) \
+        .outerjoin(CompletedLevels, (CompletedLevels.student_id == User.id) & (CompletedLevels.sport_type == SPORT)) \
+        .filter(User.team_id == team_id, User.user_type == 'student', User.coach_id == coach_id) \
+        .order_by(User.full_name).all()
+
+def completed_levels(levels_mask):
+    return [level for level in range(1, MAX_LEVEL + 1) if levels_mask and levels_mask & (1 << (level - 1))]
+
+def _parse_score(value):
+    try:
+        score = float(value)
+    except ValueError:
+        return None
+    return score if 0 <= score <= 10 else None
+
+def parse_sheet(form, roster):
+    """
+    Validate the whole sheet. Returns (entries, errors): entries is
+    [(student, level, scores, comments)] for the rows that were filled in,
+    errors is {student_id: message} for the rows that can't be saved.
+    """
+    entries = []
+    errors = {}
+    for student, levels_mask in roster:
+        level_value = form.get(f'level_{student.id}', '').strip()
+        values = {field: form.get(f'{field}_{student.id}', '').strip() for field, _ in SCORE_FIELDS}
+        comments = form.get(f'comments_{student.id}', '').strip()
+        if not level_value and not comments and not any(values.values()):
+            continue
+
+        if not student.participates_snow_stars:
+            errors[student.id] = 'Not enabled for Snow Stars. Update the athlete profile first.'
+            continue
+        level = int(level_value) if level_value.isdigit() else None
+        if level is None or not 1 <= level <= MAX_LEVEL:
+            errors[student.id] = 'Select a level.'
+            continue
+        if levels_mask and levels_mask & (1 << (level - 1)):
+            errors[student.id] = f'Already has an evaluation for level {level}.'
+            continue
+
+        scores = {field: _parse_score(value) for field, value in values.items()}
+        invalid = [label for field, label in SCORE_FIELDS if scores[field] is None]
+        if invalid:
+            errors[student.id] = f"Scores must be between 0 and 10: {', '.join(invalid)}."
+            continue
+        entries.append((student, level, scores, comments or None))
+    return entries, errors
+
+def save_sheet(entries, roster, coach, team):
+    """
+    Insert every entry's evaluation, claim its level and flag its leaderboards in
+    one transaction. Returns False, with nothing written, if another submission
+    claimed one of the levels first; reload the roster and parse again to see which.
+    """
+    existing = {student.id for student, levels_mask in roster if levels_mask is not None}
+    created_at = datetime.now()
+    rows = [dict(student_id=student.id, coach_id=coach.id, sport_type=SPORT, level=level,
+                 comments=comments, created_at=created_at, **scores)
+            for student, level, scores, comments in entries]
+    try:
+        if not CompletedLevels.claim_levels(SPORT, {student.id: level for student, level, _, _ in entries}, existing):
+            db.session.rollback()
+            return False
+        # One executemany; the ORM would insert row by row to fetch each new id
+        db.session.execute(insert(Evaluation), rows)
+        leaderboard.mark_stale_many([(student, level) for student, level, _, _ in entries])
+        fragment_cache.invalidate(f'coach:{coach.id}', f'team:{team.id}')
+        channels = live.team_channels(team.id, team.club_id)
+        for row, (student, _, _, _) in zip(rows, entries):
+            live.publish(channels, 'evaluation', live.evaluation_event(Evaluation(**row), student, coach.full_name))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
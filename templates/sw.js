@@ -0,0 +1,332 @@
+// Service worker for the Snow Stars PWA, rendered by the /sw.js route (see pwa.py)
+
+const SHELL_CACHE = 'shell-{{ version }}';
+const PAGES_CACHE = 'pages-v1';
+const FONTS_CACHE = 'fonts-v1';
+const SHELL = {{ shell|tojson }};
+const OFFLINE_URL = {{ offline_url|tojson }};
+const LOGIN_PATH = {{ login_url|tojson }};
+const LOGOUT_PATH = {{ logout_url|tojson }};
+
+// Roster and attendance pages: served from cache at once, refreshed in the background
+const PAGES = [/^\/dashboard$/, /^\/attendance\/\d+$/, /^\/admin\/athletes$/, /^\/team\/\d+\/evaluate$/, /^\/evaluate\/\d+$/];
+// Posts kept on the device and replayed when the network can't be reached
+const QUEUEABLE = [/^\/attendance\/\d+\/record$/, /^\/team\/\d+\/evaluate$/, /^\/evaluate\/\d+$/];
+// A hill's "one bar" can hang a request for minutes; give up and queue it instead.
+// The post may have arrived anyway: its submission_id (added by app.js) makes the replay a no-op.
+const POST_TIMEOUT_MS = 15000;
+
+const DB_NAME = 'snow-stars-offline';
+const STORE = 'posts';
+const META = 'meta';  // The logged-in user's id, as the pages last reported it
+const SYNC_TAG = 'replay-posts';
+
+self.addEventListener('install', event => {
+    event.waitUntil(caches.open(SHELL_CACHE).then(cache => cache.addAll(SHELL)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => name.startsWith('shell-') && name !== SHELL_CACHE)
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+        await replay();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        if (url.hostname.endsWith('fonts.googleapis.com') || url.hostname.endsWith('fonts.gstatic.com')) {
+            event.respondWith(cacheFirst(request, FONTS_CACHE));
+        }
+        return;
+    }
+
+    if (request.method === 'POST') {
+        event.respondWith(post(event, url));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    if (url.pathname === LOGOUT_PATH) {
+        // Cached pages belong to the user who is leaving; their queued posts wait for them to come back
+        event.waitUntil(Promise.all([caches.delete(PAGES_CACHE), setUser(null)]));
+        return;
+    }
+    if (SHELL.includes(url.pathname)) {
+        event.respondWith(cacheFirst(request, SHELL_CACHE));
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(PAGES.some(page => page.test(url.pathname))
+            ? staleWhileRevalidate(event) : networkOrOffline(event));
+    }
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(replay());
+    }
+});
+
+self.addEventListener('message', event => {
+    const data = event.data || {};
+    // Every page reports who is logged in, so posts are only replayed under their own user
+    const known = 'user' in data ? setUser(data.user) : Promise.resolve();
+    if (data.type === 'replay') {
+        event.waitUntil(known.then(replay));
+    } else if (data.type === 'status') {
+        event.waitUntil(known.then(queueStatus).then(status => event.source.postMessage(Object.assign({type: 'queue'}, status))));
+    } else if (data.type === 'discard-held') {
+        event.waitUntil(known.then(discardHeld).then(queueStatus).then(broadcastStatus));
+    }
+});
+
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request, {ignoreSearch: cacheName === SHELL_CACHE});
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function cachePage(request, response) {
+    // Only the user's own, complete pages: not login redirects, errors, or pages showing a one-off message
+    if (!response.ok || response.redirected || !(response.headers.get('Content-Type') || '').startsWith('text/html')) {
+        return;
+    }
+    const html = await response.clone().text();
+    if (html.includes('data-flash=')) {
+        return;
+    }
+    const cache = await caches.open(PAGES_CACHE);
+    await cache.put(request, new Response(html, {status: response.status, headers: response.headers}));
+}
+
+async function staleWhileRevalidate(event) {
+    const request = event.request;
+    const cached = await caches.match(request, {cacheName: PAGES_CACHE});
+    const network = fetch(request).then(async response => {
+        await cachePage(request, response);
+        event.waitUntil(replay());
+        return response;
+    }).catch(() => null);
+    if (cached) {
+        event.waitUntil(network);
+        return cached;
+    }
+    return (await network) || offlinePage();
+}
+
+async function networkOrOffline(event) {
+    try {
+        const response = await fetch(event.request);
+        event.waitUntil(replay());
+        return response;
+    } catch (error) {
+        return offlinePage();
+    }
+}
+
+async function offlinePage() {
+    return (await caches.match(OFFLINE_URL, {cacheName: SHELL_CACHE})) ||
+        new Response('Offline', {status: 503, headers: {'Content-Type': 'text/plain'}});
+}
+
+async function post(event, url) {
+    const request = event.request;
+    const queueable = QUEUEABLE.some(pattern => pattern.test(url.pathname));
+    const body = queueable ? await request.clone().text() : null;
+    const controller = new AbortController();
+    const timer = queueable ? setTimeout(() => controller.abort(), POST_TIMEOUT_MS) : null;
+    try {
+        const response = await fetch(request, {signal: controller.signal});
+        // Whatever was posted may have changed the cached pages
+        event.waitUntil(caches.delete(PAGES_CACHE));
+        return response;
+    } catch (error) {
+        if (!queueable) {
+            throw error;
+        }
+        await enqueue({
+            url: request.url,
+            body,
+            contentType: request.headers.get('Content-Type'),
+            user: new URLSearchParams(body).get('submitted_by'),
+            queuedAt: Date.now()
+        });
+        if (self.registration.sync) {
+            await self.registration.sync.register(SYNC_TAG).catch(() => {});
+        }
+        await broadcastStatus(await queueStatus());
+        return queuedPage();
+    } finally {
+        clearTimeout(timer);
+    }
+}
+
+function queuedPage() {
+    const html = `<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Saved Offline - Alpine Ontario Snow Stars</title>
+    <link rel="stylesheet" href="${SHELL[0]}">
+</head>
+<body>
+    <div class="container main-content">
+        <div class="card">
+            <h3>Saved on this device</h3>
+            <p>There's no connection right now. Your submission will be sent automatically when the signal returns.</p>
+            <p style="margin-top: 1rem;">
+                <a href="javascript:history.back()" class="btn btn-secondary">Back</a>
+                <a href="/dashboard" class="btn btn-primary">Dashboard</a>
+            </p>
+        </div>
+    </div>
+</body>
+</html>`;
+    return new Response(html, {status: 202, headers: {'Content-Type': 'text/html; charset=utf-8'}});
+}
+
+let replaying = null;
+
+function replay() {
+    // One replay at a time; later triggers wait for the running one
+    if (!replaying) {
+        replaying = replayQueued().finally(() => { replaying = null; });
+    }
+    return replaying;
+}
+
+async function replayQueued() {
+    const user = await currentUser();
+    // Another user's posts are held until they log in on this device again (or are discarded)
+    const posts = user ? (await allQueued()).filter(item => item.user === user) : [];
+    if (!posts.length) {
+        const status = await queueStatus();
+        if (status.held) {
+            await broadcastStatus(status);
+        }
+        return;
+    }
+    const rejected = [];
+    let needsLogin = false;
+    for (const item of posts) {
+        let response;
+        try {
+            response = await fetch(item.url, {
+                method: 'POST',
+                body: item.body,
+                headers: {'Content-Type': item.contentType},
+                credentials: 'same-origin',
+                signal: AbortSignal.timeout(POST_TIMEOUT_MS)
+            });
+        } catch (error) {
+            break;  // Still offline; keep this one and everything after it
+        }
+        if (new URL(response.url).pathname === LOGIN_PATH) {
+            needsLogin = true;  // Session expired; replay after the next login
+            break;
+        }
+        if (response.status >= 500 || response.status === 429) {
+            break;
+        }
+        if (response.status === 409) {
+            continue;  // The session belongs to someone else after all; keep it for its user
+        }
+        // Redirects were followed, so a rejected post shows up as an error flash or a re-rendered form
+        const html = await response.text();
+        const error = html.match(/data-flash="error"[^>]*>([^<]*)</);
+        if (!response.ok || error) {
+            rejected.push(error ? error[1].trim() : `HTTP ${response.status}`);
+        }
+        await dequeue(item.id);
+    }
+    await caches.delete(PAGES_CACHE);
+    await broadcastStatus(Object.assign(await queueStatus(), {rejected, needsLogin}));
+}
+
+async function queueStatus() {
+    // pending: the current user's posts; held: other users'
+    const user = await currentUser();
+    const posts = await allQueued();
+    const pending = user ? posts.filter(item => item.user === user).length : 0;
+    return {pending, held: posts.length - pending};
+}
+
+function broadcastStatus(status) {
+    return broadcast(Object.assign({type: 'queue'}, status));
+}
+
+async function discardHeld() {
+    const user = await currentUser();
+    const held = (await allQueued()).filter(item => !user || item.user !== user);
+    await Promise.all(held.map(item => dequeue(item.id)));
+}
+
+async function broadcast(message) {
+    const clients = await self.clients.matchAll({type: 'window'});
+    clients.forEach(client => client.postMessage(message));
+}
+
+// IndexedDB queue of posts, oldest first
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(DB_NAME, 2);
+        open.onupgradeneeded = () => {
+            const names = open.result.objectStoreNames;
+            if (!names.contains(STORE)) {
+                open.result.createObjectStore(STORE, {keyPath: 'id', autoIncrement: true});
+            }
+            if (!names.contains(META)) {
+                open.result.createObjectStore(META);
+            }
+        };
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+async function withStore(mode, operation, name = STORE) {
+    const db = await openQueue();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(name, mode);
+        const request = operation(transaction.objectStore(name));
+        transaction.oncomplete = () => { db.close(); resolve(request.result); };
+        transaction.onerror = () => { db.close(); reject(transaction.error); };
+    });
+}
+
+function enqueue(item) {
+    return withStore('readwrite', store => store.add(item));
+}
+
+function dequeue(id) {
+    return withStore('readwrite', store => store.delete(id));
+}
+
+function allQueued() {
+    return withStore('readonly', store => store.getAll());
+}
+
+function currentUser() {
+    return withStore('readonly', store => store.get('user'), META).then(user => user || null);
+}
+
+function setUser(user) {
+    return withStore('readwrite', store => store.put(user ? String(user) : null, 'user'), META);
+}
@@ -0,0 +1,86 @@
+"""
+Shared fixtures. Every test gets its own app on a fresh SQLite file, with the
+sample data init_db() creates (admin, coach1, athlete1 on the U12 Demo Team).
+"""
+
+import os
+import sys
+
+# Before config is imported: the module-level app in app.py is built from these
+os.environ['FLASK_ENV'] = 'production'
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['FRAGMENT_CACHE'] = 'none'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import config
+from app import create_app, init_db
+from models import db, User, Team
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build an app on tmp_path/app.db; keyword arguments override config values"""
+    def make(**settings):
+        settings.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "app.db"}')
+        testing = type('TestingConfig', (config.ProductionConfig,), dict(
+            TESTING=True,
+            SESSION_COOKIE_SECURE=False,
+            PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+            **settings
+        ))
+        monkeypatch.setitem(config.config, 'testing', testing)
+        app = create_app('testing')
+        init_db(app)
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def coach(app):
+    return User.query.filter_by(username='coach1').one()
+
+@pytest.fixture
+def team(app):
+    return Team.query.filter_by(name='U12 Demo Team').one()
+
+@pytest.fixture
+def make_athlete(app, coach, team):
+    """Add a Snow Stars athlete to the demo team and coach"""
+    count = 0
+    def make(**fields):
+        nonlocal count
+        count += 1
+        values = dict(
+            username=f'test-athlete-{count}',
+            email=f'test-athlete-{count}@example.com',
+            password_hash='x',
+            full_name=f'Test Athlete {count}',
+            user_type='student',
+            participates_snow_stars=True,
+            coach_id=coach.id,
+            team_id=team.id,
+            program_id=team.program_id,
+            club_id=team.club_id
+        )
+        values.update(fields)
+        athlete = User(**values)
+        db.session.add(athlete)
+        db.session.commit()
+        return athlete
+    return make
+
+@pytest.fixture
+def login(app):
+    """A test client logged in as the given user"""
+    def make(username, password):
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, response.status_code
+        return client
+    return make
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+import pytest
+from models import db, Attendance, AttendanceArchive, Evaluation, EvaluationArchive
+import archive
+
+BOUNDARY = date(2025, 8, 1)
+
+@pytest.fixture
+def athlete(make_athlete, coach, team):
+    """An athlete with an evaluation and an attendance record in the season before BOUNDARY and one after"""
+    athlete = make_athlete()
+    for level, created_at in ((1, datetime(2025, 2, 1)), (2, datetime(2025, 12, 1))):
+        db.session.add(Evaluation(student_id=athlete.id, coach_id=coach.id, sport_type='snow_stars', level=level,
+                                  skills_score=7, attitude_score=7, performance_score=7, created_at=created_at))
+    for session_date in (date(2025, 2, 1), date(2025, 12, 1)):
+        db.session.add(Attendance(student_id=athlete.id, team_id=team.id, session_date=session_date,
+                                  attended=True, recorded_by=coach.id))
+    db.session.commit()
+    return athlete
+
+def test_archive_before(athlete):
+    assert archive.count_archivable(BOUNDARY) == {'attendance': 1, 'evaluations': 1}
+    assert archive.archive_before(BOUNDARY) == {'attendance': 1, 'evaluations': 1}
+    assert [evaluation.level for evaluation in Evaluation.query] == [2]
+    assert [evaluation.level for evaluation in EvaluationArchive.query] == [1]
+    assert [record.session_date for record in AttendanceArchive.query] == [date(2025, 2, 1)]
+    assert archive.count_archivable(BOUNDARY) == {'attendance': 0, 'evaluations': 0}
+
+def test_history_includes_archived_rows(athlete):
+    archive.archive_before(BOUNDARY)
+    assert [evaluation.level for evaluation in archive.athlete_evaluations(athlete.id)] == [2, 1]
+    assert [record.session_date for record in archive.athlete_attendance(athlete.id)] == \
+        [date(2025, 12, 1), date(2025, 2, 1)]
+
+def test_get_evaluation(athlete):
+    archived_id = Evaluation.query.filter_by(level=1).one().id
+    current_id = Evaluation.query.filter_by(level=2).one().id
+    archive.archive_before(BOUNDARY)
+
+    # Ids are kept, so old links still find the row
+    assert archive.get_evaluation(archived_id).level == 1
+    assert archive.get_evaluation(archived_id, archived=1).level == 1
+    assert archive.get_evaluation(archived_id, archived=0) is None
+    assert archive.get_evaluation(current_id, archived=0).level == 2
+    assert archive.get_evaluation(current_id, archived=1) is None
+
+def test_ids_are_not_reused_after_archiving(athlete, coach):
+    archived_id = Evaluation.query.filter_by(level=1).one().id
+    archive.archive_before(BOUNDARY)
+    Evaluation.query.filter_by(level=2).delete()
+    db.session.commit()
+    evaluation = Evaluation(student_id=athlete.id, coach_id=coach.id, sport_type='snow_stars', level=3,
+                            skills_score=7, attitude_score=7, performance_score=7, created_at=datetime.now())
+    db.session.add(evaluation)
+    db.session.commit()
+    assert evaluation.id > archived_id
+
+def test_athlete_page_shows_archived_evaluations(app, athlete, login):
+    archive.archive_before(BOUNDARY)
+    response = login('admin', 'admin123').get(f'/admin/athlete/{athlete.id}')
+    assert response.status_code == 200
+    assert f'/evaluations/{EvaluationArchive.query.one().id}?archived=1' in response.get_data(as_text=True)
@@ -0,0 +1,52 @@
+from datetime import date
+from sqlalchemy import func, select
+from models import db, Attendance, AttendanceBits, CheckIn
+import attendance_bits
+import checkin
+
+def _attendance(team):
+    return {record.student_id: (record.attended, record.recorded_by)
+            for record in Attendance.query.filter_by(team_id=team.id, session_date=date.today())}
+
+def test_flush_with_nothing_buffered(app):
+    assert checkin.flush_check_ins() == 0
+
+def test_flush_merges_check_ins(make_athlete, coach, team):
+    arrived, absent, present = make_athlete(), make_athlete(), make_athlete()
+    # Marked absent before they arrived, and already marked present
+    db.session.add_all([
+        Attendance(student_id=absent.id, team_id=team.id, session_date=date.today(), attended=False, recorded_by=coach.id),
+        Attendance(student_id=present.id, team_id=team.id, session_date=date.today(), attended=True, recorded_by=coach.id)
+    ])
+    db.session.commit()
+    for student in (arrived, arrived, absent, present):
+        checkin.enqueue_check_in(student.id, team.id, checked_in_by=student.id)
+
+    assert checkin.flush_check_ins() == 4
+    # One record per athlete; the one marked absent is now present
+    assert _attendance(team) == {
+        arrived.id: (True, arrived.id),
+        absent.id: (True, absent.id),
+        present.id: (True, coach.id)
+    }
+    assert db.session.scalar(select(func.count()).select_from(CheckIn)) == 0
+    assert checkin.flush_check_ins() == 0
+
+def test_flush_updates_the_bitsets(make_athlete, team):
+    athlete = make_athlete()
+    checkin.enqueue_check_in(athlete.id, team.id, checked_in_by=athlete.id)
+    checkin.flush_check_ins()
+
+    row = db.session.get(AttendanceBits, (athlete.id, team.id, attendance_bits.season_boundary(date.today())))
+    bit = attendance_bits.day_bit(row.season_start, date.today())
+    assert row.recorded & bit and row.attended & bit
+
+def test_flush_in_batches(make_athlete, team):
+    athletes = [make_athlete() for _ in range(3)]
+    for athlete in athletes:
+        checkin.enqueue_check_in(athlete.id, team.id, checked_in_by=athlete.id)
+
+    assert checkin.flush_check_ins(batch_size=2) == 2
+    assert checkin.pending_count() == 1
+    assert checkin.flush_check_ins(batch_size=2) == 1
+    assert set(_attendance(team)) == {athlete.id for athlete in athletes}
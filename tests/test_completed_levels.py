@@ -0,0 +1,48 @@
+import pytest
+from models import db, CompletedLevels
+
+def test_bit():
+    assert CompletedLevels.bit(1) == 0b1
+    assert CompletedLevels.bit(CompletedLevels.MAX_LEVEL) == 1 << (CompletedLevels.MAX_LEVEL - 1)
+    for level in (0, CompletedLevels.MAX_LEVEL + 1, '1', None):
+        with pytest.raises(ValueError):
+            CompletedLevels.bit(level)
+
+def test_claim_level(make_athlete):
+    athlete = make_athlete()
+    assert CompletedLevels.claim_level(athlete.id, 'snow_stars', 3)
+    assert CompletedLevels.claim_level(athlete.id, 'snow_stars', 1)
+    db.session.commit()
+    assert CompletedLevels.get_levels(athlete.id, 'snow_stars') == [1, 3]
+    assert db.session.get(CompletedLevels, (athlete.id, 'snow_stars')).levels_mask == 0b101
+
+def test_claim_level_twice(make_athlete):
+    athlete = make_athlete()
+    assert CompletedLevels.claim_level(athlete.id, 'snow_stars', 2)
+    db.session.commit()
+    assert not CompletedLevels.claim_level(athlete.id, 'snow_stars', 2)
+    # Sports are claimed separately
+    assert CompletedLevels.claim_level(athlete.id, 'skier', 2)
+
+def test_get_levels_without_claims(make_athlete):
+    assert CompletedLevels.get_levels(make_athlete().id, 'snow_stars') == []
+
+def test_claim_levels(make_athlete):
+    first, second = make_athlete(), make_athlete()
+    CompletedLevels.claim_level(first.id, 'snow_stars', 1)
+    db.session.commit()
+    assert CompletedLevels.claim_levels('snow_stars', {first.id: 2, second.id: 4}, existing={first.id})
+    db.session.commit()
+    assert CompletedLevels.get_levels(first.id, 'snow_stars') == [1, 2]
+    assert CompletedLevels.get_levels(second.id, 'snow_stars') == [4]
+
+def test_claim_levels_conflict(make_athlete):
+    first, second = make_athlete(), make_athlete()
+    CompletedLevels.claim_level(first.id, 'snow_stars', 1)
+    CompletedLevels.claim_level(second.id, 'snow_stars', 1)
+    db.session.commit()
+    # One of the two is already done, so the caller rolls both back
+    assert not CompletedLevels.claim_levels('snow_stars', {first.id: 1, second.id: 2},
+                                            existing={first.id, second.id})
+    db.session.rollback()
+    assert CompletedLevels.get_levels(second.id, 'snow_stars') == [1]
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import json
+import pytest
+from models import db, Job
+import jobs
+
+@pytest.fixture
+def flaky_task(monkeypatch):
+    """A task that fails its first `failures` attempts"""
+    calls = []
+    def flaky(job, failures=0):
+        calls.append(job.id)
+        if len(calls) <= failures:
+            raise RuntimeError('boom')
+        job.progress(50, 'halfway')
+        return {'calls': len(calls)}
+    monkeypatch.setitem(jobs.TASKS, 'flaky', flaky)
+    return calls
+
+def _run_next():
+    job_id = jobs.claim_next_job('test-worker')
+    assert job_id is not None
+    jobs.run_job(job_id)
+    return db.session.get(Job, job_id)
+
+def test_enqueue_unknown_task(app):
+    with pytest.raises(ValueError):
+        jobs.enqueue('no-such-task')
+
+def test_run_job(app, flaky_task):
+    jobs.enqueue('flaky')
+    job = _run_next()
+    assert job.status == 'done'
+    assert job.progress == 100
+    assert json.loads(job.result) == {'calls': 1}
+    assert jobs.claim_next_job('test-worker') is None
+
+def test_failed_job_is_retried_later(app, flaky_task):
+    jobs.enqueue('flaky', failures=1)
+    job = _run_next()
+    assert job.status == 'queued'
+    assert job.attempts == 1
+    assert job.error == 'RuntimeError: boom'
+    assert job.run_after > datetime.now()
+    # Not runnable until the retry delay has passed
+    assert jobs.claim_next_job('test-worker') is None
+
+    job.run_after = datetime.now()
+    db.session.commit()
+    job = _run_next()
+    assert job.status == 'done'
+    assert job.attempts == 2
+    assert job.error is None
+
+def test_job_fails_after_max_attempts(app, flaky_task):
+    app.config['JOB_RETRY_DELAY'] = 0
+    jobs.enqueue('flaky', max_attempts=2, failures=5)
+    _run_next()
+    job = _run_next()
+    assert job.status == 'failed'
+    assert job.attempts == 2
+    assert job.finished_at is not None
+
+def test_claimed_job_cannot_be_claimed_again(app, flaky_task):
+    job = jobs.enqueue('flaky')
+    assert jobs.claim_next_job('first') == job.id
+    assert jobs.claim_next_job('second') is None
+
+def _running_job(attempts, heartbeat_age):
+    started = datetime.now() - timedelta(seconds=heartbeat_age)
+    job = Job(task='flaky', args='{}', status='running', attempts=attempts, max_attempts=3,
+              created_at=started, run_after=started, started_at=started, heartbeat_at=started)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_requeue_stale_jobs(app):
+    stale = _running_job(attempts=1, heartbeat_age=3600)
+    used_up = _running_job(attempts=3, heartbeat_age=3600)
+    alive = _running_job(attempts=1, heartbeat_age=1)
+
+    assert jobs.requeue_stale_jobs() == 1
+    assert db.session.get(Job, stale).status == 'queued'
+    assert db.session.get(Job, used_up).status == 'failed'
+    assert db.session.get(Job, alive).status == 'running'
@@ -0,0 +1,95 @@
+import ipaddress
+from types import SimpleNamespace
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+import login_guard
+from login_guard import LoginGuard, MemoryBuckets, SharedBuckets
+
+@pytest.fixture(params=[MemoryBuckets, SharedBuckets])
+def buckets(request):
+    return request.param()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic() as seen by the buckets, moved by setting clock.now"""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(login_guard.time, 'monotonic', lambda: clock.now)
+    return clock
+
+def test_bucket_empties(buckets, clock):
+    assert buckets.retry_after('user:a', 3, 10) == 0
+    assert [buckets.spend('user:a', 3, 10) for _ in range(4)] == [2, 1, 0, 0]
+    assert buckets.retry_after('user:a', 3, 10) == 10
+    # Other keys have their own bucket
+    assert buckets.retry_after('user:b', 3, 10) == 0
+
+def test_bucket_refills(buckets, clock):
+    for _ in range(3):
+        buckets.spend('user:a', 3, 10)
+    clock.now += 4
+    assert buckets.retry_after('user:a', 3, 10) == pytest.approx(6)
+    clock.now += 6
+    assert buckets.retry_after('user:a', 3, 10) == 0
+    # Never past capacity
+    clock.now += 1000
+    assert buckets.spend('user:a', 3, 10) == 2
+
+def test_bucket_reset(buckets, clock):
+    for _ in range(3):
+        buckets.spend('user:a', 3, 10)
+    buckets.reset('user:a', 3, 10)
+    assert buckets.retry_after('user:a', 3, 10) == 0
+
+def test_memory_buckets_keep_recent_keys(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        buckets.spend(key, 1, 10)
+    assert buckets.retry_after('a', 1, 10) == 0
+    assert buckets.retry_after('c', 1, 10) == 10
+
+def test_trusted_proxies():
+    assert login_guard.trusted_proxies('') == []
+    assert login_guard.trusted_proxies('10.0.0.1, *') is True
+    assert login_guard.trusted_proxies('10.0.0.0/8, 127.0.0.1,') == [
+        ipaddress.ip_network('10.0.0.0/8'), ipaddress.ip_network('127.0.0.1/32')]
+    with pytest.raises(ValueError):
+        login_guard.trusted_proxies('not-an-address')
+
+def _guard(trusted_proxies):
+    return LoginGuard(SimpleNamespace(config={'LOGIN_TRUSTED_PROXIES': trusted_proxies,
+                                              'LOGIN_FAILURES_PER_USER': (2, 60)}))
+
+def _request(remote_addr, forwarded_for=None):
+    headers = {'X-Forwarded-For': forwarded_for} if forwarded_for else {}
+    return Request(EnvironBuilder(headers=headers, environ_base={'REMOTE_ADDR': remote_addr}).get_environ())
+
+def test_client_ip_from_trusted_proxy():
+    guard = _guard('10.0.0.0/8')
+    assert guard.client_ip(_request('10.1.2.3', '6.6.6.6, 203.0.113.7')) == '203.0.113.7'
+
+def test_client_ip_ignores_forwarded_for_from_anyone_else():
+    guard = _guard('10.0.0.0/8')
+    assert guard.client_ip(_request('198.51.100.1', '203.0.113.7')) == '198.51.100.1'
+    assert _guard('').client_ip(_request('10.1.2.3', '203.0.113.7')) == '10.1.2.3'
+
+def test_client_ip_trusting_every_proxy():
+    assert _guard('*').client_ip(_request('198.51.100.1', '203.0.113.7')) == '203.0.113.7'
+
+def test_failures_throttle_the_username(clock):
+    guard = _guard('')
+    for _ in range(2):
+        guard.record_failure('Coach1', '203.0.113.7')
+    assert guard.retry_after('coach1', '198.51.100.1') == 60
+    guard.record_success('COACH1')
+    assert guard.retry_after('coach1', '198.51.100.1') == 0
+
+def test_login_is_throttled(app):
+    app.config['LOGIN_FAILURES_PER_USER'] = (2, 60)
+    app.extensions['login_guard'] = LoginGuard(app)
+    client = app.test_client()
+    for _ in range(2):
+        assert client.post('/login', data={'username': 'coach1', 'password': 'wrong'}).status_code == 200
+    response = client.post('/login', data={'username': 'coach1', 'password': 'coach123'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
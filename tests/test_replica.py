@@ -0,0 +1,61 @@
+import shutil
+import sqlite3
+import time
+import pytest
+from flask import session as flask_session
+from sqlalchemy import select, update
+from models import db, User
+import replica
+
+def _coach_name():
+    return db.session.scalar(select(User.full_name).where(User.username == 'coach1'))
+
+@pytest.fixture
+def replica_app(make_app, tmp_path, monkeypatch):
+    """An app whose replica is a copy of the primary with coach1 renamed, so reads show where they went"""
+    # Registering the bind adds a metadata to the shared db object; keep it from other tests' apps
+    monkeypatch.setattr(db, 'metadatas', dict(db.metadatas))
+    replica_path = tmp_path / 'replica.db'
+    app = make_app(SQLALCHEMY_REPLICA_URI=f'sqlite:///{replica_path}')
+    shutil.copy(tmp_path / 'app.db', replica_path)
+    with sqlite3.connect(replica_path) as connection:
+        connection.execute("UPDATE user SET full_name = 'Replica Coach' WHERE username = 'coach1'")
+    return app
+
+def test_get_reads_from_replica(replica_app):
+    with replica_app.test_request_context('/', method='GET'):
+        assert _coach_name() == 'Replica Coach'
+
+def test_post_reads_from_primary(replica_app):
+    with replica_app.test_request_context('/', method='POST'):
+        assert _coach_name() == 'Coach Johnson'
+
+def test_outside_request_reads_from_primary(replica_app):
+    with replica_app.app_context():
+        assert _coach_name() == 'Coach Johnson'
+
+def test_reads_after_a_write_stay_on_primary(replica_app):
+    with replica_app.test_request_context('/', method='GET'):
+        db.session.execute(update(User).where(User.username == 'admin').values(full_name='Admin'))
+        assert _coach_name() == 'Coach Johnson'
+
+def test_pinned_browser_reads_from_primary(replica_app):
+    with replica_app.test_request_context('/', method='GET'):
+        flask_session[replica.PIN_KEY] = time.time() + 5
+        assert _coach_name() == 'Coach Johnson'
+
+def test_use_primary(replica_app):
+    with replica_app.test_request_context('/', method='GET'):
+        replica.use_primary()
+        assert _coach_name() == 'Coach Johnson'
+
+def test_locking_reads_go_to_primary(replica_app):
+    with replica_app.test_request_context('/', method='GET'):
+        name = db.session.scalar(select(User.full_name).where(User.username == 'coach1').with_for_update())
+        assert name == 'Coach Johnson'
+
+def test_post_pins_the_browser(replica_app):
+    client = replica_app.test_client()
+    client.post('/login', data={'username': 'nobody', 'password': 'x'})
+    with client.session_transaction() as session:
+        assert session[replica.PIN_KEY] > time.time()
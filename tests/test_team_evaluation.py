@@ -0,0 +1,104 @@
+from sqlalchemy import func, select
+from models import db, CompletedLevels, Evaluation, FormSubmission
+import team_evaluation
+
+def _row(athlete, level, score='7'):
+    fields = {f'level_{athlete.id}': str(level)}
+    fields.update({f'{field}_{athlete.id}': score for field, _ in team_evaluation.SCORE_FIELDS})
+    return fields
+
+def _evaluations():
+    return db.session.scalar(select(func.count()).select_from(Evaluation))
+
+def test_parse_sheet(make_athlete, coach, team):
+    ready, blank, skier, no_level, done, bad_score = (make_athlete() for _ in range(6))
+    skier.participates_snow_stars = False
+    CompletedLevels.claim_level(done.id, 'snow_stars', 2)
+    db.session.commit()
+    form = {**_row(ready, 1), **_row(skier, 1), **_row(done, 2), **_row(bad_score, 1, '11'),
+            f'comments_{no_level.id}': 'Needs a level'}
+
+    entries, errors = team_evaluation.parse_sheet(form, team_evaluation.load_roster(team.id, coach.id))
+    assert [(student.id, level) for student, level, _, _ in entries] == [(ready.id, 1)]
+    assert set(errors) == {skier.id, no_level.id, done.id, bad_score.id}
+    assert blank.id not in errors
+    assert errors[done.id] == 'Already has an evaluation for level 2.'
+
+def test_save_sheet(make_athlete, coach, team):
+    first, second = make_athlete(), make_athlete()
+    roster = team_evaluation.load_roster(team.id, coach.id)
+    entries, errors = team_evaluation.parse_sheet({**_row(first, 1), **_row(second, 3)}, roster)
+    assert not errors
+
+    assert team_evaluation.save_sheet(entries, roster, coach, team)
+    assert _evaluations() == 2
+    assert CompletedLevels.get_levels(second.id, 'snow_stars') == [3]
+
+def test_save_sheet_after_another_submission(make_athlete, coach, team):
+    first, second = make_athlete(), make_athlete()
+    roster = team_evaluation.load_roster(team.id, coach.id)
+    entries, _ = team_evaluation.parse_sheet({**_row(first, 1), **_row(second, 1)}, roster)
+    # Claimed after the roster was loaded
+    CompletedLevels.claim_level(second.id, 'snow_stars', 1)
+    db.session.commit()
+
+    assert not team_evaluation.save_sheet(entries, roster, coach, team)
+    assert _evaluations() == 0
+    assert CompletedLevels.get_levels(first.id, 'snow_stars') == []
+    _, errors = team_evaluation.parse_sheet({**_row(first, 1), **_row(second, 1)},
+                                            team_evaluation.load_roster(team.id, coach.id))
+    assert list(errors) == [second.id]
+
+def test_replayed_submission_is_saved_once(app, make_athlete, team, login):
+    athlete = make_athlete()
+    client = login('coach1', 'coach123')
+    form = {**_row(athlete, 1), 'submission_id': 'replayed-sheet'}
+
+    for _ in range(2):
+        response = client.post(f'/team/{team.id}/evaluate', data=form)
+        assert response.status_code == 302
+    assert _evaluations() == 1
+
+def test_invalid_sheet_releases_the_submission(app, make_athlete, team, login):
+    athlete = make_athlete()
+    client = login('coach1', 'coach123')
+
+    response = client.post(f'/team/{team.id}/evaluate', data={**_row(athlete, 1, '11'), 'submission_id': 'fixed-sheet'})
+    assert '1 rows need fixing' in response.get_data(as_text=True)
+    assert db.session.scalar(select(func.count()).select_from(FormSubmission)) == 0
+    # The corrected sheet goes through under the same id
+    response = client.post(f'/team/{team.id}/evaluate', data={**_row(athlete, 1), 'submission_id': 'fixed-sheet'})
+    assert response.status_code == 302
+    assert _evaluations() == 1
+
+def test_save_is_retried_once(app, make_athlete, team, login, monkeypatch):
+    athlete = make_athlete()
+    client = login('coach1', 'coach123')
+    save_sheet = team_evaluation.save_sheet
+    failures = []
+
+    def save_after_one_failure(*args):
+        if not failures:
+            failures.append(True)
+            db.session.rollback()
+            return False
+        return save_sheet(*args)
+    monkeypatch.setattr(team_evaluation, 'save_sheet', save_after_one_failure)
+
+    response = client.post(f'/team/{team.id}/evaluate', data={**_row(athlete, 1), 'submission_id': 'retried-sheet'})
+    assert response.status_code == 302
+    assert _evaluations() == 1
+
+def test_save_that_keeps_failing(app, make_athlete, team, login, monkeypatch):
+    athlete = make_athlete()
+    client = login('coach1', 'coach123')
+
+    def always_fail(*args):
+        db.session.rollback()
+        return False
+    monkeypatch.setattr(team_evaluation, 'save_sheet', always_fail)
+
+    response = client.post(f'/team/{team.id}/evaluate', data={**_row(athlete, 1), 'submission_id': 'lost-sheet'})
+    assert 'Another submission changed this team' in response.get_data(as_text=True)
+    assert _evaluations() == 0
+    assert db.session.scalar(select(func.count()).select_from(FormSubmission)) == 0
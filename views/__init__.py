@@ -0,0 +1,131 @@
+"""
+Route table for the app's pages.
+
+Views live in modules by area. Every URL rule is registered when the app is
+created, but with LAZY_VIEWS on (the default) a module is only imported by
+the first request that reaches one of its views, so a cold Vercel instance
+or a fresh gunicorn worker doesn't pay for admin, report, check-in and live
+board code (and whatever they import) before it serves a login page.
+Endpoint names are the bare view names, so url_for() calls don't change.
+
+Compare startup with the views loaded lazily and up front:
+
+    python startup.py --runs 5
+"""
+
+from functools import cached_property
+from flask import current_app, get_flashed_messages, stream_template
+from werkzeug.utils import import_string
+
+# (rule, view name[, methods]) for each module in this package
+ROUTES = {
+    'main': [
+        ('/', 'index'),
+        ('/sw.js', 'service_worker'),
+        ('/manifest.webmanifest', 'web_manifest'),
+        ('/health', 'health'),
+        ('/login', 'login', ['GET', 'POST']),
+        ('/logout', 'logout'),
+        ('/dashboard', 'dashboard'),
+        ('/register', 'register', ['GET', 'POST']),
+    ],
+    'evaluations': [
+        ('/evaluate/<int:student_id>', 'evaluate_student', ['GET', 'POST']),
+        ('/team/<int:team_id>/evaluate', 'evaluate_team', ['GET', 'POST']),
+        ('/evaluations/<int:evaluation_id>', 'view_evaluation'),
+    ],
+    'admin': [
+        ('/admin/programs', 'manage_programs'),
+        ('/admin/teams', 'manage_teams'),
+        ('/admin/create_team', 'create_team', ['POST']),
+        ('/admin/create_program', 'create_program', ['POST']),
+        ('/admin/update_program/<int:program_id>', 'update_program', ['POST']),
+        ('/admin/delete_program/<int:program_id>', 'delete_program', ['POST']),
+        ('/admin/update_team/<int:team_id>', 'update_team', ['POST']),
+        ('/admin/athletes', 'manage_athletes'),
+        ('/admin/create_athlete', 'create_athlete', ['POST']),
+        ('/admin/athletes/bulk', 'bulk_roster_preview', ['POST']),
+        ('/admin/athletes/bulk/apply', 'bulk_roster_apply', ['POST']),
+        ('/api/athletes/search', 'athlete_search'),
+        ('/admin/athlete/<int:athlete_id>', 'view_athlete'),
+        ('/admin/clubs', 'manage_clubs'),
+        ('/admin/create_club', 'create_club', ['POST']),
+        ('/admin/update_club/<int:club_id>', 'update_club', ['POST']),
+        ('/admin/delete_club/<int:club_id>', 'delete_club', ['POST']),
+        ('/admin/delete_team/<int:team_id>', 'delete_team', ['POST']),
+    ],
+    'admin_jobs': [
+        ('/admin/jobs', 'manage_jobs'),
+        ('/admin/jobs/enqueue', 'enqueue_job', ['POST']),
+        ('/admin/jobs/<int:job_id>', 'job_status'),
+        ('/admin/reports/generate', 'generate_reports', ['POST']),
+        ('/admin/reports/<int:job_id>/download', 'download_reports'),
+    ],
+    'diagnostics': [
+        ('/admin/slow-queries', 'slow_queries'),
+    ],
+    'attendance': [
+        ('/attendance/<int:team_id>', 'manage_attendance'),
+        ('/attendance/<int:team_id>/grid', 'attendance_grid'),
+        ('/attendance/<int:team_id>/grid.json', 'attendance_grid_json'),
+        ('/attendance/<int:team_id>/record', 'record_attendance', ['POST']),
+        ('/attendance/<int:team_id>/checkin-cards', 'checkin_cards'),
+        ('/checkin/<token>', 'check_in', ['GET', 'POST']),
+    ],
+    'live_boards': [
+        ('/live/team/<int:team_id>', 'live_team_board'),
+        ('/live/team/<int:team_id>/events', 'live_team_events'),
+        ('/live/club/<int:club_id>', 'live_club_board'),
+        ('/live/club/<int:club_id>/events', 'live_club_events'),
+    ],
+    'leaderboards': [
+        ('/leaderboard/<scope>/<int:scope_id>', 'view_leaderboard'),
+        ('/api/leaderboard/<scope>/<int:scope_id>', 'leaderboard_json'),
+    ],
+}
+
+class LazyView:
+    """Stands in for a view function and imports it on the first call"""
+
+    def __init__(self, import_name):
+        self.__module__, self.__name__ = import_name.rsplit('.', 1)
+        self.import_name = import_name
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+def register_views(app):
+    """Add every rule in ROUTES to the app, importing the views now only if LAZY_VIEWS is off"""
+    lazy = app.config.get('LAZY_VIEWS', True)
+    for module, rules in ROUTES.items():
+        for rule, name, *methods in rules:
+            import_name = f'{__name__}.{module}.{name}'
+            view = LazyView(import_name) if lazy else import_string(import_name)
+            app.add_url_rule(rule, name, view, methods=methods[0] if methods else None)
+
+def stream_page(template_name, **context):
+    """
+    Render a template as a streamed response, for pages with long tables. Pass
+    the rows as a yield_per query so they're read and rendered a batch at a
+    time; output is sent in chunks of about STREAM_CHUNK_SIZE characters.
+    """
+    # Pop flashed messages now: the session cookie is written before the body streams
+    get_flashed_messages(with_categories=True)
+    chunk_size = current_app.config.get('STREAM_CHUNK_SIZE', 16384)
+
+    def chunks(parts):
+        buffer, length = [], 0
+        for part in parts:
+            buffer.append(part)
+            length += len(part)
+            if length >= chunk_size:
+                yield ''.join(buffer)
+                buffer, length = [], 0
+        if buffer:
+            yield ''.join(buffer)
+
+    return current_app.response_class(chunks(stream_template(template_name, **context)), mimetype='text/html')
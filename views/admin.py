@@ -0,0 +1,369 @@
+"""Admin pages for programs, teams, athletes and clubs"""
+
+from datetime import datetime
+from flask import current_app, render_template, request, redirect, url_for, flash
+from flask_login import login_required, current_user
+from sqlalchemy import exists, select
+from models import db, User, Program, Team, Club
+from search import search_athletes
+import archive
+import attendance_bits
+import fragment_cache
+import projections
+import reference
+import roster
+from views import stream_page
+
+# Admin routes for managing programs and teams
+
+@login_required
+def manage_programs():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    programs = Program.query.all()  # The page shows each program's division and teams
+    divisions = reference.divisions()
+    return render_template('manage_programs.html', programs=programs, divisions=divisions)
+
+@login_required
+def manage_teams():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    teams = projections.project(projections.TeamRow, projections.teams_query(), current_app.config['STREAM_YIELD_PER'])
+    programs = reference.programs()
+    coaches = projections.project(projections.CoachOption, projections.coach_options_query())
+    clubs = reference.clubs()
+    return stream_page('manage_teams.html', teams=teams, programs=programs, coaches=coaches, clubs=clubs)
+
+@login_required
+def create_team():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    name = request.form.get('name')
+    program_id = int(request.form.get('program_id'))
+    coach_id = int(request.form.get('coach_id'))
+    club_id = request.form.get('club_id')
+    
+    team = Team(name=name, program_id=program_id, coach_id=coach_id, team_type='team', club_id=int(club_id) if club_id else None)
+    db.session.add(team)
+    fragment_cache.invalidate(f'coach:{coach_id}')
+    db.session.commit()
+    flash('Team created successfully', 'success')
+    return redirect(url_for('manage_teams'))
+
+@login_required
+def create_program():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    name = request.form.get('name')
+    description = request.form.get('description')
+    division_id = request.form.get('division_id')
+    frequency_type = request.form.get('frequency_type', 'consecutive')
+    frequency_value = int(request.form.get('frequency_value', 8))
+    frequency_days = request.form.get('frequency_days', None)
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date', None)
+    
+    # Convert date strings to date objects
+    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    
+    program = Program(
+        name=name, 
+        description=description,
+        division_id=int(division_id) if division_id else None,
+        frequency_type=frequency_type,
+        frequency_value=frequency_value,
+        frequency_days=frequency_days,
+        start_date=start_date_obj,
+        end_date=end_date_obj
+    )
+    db.session.add(program)
+    db.session.commit()
+    flash('Program created successfully', 'success')
+    return redirect(url_for('manage_programs'))
+
+@login_required
+def update_program(program_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    program = Program.query.get_or_404(program_id)
+    
+    program.name = request.form.get('name')
+    program.description = request.form.get('description')
+    division_id = request.form.get('division_id')
+    program.division_id = int(division_id) if division_id else None
+    program.frequency_type = request.form.get('frequency_type', 'consecutive')
+    program.frequency_value = int(request.form.get('frequency_value', 8))
+    program.frequency_days = request.form.get('frequency_days', None)
+    
+    # Handle date updates
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date', None)
+    
+    if start_date:
+        program.start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+    if end_date:
+        program.end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    
+    fragment_cache.invalidate(f'program:{program_id}')
+    db.session.commit()
+    flash('Program updated successfully', 'success')
+    return redirect(url_for('manage_programs'))
+
+@login_required
+def delete_program(program_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    program = Program.query.get_or_404(program_id)
+    
+    # Check if program has teams
+    if db.session.scalar(select(exists().where(Team.program_id == program_id))):
+        flash('Cannot delete program that has teams assigned', 'error')
+        return redirect(url_for('manage_programs'))
+    
+    db.session.delete(program)
+    db.session.commit()
+    flash('Program deleted successfully', 'success')
+    return redirect(url_for('manage_programs'))
+
+@login_required
+def update_team(team_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    # The old coach's dashboard loses the team, the new one's gains it
+    fragment_cache.invalidate(f'team:{team_id}', f'coach:{team.coach_id}')
+    team.name = request.form.get('name')
+    team.program_id = int(request.form.get('program_id'))
+    team.coach_id = int(request.form.get('coach_id'))
+    # team_type is always 'team' now, no need to update
+    club_id = request.form.get('club_id')
+    team.club_id = int(club_id) if club_id else None
+    fragment_cache.invalidate(f'coach:{team.coach_id}')
+    
+    db.session.commit()
+    flash('Team updated successfully', 'success')
+    return redirect(url_for('manage_teams'))
+
+# Admin routes for managing clubs
+
+@login_required
+def manage_athletes():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    athletes = projections.project(projections.AthleteRow, projections.athletes_query(), current_app.config['STREAM_YIELD_PER'])
+    teams = projections.project(projections.TeamOption, projections.team_options_query())
+    clubs = reference.clubs()
+    programs = reference.programs()
+    divisions = reference.divisions()
+    coaches = projections.project(projections.CoachOption, projections.coach_options_query())
+    return stream_page('manage_athletes.html', athletes=athletes, teams=teams, clubs=clubs, programs=programs, divisions=divisions,
+                       coaches=coaches, operations=roster.OPERATIONS)
+
+def _bulk_target(operation):
+    return request.form.get({'move_team': 'target_team_id', 'reassign_coach': 'target_coach_id',
+                             'change_program': 'target_program_id'}.get(operation, ''), type=int)
+
+@login_required
+def bulk_roster_preview():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    operation = request.form.get('operation')
+    selection = roster.Selection.from_form(request.form)
+    target_id = _bulk_target(operation)
+    try:
+        preview = roster.preview(operation, selection, target_id)
+    except roster.RosterError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('manage_athletes'))
+    
+    return render_template('bulk_roster.html', preview=preview, selection=selection, target_id=target_id,
+                           operations=roster.OPERATIONS)
+
+@login_required
+def bulk_roster_apply():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    operation = request.form.get('operation')
+    try:
+        count = roster.apply(operation, roster.Selection.from_form(request.form), _bulk_target(operation),
+                             expected=request.form.get('expected', type=int), admin_id=current_user.id)
+    except roster.RosterError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('manage_athletes'))
+    
+    db.session.commit()
+    flash(f'{roster.OPERATIONS[operation]}: {count} athlete{"s" if count != 1 else ""} updated', 'success')
+    return redirect(url_for('manage_athletes'))
+
+@login_required
+def create_athlete():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    username = request.form.get('username')
+    email = request.form.get('email')
+    password = request.form.get('password')
+    full_name = request.form.get('full_name')
+    club_id = request.form.get('club_id')
+    division_id = request.form.get('division_id')
+    program_id = request.form.get('program_id')
+    team_id = request.form.get('team_id')
+    coach_id = request.form.get('coach_id')
+    participates_snow_stars = request.form.get('participates_snow_stars') == 'on'
+    
+    if User.query.filter_by(username=username).first():
+        flash('Username already exists', 'error')
+        return redirect(url_for('manage_athletes'))
+    
+    if not program_id:
+        flash('Program is required', 'error')
+        return redirect(url_for('manage_athletes'))
+    
+    new_athlete = User(
+        username=username,
+        email=email,
+        password_hash=current_app.extensions['login_guard'].hash_password(password),
+        full_name=full_name,
+        user_type='student',
+        club_id=int(club_id) if club_id else None,
+        division_id=int(division_id) if division_id else None,
+        program_id=int(program_id) if program_id else None,
+        participates_snow_stars=participates_snow_stars,
+        coach_id=int(coach_id) if coach_id else None,
+        team_id=int(team_id) if team_id else None
+    )
+    
+    db.session.add(new_athlete)
+    if new_athlete.team_id:
+        fragment_cache.invalidate(f'team:{new_athlete.team_id}')
+    db.session.commit()
+    flash('Athlete created successfully', 'success')
+    return redirect(url_for('manage_athletes'))
+
+@login_required
+def athlete_search():
+    """Typeahead search over athletes, scoped by club, division, program and team"""
+    if current_user.user_type not in ['admin', 'coach']:
+        return {'error': 'Access denied'}, 403
+    
+    results = search_athletes(
+        request.args.get('q', ''),
+        club_id=request.args.get('club_id', type=int),
+        division_id=request.args.get('division_id', type=int),
+        program_id=request.args.get('program_id', type=int),
+        team_id=request.args.get('team_id', type=int),
+        # Coaches only ever see athletes on their own teams
+        coach_id=current_user.id if current_user.user_type == 'coach' else None,
+        limit=request.args.get('limit', type=int)
+    )
+    return {'results': results}
+
+@login_required
+def view_athlete(athlete_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    athlete = User.query.get_or_404(athlete_id)
+    if athlete.user_type != 'student':
+        flash('User is not an athlete', 'error')
+        return redirect(url_for('dashboard'))
+    
+    # Includes seasons that have been rolled over into the archive tables
+    evaluations = archive.athlete_evaluations(athlete_id)
+    attendance_records = archive.athlete_attendance(athlete_id)
+    attendance_seasons = attendance_bits.athlete_summary(athlete_id)
+    return render_template('view_athlete.html', athlete=athlete, evaluations=evaluations,
+                           attendance_records=attendance_records, attendance_seasons=attendance_seasons)
+
+@login_required
+def manage_clubs():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    clubs = reference.clubs()
+    return render_template('manage_clubs.html', clubs=clubs)
+
+@login_required
+def create_club():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    name = request.form.get('name')
+    description = request.form.get('description')
+    if not name:
+        flash('Club name is required', 'error')
+        return redirect(url_for('manage_clubs'))
+    club = Club(name=name, description=description)
+    db.session.add(club)
+    db.session.commit()
+    flash('Club created successfully', 'success')
+    return redirect(url_for('manage_clubs'))
+
+@login_required
+def update_club(club_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    club = Club.query.get_or_404(club_id)
+    club.name = request.form.get('name')
+    club.description = request.form.get('description')
+    db.session.commit()
+    flash('Club updated successfully', 'success')
+    return redirect(url_for('manage_clubs'))
+
+@login_required
+def delete_club(club_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    club = Club.query.get_or_404(club_id)
+    if db.session.scalar(select(exists().where(Team.club_id == club_id) | exists().where(User.club_id == club_id))):
+        flash('Cannot delete club with associated teams or users', 'error')
+        return redirect(url_for('manage_clubs'))
+    db.session.delete(club)
+    db.session.commit()
+    flash('Club deleted successfully', 'success')
+    return redirect(url_for('manage_clubs'))
+
+@login_required
+def delete_team(team_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if team has students
+    if db.session.scalar(select(exists().where(User.team_id == team_id))):
+        flash('Cannot delete team that has students assigned', 'error')
+        return redirect(url_for('manage_teams'))
+    
+    db.session.delete(team)
+    fragment_cache.invalidate(f'team:{team_id}', f'coach:{team.coach_id}')
+    db.session.commit()
+    flash('Team deleted successfully', 'success')
+    return redirect(url_for('manage_teams'))
@@ -0,0 +1,83 @@
+"""Admin pages for background jobs and season report cards"""
+
+import os
+from flask import current_app, render_template, request, redirect, url_for, flash, send_file, abort
+from flask_login import login_required, current_user
+from models import Job
+import jobs
+import reference
+import reports
+
+# The jobs page lists every admin task, including ones registered outside jobs.py
+jobs.load_tasks()
+
+# Admin routes for background jobs
+
+@login_required
+def manage_jobs():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    recent_jobs = Job.query.order_by(Job.id.desc()).limit(50).all()
+    clubs = reference.clubs()
+    programs = reference.programs()
+    return render_template('manage_jobs.html', jobs=recent_jobs, admin_tasks=jobs.ADMIN_TASKS, clubs=clubs, programs=programs)
+
+@login_required
+def enqueue_job():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    task_name = request.form.get('task')
+    if task_name not in jobs.ADMIN_TASKS:
+        flash('Unknown task', 'error')
+        return redirect(url_for('manage_jobs'))
+    
+    job = jobs.enqueue(task_name, created_by=current_user.id)
+    flash(f'Job #{job.id} queued', 'success')
+    return redirect(url_for('manage_jobs'))
+
+@login_required
+def job_status(job_id):
+    """Job status as JSON for polling"""
+    if current_user.user_type != 'admin':
+        return {'error': 'Access denied'}, 403
+    
+    job = Job.query.get_or_404(job_id)
+    return job.to_dict()
+
+@login_required
+def generate_reports():
+    """Queue season report cards for a club and/or program"""
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    club_id = request.form.get('club_id', type=int)
+    program_id = request.form.get('program_id', type=int)
+    fmt = request.form.get('format', 'html')
+    if fmt not in reports.FORMATS:
+        flash('Unknown report format', 'error')
+        return redirect(url_for('manage_jobs'))
+    
+    job = jobs.enqueue('report_cards', created_by=current_user.id, club_id=club_id, program_id=program_id, fmt=fmt)
+    flash(f'Report cards queued as job #{job.id}', 'success')
+    return redirect(url_for('manage_jobs'))
+
+@login_required
+def download_reports(job_id):
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    job = Job.query.get_or_404(job_id)
+    result = job.to_dict()['result']
+    if job.task != 'report_cards' or job.status != 'done' or not result:
+        abort(404)
+    
+    path = os.path.realpath(result['path'])
+    if not path.startswith(os.path.realpath(current_app.config['REPORTS_DIR']) + os.sep) or not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
@@ -0,0 +1,188 @@
+"""Team attendance, the season grid and athlete check-ins"""
+
+from datetime import datetime
+from flask import current_app, render_template, request, redirect, url_for, flash, abort
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+from models import db, User, Team, Attendance
+from attendance_grid import team_attendance_grid
+import attendance_bits
+import checkin
+import fragment_cache
+import live
+import pwa
+
+@login_required
+def manage_attendance(team_id):
+    """Manage attendance for a team"""
+    if current_user.user_type not in ['admin', 'coach']:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if coach has access to this team
+    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    # Get students in this team
+    students = User.query.filter_by(team_id=team_id, user_type='student').all()
+    
+    # Get recent attendance records
+    attendance_records = Attendance.query.filter_by(team_id=team_id) \
+        .options(joinedload(Attendance.student), joinedload(Attendance.recorder)) \
+        .order_by(Attendance.session_date.desc()).limit(50).all()
+    
+    summary = attendance_bits.team_summary(team_id)
+    
+    return render_template('attendance.html', team=team, students=students, attendance_records=attendance_records,
+                           summary=summary)
+
+@login_required
+def attendance_grid(team_id):
+    """Season attendance grid: students x session dates"""
+    if current_user.user_type not in ['admin', 'coach']:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if coach has access to this team
+    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    season = request.args.get('season', type=int)
+    grid = team_attendance_grid(team_id, season)
+    return render_template('attendance_grid.html', team=team, grid=grid, season=season)
+
+@login_required
+def attendance_grid_json(team_id):
+    """Season attendance grid as JSON"""
+    if current_user.user_type not in ['admin', 'coach']:
+        return {'error': 'Access denied'}, 403
+    
+    team = Team.query.get_or_404(team_id)
+    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
+        return {'error': 'Access denied'}, 403
+    
+    grid = team_attendance_grid(team_id, request.args.get('season', type=int))
+    return dict(grid, team={'id': team.id, 'name': team.name})
+
+@login_required
+def record_attendance(team_id):
+    """Record attendance for a team session"""
+    if current_user.user_type not in ['admin', 'coach']:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if coach has access to this team
+    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if pwa.foreign_submission():
+        return 'This was submitted by another user on this device', 409
+    if not pwa.claim_submission():
+        flash('Attendance recorded successfully', 'success')
+        return redirect(url_for('manage_attendance', team_id=team_id))
+    
+    session_date = datetime.strptime(request.form.get('session_date'), '%Y-%m-%d').date()
+    
+    # Record attendance for each student
+    marks = {}
+    for student in team.students:
+        attended = request.form.get(f'attended_{student.id}') == 'on'
+        notes = request.form.get(f'notes_{student.id}', '')
+        marks[student.id] = (attended, notes)
+        
+        # Check if attendance already exists for this date
+        existing = Attendance.query.filter_by(
+            student_id=student.id,
+            team_id=team_id,
+            session_date=session_date
+        ).first()
+        
+        if existing:
+            existing.attended = attended
+            existing.notes = notes
+            existing.recorded_by = current_user.id
+        else:
+            attendance = Attendance(
+                student_id=student.id,
+                team_id=team_id,
+                session_date=session_date,
+                attended=attended,
+                notes=notes,
+                recorded_by=current_user.id
+            )
+            db.session.add(attendance)
+    
+    # Keep the compact bitsets in the same transaction
+    attendance_bits.record_session(team_id, session_date, marks)
+    fragment_cache.invalidate(f'team:{team_id}')
+    live.publish(live.team_channels(team_id, team.club_id), 'attendance', {
+        'team_id': team_id,
+        'session_date': session_date.isoformat(),
+        'marks': {student_id: attended for student_id, (attended, _) in marks.items()}
+    })
+    db.session.commit()
+    flash('Attendance recorded successfully', 'success')
+    return redirect(url_for('manage_attendance', team_id=team_id))
+
+@login_required
+def checkin_cards(team_id):
+    """Printable check-in link (and QR code) for every athlete on a team"""
+    if current_user.user_type not in ['admin', 'coach']:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if coach has access to this team
+    if current_user.user_type == 'coach' and team.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    cards = []
+    for student in User.query.filter_by(team_id=team_id, user_type='student').order_by(User.full_name).all():
+        url = url_for('check_in', token=checkin.check_in_token(student.id), _external=True)
+        cards.append({'student': student, 'url': url, 'qr': checkin.qr_svg(url)})
+    return render_template('checkin_cards.html', team=team, cards=cards)
+
+
+@login_required
+def check_in(token):
+    """Check one athlete in for today's session. Only buffers the check-in; see checkin.py."""
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    student_id = checkin.read_check_in_token(token)
+    if student_id is None:
+        abort(404)
+    
+    athlete = db.session.query(User.id, User.full_name, User.team_id, Team.coach_id) \
+        .outerjoin(Team, Team.id == User.team_id) \
+        .filter(User.id == student_id, User.user_type == 'student').first()
+    if athlete is None or athlete.team_id is None:
+        abort(404)
+    
+    # Admins, the team's coach, or the athlete themselves
+    allowed = (current_user.user_type == 'admin' or current_user.id == athlete.coach_id
+               or current_user.id == athlete.id)
+    if not allowed:
+        if wants_json:
+            return {'error': 'Access denied'}, 403
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        checkin.enqueue_check_in(athlete.id, athlete.team_id, current_user.id)
+        if current_app.config.get('CHECKIN_FLUSH_THREAD'):
+            checkin.ensure_flusher(current_app._get_current_object())
+        if wants_json:
+            return {'status': 'queued', 'student_id': athlete.id, 'full_name': athlete.full_name}, 202
+        flash(f'{athlete.full_name} checked in', 'success')
+    
+    return render_template('checkin.html', athlete=athlete, token=token, checked_in=request.method == 'POST')
@@ -0,0 +1,18 @@
+"""Admin diagnostics: the slow-query log (see slow_queries.py)"""
+
+from flask import current_app, render_template, request, redirect, url_for, flash
+from flask_login import login_required, current_user
+from slow_queries import SORTS, rank
+
+@login_required
+def slow_queries():
+    if current_user.user_type != 'admin':
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    sort = request.args.get('sort', 'total')
+    if sort not in SORTS:
+        sort = 'total'
+    recorder = current_app.extensions['slow_queries']
+    offenders = rank(recorder.log.entries(), sort, limit=request.args.get('limit', 50, type=int))
+    return render_template('slow_queries.html', offenders=offenders, sort=sort, sorts=SORTS, recorder=recorder)
@@ -0,0 +1,187 @@
+"""Single-athlete and whole-team evaluations"""
+
+from datetime import datetime
+from flask import render_template, request, redirect, url_for, flash, abort
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Evaluation, Team, CompletedLevels
+import archive
+import fragment_cache
+import leaderboard
+import live
+import pwa
+import team_evaluation
+
+@login_required
+def evaluate_student(student_id):
+    if current_user.user_type != 'coach':
+        flash('Only coaches can evaluate athletes', 'error')
+        return redirect(url_for('dashboard'))
+    
+    student = User.query.get_or_404(student_id)
+    
+    if student.user_type != 'student' or student.coach_id != current_user.id:
+        flash('You can only evaluate your assigned students', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        if pwa.foreign_submission():
+            return 'This was submitted by another user on this device', 409
+        if not pwa.claim_submission():
+            flash('Evaluation submitted successfully', 'success')
+            return redirect(url_for('dashboard'))
+        
+        sport_type = request.form.get('sport_type')
+        
+        # Check if student participates in selected sport
+        if sport_type == 'skier' and not student.participates_skier:
+            flash('Student does not participate in skiing. Please update student profile.', 'error')
+            return redirect(url_for('dashboard'))
+        elif sport_type == 'snowboarder' and not student.participates_snowboarder:
+            flash('Student does not participate in snowboarding. Please update student profile.', 'error')
+            return redirect(url_for('dashboard'))
+        elif sport_type == 'snow_stars' and not student.participates_snow_stars:
+            flash('Student does not participate in Snow Stars. Please update student profile.', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if not sport_type:
+            flash('Please select a sport for evaluation.', 'error')
+            return redirect(url_for('dashboard'))
+        
+        level = request.form.get('level', type=int)
+        if level is None or not 1 <= level <= CompletedLevels.MAX_LEVEL:
+            flash(f'Please choose a level between 1 and {CompletedLevels.MAX_LEVEL}.', 'error')
+            return redirect(url_for('dashboard'))
+        duplicate_message = f'Student already has an evaluation for level {level}. You can only create one evaluation per level per student.'
+        
+        evaluation = Evaluation(
+            student_id=student_id,
+            coach_id=current_user.id,
+            sport_type=sport_type,
+            level=level,
+            skills_score=float(request.form.get('skills_score')),
+            attitude_score=float(request.form.get('attitude_score')),
+            performance_score=float(request.form.get('performance_score')),
+            comments=request.form.get('comments'),
+            created_at=datetime.now()
+        )
+        
+        # Add sport-specific criteria
+        if sport_type == 'skier':
+            evaluation.technical_score = float(request.form.get('technical_score'))
+            evaluation.edging_score = float(request.form.get('edging_score'))
+            evaluation.pressure_control_score = float(request.form.get('pressure_control_score'))
+            evaluation.turn_shape_score = float(request.form.get('turn_shape_score'))
+        elif sport_type == 'snowboarder':
+            evaluation.board_control_score = float(request.form.get('board_control_score'))
+            evaluation.edge_awareness_score = float(request.form.get('edge_awareness_score'))
+            evaluation.body_positioning_score = float(request.form.get('body_positioning_score'))
+            evaluation.turn_control_score = float(request.form.get('turn_control_score'))
+        elif sport_type == 'snow_stars':
+            evaluation.movement_quality_score = float(request.form.get('movement_quality_score'))
+            evaluation.balance_score = float(request.form.get('balance_score'))
+            evaluation.control_score = float(request.form.get('control_score'))
+            evaluation.awareness_score = float(request.form.get('awareness_score'))
+        
+        # Claim the level bit and insert the evaluation in the same transaction;
+        # the unique index on evaluation catches anything that slips past
+        try:
+            if not CompletedLevels.claim_level(student_id, sport_type, level):
+                db.session.rollback()
+                flash(duplicate_message, 'error')
+                return redirect(url_for('dashboard'))
+            db.session.add(evaluation)
+            leaderboard.mark_stale(student_id, level)
+            fragment_cache.invalidate(f'coach:{current_user.id}')
+            if student.team_id:
+                fragment_cache.invalidate(f'team:{student.team_id}')
+                live.publish(live.team_channels(student.team_id, student.team.club_id), 'evaluation',
+                             live.evaluation_event(evaluation, student, current_user.full_name))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(duplicate_message, 'error')
+            return redirect(url_for('dashboard'))
+        
+        flash('Evaluation submitted successfully', 'success')
+        return redirect(url_for('dashboard'))
+    
+    # Only Snow Stars program is enabled
+    available_sports = []
+    if student.participates_snow_stars:
+        available_sports.append('snow_stars')
+    
+    # Get completed levels for each sport
+    completed_levels_skier = []
+    completed_levels_snowboarder = []
+    completed_levels_snow_stars = CompletedLevels.get_levels(student_id, 'snow_stars')
+    
+    return render_template('evaluate.html', student=student, 
+                         available_sports=available_sports,
+                         completed_levels_skier=completed_levels_skier,
+                         completed_levels_snowboarder=completed_levels_snowboarder,
+                         completed_levels_snow_stars=completed_levels_snow_stars)
+
+@login_required
+def evaluate_team(team_id):
+    """Evaluation sheet for every athlete on a team, submitted at once"""
+    if current_user.user_type != 'coach':
+        flash('Only coaches can evaluate athletes', 'error')
+        return redirect(url_for('dashboard'))
+
+    team = Team.query.get_or_404(team_id)
+
+    if team.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+
+    roster = team_evaluation.load_roster(team_id, current_user.id)
+    errors = {}
+    if request.method == 'POST':
+        if pwa.foreign_submission():
+            return 'This was submitted by another user on this device', 409
+        if not pwa.claim_submission():
+            flash('Evaluations submitted successfully', 'success')
+            return redirect(url_for('dashboard'))
+        entries, errors = team_evaluation.parse_sheet(request.form, roster)
+        if not entries and not errors:
+            flash('Enter scores for at least one athlete.', 'error')
+        elif not errors:
+            for attempt in range(2):
+                if team_evaluation.save_sheet(entries, roster, current_user, team):
+                    flash(f'{len(entries)} evaluations submitted successfully', 'success')
+                    return redirect(url_for('dashboard'))
+                # Another submission got in first (save_sheet rolled back, releasing the
+                # submission claim too); validate against the fresh roster and try once more
+                roster = team_evaluation.load_roster(team_id, current_user.id)
+                entries, errors = team_evaluation.parse_sheet(request.form, roster)
+                if errors or attempt or not pwa.claim_submission():
+                    break
+            if not errors:
+                flash('Another submission changed this team; nothing was saved, please resubmit.', 'error')
+        if errors:
+            flash(f'{len(errors)} rows need fixing. Nothing was saved.', 'error')
+        # Nothing was saved, so release the submission claim: resubmitting the
+        # corrected sheet isn't a replay
+        db.session.rollback()
+
+    rows = [(student, team_evaluation.completed_levels(levels_mask)) for student, levels_mask in roster]
+    return render_template('evaluate_team.html', team=team, rows=rows, errors=errors, values=request.form,
+                           score_fields=team_evaluation.SCORE_FIELDS, max_level=team_evaluation.MAX_LEVEL)
+
+@login_required
+def view_evaluation(evaluation_id):
+    # Evaluations from past seasons live in the archive table under the same id
+    evaluation = archive.get_evaluation(evaluation_id, request.args.get('archived', type=int))
+    if evaluation is None:
+        abort(404)
+    
+    if current_user.user_type == 'student' and evaluation.student_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if current_user.user_type == 'coach' and evaluation.coach_id != current_user.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    
+    return render_template('view_evaluation.html', evaluation=evaluation)
@@ -0,0 +1,81 @@
+"""Snow Stars leaderboards (see leaderboard.py)"""
+
+from flask import current_app, render_template, request, redirect, url_for, flash, abort
+from flask_login import login_required, current_user
+from sqlalchemy import exists, select
+from models import db, Program, Team, Club, Division, CompletedLevels
+import leaderboard
+
+MODELS = {'program': Program, 'team': Team, 'club': Club, 'division': Division}
+
+def _leaderboard_args():
+    """Level and keyset cursor ("rank:student_id") from the query string; level is None if out of range"""
+    level = request.args.get('level', 1, type=int)
+    if not 1 <= level <= CompletedLevels.MAX_LEVEL:
+        level = None
+    after = request.args.get('after', '')
+    rank, _, student_id = after.partition(':')
+    after = (int(rank), int(student_id)) if rank.isdigit() and student_id.isdigit() else None
+    return level, after
+
+def _can_view(scope, scope_id):
+    """
+    Admins see every leaderboard, coaches those of their own teams and the
+    programs, clubs and divisions those teams are in, athletes their own
+    """
+    if current_user.user_type == 'admin':
+        return True
+    if current_user.user_type == 'student':
+        return getattr(current_user, leaderboard.SCOPES[scope].key) == scope_id
+    if current_user.user_type == 'coach':
+        in_scope = {
+            'team': Team.id == scope_id,
+            'program': Team.program_id == scope_id,
+            'club': Team.club_id == scope_id,
+            'division': Team.program_id.in_(select(Program.id).where(Program.division_id == scope_id))
+        }[scope]
+        return db.session.scalar(select(exists().where(Team.coach_id == current_user.id, in_scope)))
+    return False
+
+@login_required
+def view_leaderboard(scope, scope_id):
+    """Snow Stars ranking for a program, team, club or division at one level"""
+    if current_user.user_type not in ['admin', 'coach']:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    if scope not in leaderboard.SCOPES:
+        abort(404)
+    
+    owner = db.get_or_404(MODELS[scope], scope_id)
+    if not _can_view(scope, scope_id):
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    level, after = _leaderboard_args()
+    if level is None:
+        abort(404)
+    board = leaderboard.top(scope, scope_id, level, current_app.config['LEADERBOARD_PAGE_SIZE'], after)
+    return render_template('leaderboard.html', board=board, title=owner.name)
+
+@login_required
+def leaderboard_json(scope, scope_id):
+    """Leaderboard page plus the rank of ?student_id= (athletes only ever get their own rank)"""
+    if scope not in leaderboard.SCOPES:
+        return {'error': f'Unknown scope {scope}'}, 404
+    # Only for scopes and levels that exist, like the page
+    if db.session.get(MODELS[scope], scope_id) is None:
+        return {'error': f'No {scope} {scope_id}'}, 404
+    level, after = _leaderboard_args()
+    if level is None:
+        return {'error': f'Level must be between 1 and {CompletedLevels.MAX_LEVEL}'}, 404
+    if not _can_view(scope, scope_id):
+        return {'error': 'Access denied'}, 403
+    
+    if current_user.user_type == 'student':
+        return {'me': leaderboard.rank_of(scope, scope_id, level, current_user.id)}
+    
+    limit = min(request.args.get('limit', current_app.config['LEADERBOARD_PAGE_SIZE'], type=int), 100)
+    board = leaderboard.top(scope, scope_id, level, max(limit, 1), after)
+    student_id = request.args.get('student_id', type=int)
+    if student_id:
+        board['me'] = leaderboard.rank_of(scope, scope_id, level, student_id)
+    return board
@@ -0,0 +1,59 @@
+"""Team and club live boards (see live.py)"""
+
+from flask import current_app, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from models import db, Team, Club
+import live
+
+def _watchable_team(team_id):
+    """The team, if the current user may watch its live board"""
+    team = Team.query.get_or_404(team_id)
+    if current_user.user_type == 'admin' or (current_user.user_type == 'coach' and team.coach_id == current_user.id):
+        return team
+    return None
+
+def _watchable_club(club_id):
+    """The club, if the current user is an admin or coaches one of its teams"""
+    club = Club.query.get_or_404(club_id)
+    if current_user.user_type == 'admin':
+        return club
+    if current_user.user_type == 'coach' and \
+            Team.query.filter_by(club_id=club_id, coach_id=current_user.id).first():
+        return club
+    return None
+
+@login_required
+def live_team_board(team_id):
+    """Today's check-ins and evaluations for a team, updated as they happen"""
+    team = _watchable_team(team_id)
+    if team is None:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    return render_template('live_board.html', title=team.name, show_team=False,
+                           state=live.board_state([team.id]),
+                           teams={team.id: team.name},
+                           events_url=url_for('live_team_events', team_id=team.id))
+
+@login_required
+def live_team_events(team_id):
+    if _watchable_team(team_id) is None:
+        return {'error': 'Access denied'}, 403
+    return live.stream(current_app._get_current_object(), f'team:{team_id}')
+
+@login_required
+def live_club_board(club_id):
+    """Today's check-ins and evaluations across every team in a club"""
+    club = _watchable_club(club_id)
+    if club is None:
+        flash('Access denied', 'error')
+        return redirect(url_for('dashboard'))
+    teams = dict(db.session.query(Team.id, Team.name).filter(Team.club_id == club_id))
+    return render_template('live_board.html', title=club.name, show_team=True,
+                           state=live.board_state(list(teams)), teams=teams,
+                           events_url=url_for('live_club_events', club_id=club.id))
+
+@login_required
+def live_club_events(club_id):
+    if _watchable_club(club_id) is None:
+        return {'error': 'Access denied'}, 403
+    return live.stream(current_app._get_current_object(), f'club:{club_id}')
@@ -0,0 +1,207 @@
+"""Home page, login, dashboards, user registration and the PWA files"""
+
+import os
+import json
+from flask import current_app, render_template, request, redirect, url_for, flash
+from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from models import db, User, Evaluation, Program, Team
+from login_guard import LoginBusy
+import fragment_cache
+import leaderboard
+import projections
+import pwa
+import reference
+import roster
+from views import stream_page
+
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('dashboard'))
+    return render_template('index.html')
+
+def service_worker():
+    """The service worker, served from the root so it controls every page"""
+    shell = [url_for('static', filename=filename) for filename in pwa.SHELL] + [url_for('web_manifest')]
+    script = render_template('sw.js', version=pwa.shell_version(current_app.static_folder), shell=shell,
+                             offline_url=url_for('static', filename='offline.html'),
+                             login_url=url_for('login'), logout_url=url_for('logout'))
+    # Browsers must check for a new worker on every visit
+    return current_app.response_class(script, mimetype='text/javascript', headers={'Cache-Control': 'no-cache'})
+
+def web_manifest():
+    return current_app.response_class(json.dumps(pwa.manifest(url_for)), mimetype='application/manifest+json')
+
+def health():
+    """Health check endpoint for debugging"""
+    try:
+        # Test database connection
+        user_count = User.query.count()
+        program_count = Program.query.count()
+        
+        return {
+            'status': 'healthy',
+            'database': 'connected',
+            'users': user_count,
+            'programs': program_count,
+            'environment': os.environ.get('FLASK_ENV', 'development')
+        }
+    except Exception as e:
+        current_app.logger.error(f"Health check error: {e}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'environment': os.environ.get('FLASK_ENV', 'development')
+        }, 500
+
+def login():
+    if request.method == 'POST':
+        guard = current_app.extensions['login_guard']
+        try:
+            username = request.form.get('username', '').strip()
+            password = request.form.get('password', '').strip()
+            
+            if not username or not password:
+                flash('Please enter both username and password', 'error')
+                return render_template('login.html')
+            
+            # Throttled callers are turned away before any hashing happens
+            ip = guard.client_ip(request)
+            wait = guard.retry_after(username, ip)
+            if wait:
+                current_app.logger.warning(f"Login throttled for username: '{username}' from {ip}")
+                flash(f'Too many failed attempts. Try again in {int(wait) + 1} seconds.', 'error')
+                return render_template('login.html'), 429, {'Retry-After': str(int(wait) + 1)}
+            
+            current_app.logger.info(f"Login attempt for username: '{username}'")
+            user = User.query.filter_by(username=username).first()
+            
+            # Unknown usernames are checked against a dummy hash so they take as long as real ones
+            password_valid = guard.check_password(user.password_hash if user else None, password)
+            
+            if user and password_valid:
+                current_app.logger.info(f"User found: {user.username} (type: {user.user_type})")
+                guard.record_success(username)
+                if guard.needs_rehash(user.password_hash):
+                    user.password_hash = guard.hash_password(password)
+                    db.session.commit()
+                if db.session.scalar(select(roster.deactivated(user.id))):
+                    flash('This account has been deactivated', 'error')
+                    return render_template('login.html'), 403
+                login_user(user)
+                flash('Login successful!', 'success')
+                return redirect(url_for('dashboard'))
+            
+            if not user:
+                current_app.logger.warning(f"User not found: '{username}'")
+            guard.record_failure(username, ip)
+            flash('Invalid username or password', 'error')
+        except LoginBusy:
+            current_app.logger.warning("Login rejected: password hashing queue is full")
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '2'}
+        except Exception as e:
+            current_app.logger.error(f"Login error: {e}", exc_info=True)
+            flash('An error occurred during login. Please try again.', 'error')
+    
+    return render_template('login.html')
+
+@login_required
+def logout():
+    logout_user()
+    flash('Logged out successfully', 'info')
+    return redirect(url_for('index'))
+
+@login_required
+def dashboard():
+    user_type = current_user.user_type
+    
+    if user_type == 'admin':
+        user_counts = dict(db.session.query(User.user_type, func.count()).group_by(User.user_type).all())
+        staff = projections.project(projections.StaffRow, projections.staff_query(), current_app.config['STREAM_YIELD_PER'])
+        return stream_page('dashboard_admin.html', user_counts=user_counts, staff=staff)
+    elif user_type == 'coach':
+        # Sections are cached per coach and re-rendered only after a write to one of
+        # their tags; the tags need just the coach's team and program ids
+        cache = current_app.extensions['fragment_cache']
+        coach_teams = db.session.query(Team.id, Team.program_id).filter_by(coach_id=current_user.id).all()
+        team_ids = [team_id for team_id, _ in coach_teams]
+        team_tags = [f'coach:{current_user.id}'] + [f'team:{team_id}' for team_id in team_ids]
+        program_tags = sorted({f'program:{program_id}' for _, program_id in coach_teams})
+        
+        def recent_evaluations():
+            return Evaluation.query.filter_by(coach_id=current_user.id).options(joinedload(Evaluation.student)) \
+                .order_by(Evaluation.created_at.desc()).limit(5).all()
+        
+        def render_teams():
+            teams = projections.project(projections.TeamRow, projections.teams_query(Team.coach_id == current_user.id))
+            return render_template('dashboard_coach_teams.html', teams=teams)
+        
+        def render_roster():
+            students = []
+            if team_ids:
+                students = projections.project(projections.AthleteRow, projections.athletes_query(User.team_id.in_(team_ids)))
+            return render_template('dashboard_coach_roster.html', students=students, evaluations=recent_evaluations())
+        
+        def render_evaluations():
+            return render_template('dashboard_coach_evaluations.html', evaluations=recent_evaluations())
+        
+        return render_template('dashboard_coach.html',
+                               teams_section=cache.fragment('coach_teams', current_user.id, team_tags + program_tags, render_teams),
+                               roster_section=cache.fragment('coach_roster', current_user.id, team_tags, render_roster),
+                               evaluations_section=cache.fragment('coach_evaluations', current_user.id, team_tags[:1], render_evaluations))
+    else:
+        evaluations = Evaluation.query.filter_by(student_id=current_user.id).order_by(Evaluation.level).all()
+        return render_template('dashboard_student.html', evaluations=evaluations,
+                               ranks=leaderboard.my_ranks(current_user))
+
+@login_required
+def register():
+    if current_user.user_type != 'admin':
+        flash('Only admins can create new users', 'error')
+        return redirect(url_for('dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        full_name = request.form.get('full_name')
+        user_type = request.form.get('user_type')
+        coach_id = request.form.get('coach_id')
+        team_id = request.form.get('team_id')
+        club_id = request.form.get('club_id')
+        division_id = request.form.get('division_id')
+        participates_skier = request.form.get('participates_skier') == 'on'
+        participates_snowboarder = request.form.get('participates_snowboarder') == 'on'
+        participates_snow_stars = request.form.get('participates_snow_stars') == 'on'
+        
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists', 'error')
+        else:
+            new_user = User(
+                username=username,
+                email=email,
+                password_hash=current_app.extensions['login_guard'].hash_password(password),
+                full_name=full_name,
+                user_type=user_type,
+                club_id=int(club_id) if club_id else None,
+                division_id=int(division_id) if division_id else None,
+                participates_skier=participates_skier if user_type == 'student' else False,
+                participates_snowboarder=participates_snowboarder if user_type == 'student' else False,
+                participates_snow_stars=participates_snow_stars if user_type == 'student' else False,
+                coach_id=int(coach_id) if coach_id else None,
+                team_id=int(team_id) if team_id and user_type == 'student' else None
+            )
+            
+            db.session.add(new_user)
+            if new_user.team_id:
+                fragment_cache.invalidate(f'team:{new_user.team_id}')
+            db.session.commit()
+            flash('User created successfully', 'success')
+            return redirect(url_for('dashboard'))
+    
+    teams = projections.project(projections.TeamOption, projections.team_options_query())
+    clubs = reference.clubs()
+    divisions = reference.divisions()
+    return render_template('register.html', teams=teams, clubs=clubs, divisions=divisions)